@@ -0,0 +1,250 @@
+import logging
+import mimetypes
+import os
+import shlex
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from storage import cache_dir, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+BIN_DIRS = [
+    '/usr/bin',
+    '/usr/local/bin',
+    '/bin',
+    '/snap/bin',
+    os.path.expanduser('~/.local/bin'),
+]
+
+APPLICATION_DIRS = [
+    '/usr/share/applications',
+    '/usr/local/share/applications',
+    '/var/lib/snapd/desktop/applications',
+    '/var/lib/flatpak/exports/share/applications',
+    os.path.expanduser('~/.local/share/flatpak/exports/share/applications'),
+    os.path.expanduser('~/.local/share/applications'),
+]
+
+# Exec field codes that stand for files, URLs and icons
+_FIELD_CODES = {'%f', '%F', '%u', '%U', '%d', '%D', '%n', '%N', '%i', '%c', '%k', '%v', '%m'}
+
+
+def _parse_desktop_file(path: str) -> Optional[dict]:
+    """Read the [Desktop Entry] keys the Open With menu needs."""
+    entry = {}
+    in_section = False
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('['):
+                    if in_section:
+                        break
+                    in_section = line == '[Desktop Entry]'
+                    continue
+                if in_section and '=' in line:
+                    key, value = line.split('=', 1)
+                    key = key.strip()
+                    if key in ('Name', 'Exec', 'MimeType', 'NoDisplay', 'Hidden', 'Type'):
+                        entry[key] = value.strip()
+    except OSError:
+        return None
+    if entry.get('Type', 'Application') != 'Application' or 'Exec' not in entry:
+        return None
+    if entry.get('Hidden') == 'true':
+        return None
+    try:
+        argv = [arg for arg in shlex.split(entry['Exec']) if arg not in _FIELD_CODES]
+    except ValueError:
+        return None
+    if not argv:
+        return None
+    return {
+        'name': entry.get('Name', argv[0]),
+        'argv': argv,
+        'mime': [m for m in entry.get('MimeType', '').split(';') if m],
+        'hidden': entry.get('NoDisplay') == 'true',
+    }
+
+
+def _parse_mimeinfo_cache(path: str) -> Dict[str, List[str]]:
+    """Map MIME types to desktop file ids from a mimeinfo.cache file."""
+    mime = {}
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if '=' in line and not line.startswith('['):
+                    key, value = line.strip().split('=', 1)
+                    mime[key] = [d for d in value.split(';') if d]
+    except OSError:
+        pass
+    return mime
+
+
+class AppIndex:
+    """Persistent index of installed applications for the Open With menu.
+
+    Executables from the bin directories (and $PATH), ``.desktop`` entries and
+    ``mimeinfo.cache`` associations are stored in a cache file together with
+    the mtime of the directory they came from. Loading the index only stats
+    those directories and rescans the ones whose mtime changed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, revalidate_interval: float = 30):
+        self.path = path
+        self.revalidate_interval = revalidate_interval
+        self._dirs: Dict[str, dict] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._executables: Set[str] = set()
+        self._desktop: Dict[str, dict] = {}
+        self._mime: Dict[str, List[str]] = {}
+
+    def _cache_path(self) -> str:
+        if self.path is None:
+            self.path = os.path.join(cache_dir(), 'apps.json')
+        return self.path
+
+    @staticmethod
+    def _bin_dirs() -> List[str]:
+        dirs = BIN_DIRS + os.environ.get('PATH', '').split(os.pathsep)
+        return [d for d in dict.fromkeys(os.path.realpath(d) for d in dirs if d)]
+
+    @staticmethod
+    def _signature(directory: str, kind: str) -> Optional[list]:
+        try:
+            sig = [os.stat(directory).st_mtime_ns]
+        except OSError:
+            return None
+        if kind == 'applications':
+            # update-desktop-database may rewrite the cache in place
+            try:
+                sig.append(os.stat(os.path.join(directory, 'mimeinfo.cache')).st_mtime_ns)
+            except OSError:
+                sig.append(0)
+        return sig
+
+    @staticmethod
+    def _scan_bin_dir(directory: str) -> dict:
+        names = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith('.') or len(name) <= 2:
+                        continue
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            names.append(name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return {'executables': names}
+
+    @staticmethod
+    def _scan_application_dir(directory: str) -> dict:
+        desktop = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.desktop'):
+                        parsed = _parse_desktop_file(entry.path)
+                        if parsed is not None:
+                            desktop[entry.name] = parsed
+        except OSError:
+            pass
+        return {
+            'desktop': desktop,
+            'mime': _parse_mimeinfo_cache(os.path.join(directory, 'mimeinfo.cache')),
+        }
+
+    def load(self, force: bool = False):
+        """Bring the index up to date, rescanning only changed directories."""
+        now = time.time()
+        with self._lock:
+            if not force and self._dirs and now - self._checked < self.revalidate_interval:
+                return
+            if not self._dirs:
+                cached = load_json(self._cache_path(), {})
+                if cached.get('version') == self.VERSION:
+                    self._dirs = cached.get('dirs', {})
+
+            dirs = {}
+            changed = False
+            wanted = [(d, 'bin') for d in self._bin_dirs()] + [(d, 'applications') for d in APPLICATION_DIRS]
+            for directory, kind in wanted:
+                sig = self._signature(directory, kind)
+                if sig is None:
+                    continue
+                key = f"{kind}:{directory}"
+                cached_dir = self._dirs.get(key)
+                if cached_dir is not None and cached_dir['sig'] == sig:
+                    dirs[key] = cached_dir
+                    continue
+                logger.debug("Indexing applications in %s", directory)
+                scan = self._scan_bin_dir(directory) if kind == 'bin' else self._scan_application_dir(directory)
+                scan['sig'] = sig
+                dirs[key] = scan
+                changed = True
+            changed = changed or set(dirs) != set(self._dirs)
+
+            if changed or not self._checked:
+                self._dirs = dirs
+                self._rebuild()
+            if changed:
+                try:
+                    save_json(self._cache_path(), {'version': self.VERSION, 'dirs': dirs})
+                except OSError as e:
+                    logger.warning("Could not save application index: %s", e)
+            self._checked = now
+            logger.debug("Application index: %d commands, %d desktop entries", len(self._executables), len(self._desktop))
+
+    def _rebuild(self):
+        executables = set()
+        desktop = {}
+        mime = {}
+        # Earlier directories take precedence, like $PATH and XDG_DATA_DIRS
+        for key, data in reversed(list(self._dirs.items())):
+            executables.update(data.get('executables', ()))
+            desktop.update(data.get('desktop', {}))
+            for mime_type, ids in data.get('mime', {}).items():
+                mime.setdefault(mime_type, [])
+                mime[mime_type] = ids + [i for i in mime[mime_type] if i not in ids]
+        self._executables = executables
+        self._desktop = desktop
+        self._mime = mime
+
+    def executables(self) -> Set[str]:
+        self.load()
+        return self._executables
+
+    def has_command(self, command: str) -> bool:
+        if os.path.isabs(command):
+            return os.access(command, os.X_OK)
+        return command in self.executables()
+
+    def apps_for_file(self, file_path: str, is_dir: Optional[bool] = None) -> List[Tuple[str, List[str]]]:
+        """(name, argv) of the desktop applications registered for the file's MIME type.
+
+        Args:
+            is_dir: Whether the path is a directory, if already known
+        """
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if is_dir is None:
+            is_dir = os.path.isdir(file_path)
+        if is_dir:
+            mime_type = 'inode/directory'
+        if not mime_type:
+            return []
+        self.load()
+        apps = []
+        for desktop_id in self._mime.get(mime_type, []):
+            entry = self._desktop.get(desktop_id)
+            if entry is not None and not entry['hidden']:
+                apps.append((entry['name'], entry['argv']))
+        return apps
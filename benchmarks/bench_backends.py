@@ -0,0 +1,70 @@
+"""Compare the live hardware search backends on a synthetic mount.
+
+Usage: python benchmarks/bench_backends.py [--dirs 8] [--depth 4] [--files 20] [--runs 10]
+
+Builds a throwaway directory tree, then times ``find -maxdepth 3 -iname``
+against the ``os.scandir`` walker for a few pattern classes, with the same
+result limit the extension uses.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import PATTERNS, make_tree  # noqa: E402
+from locator import CancelToken, FindBackend, ScandirBackend  # noqa: E402
+
+
+def time_backend(backend, root, pattern, search_type, limit, runs):
+    samples = []
+    found = 0
+    for _ in range(runs):
+        # Compare cold walks; scandir would otherwise reuse its cached listings
+        if isinstance(backend, ScandirBackend):
+            backend.listings.invalidate()
+        started = time.perf_counter()
+        token = CancelToken()
+        gen = backend.search(root, pattern, search_type, token)
+        results = []
+        for hit in gen:
+            results.append(hit)
+            if len(results) >= limit:
+                break
+        gen.close()
+        token.cancel()
+        samples.append((time.perf_counter() - started) * 1000)
+        found = len(results)
+    return statistics.median(samples), max(samples), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dirs', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    backends = [FindBackend(shutil.which('find')), ScandirBackend()]
+    cases = [(label, pattern, 'file') for label, pattern in PATTERNS.items()]
+    cases.append(('directory', 'dir_2', 'directory'))
+    with tempfile.TemporaryDirectory(prefix='fileflow-bench-') as root:
+        files = make_tree(root, args.dirs, args.depth, args.files)
+        print(f"tree: {files} files, dirs={args.dirs} depth={args.depth} limit={args.limit}")
+        print(f"{'case':<10} {'backend':<8} {'median ms':>10} {'max ms':>10} {'hits':>5}")
+        for label, pattern, search_type in cases:
+            for backend in backends:
+                if not backend.available():
+                    continue
+                median, worst, found = time_backend(backend, root, pattern, search_type, args.limit, args.runs)
+                print(f"{label:<10} {backend.name:<8} {median:>10.2f} {worst:>10.2f} {found:>5}")
+
+
+if __name__ == '__main__':
+    main()
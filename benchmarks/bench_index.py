@@ -0,0 +1,100 @@
+"""Memory and speed of the per-mount path index.
+
+Usage: python benchmarks/bench_index.py [--dirs 10] [--depth 4] [--files 30] [--runs 20]
+
+Builds a throwaway directory tree and indexes it, then reports the index
+size per path next to what the same paths take as a list of Python
+strings, the peak memory allocated while building, build and refresh
+times, search latency per pattern class, and fuzzy search latency with
+and without NumPy.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fuzzy  # noqa: E402
+from benchmarks.fixtures import PATTERNS, make_tree  # noqa: E402
+from path_index import PathIndex  # noqa: E402
+
+
+# Abbreviations of fixture names, e.g. "rprt" for report_2.txt
+FUZZY_PATTERNS = ['rprt', 'thsdr', 'invpdf']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dirs', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='fileflow-bench-') as tmp:
+        root = os.path.join(tmp, 'volume')
+        os.makedirs(root)
+        make_tree(root, args.dirs, args.depth, args.files)
+        db_path = os.path.join(tmp, 'volume.idx')
+
+        index = PathIndex(root, db_path)
+        tracemalloc.start()
+        started = time.perf_counter()
+        index.build()
+        build_ms = (time.perf_counter() - started) * 1000
+        _, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        index.build()
+        refresh_ms = (time.perf_counter() - started) * 1000
+
+        paths = len(index)
+        # What the same paths would take as Python strings in a list
+        tracemalloc.start()
+        as_strings = [index.path(i) for i in range(1, paths + 1)]
+        strings_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del as_strings
+
+        print(f"paths={paths} dirs={args.dirs} depth={args.depth} files={args.files}")
+        print(f"index:        {index.nbytes / 1024:10.1f} KiB  {index.nbytes / paths:6.1f} bytes/path")
+        print(f"list of str:  {strings_bytes / 1024:10.1f} KiB  {strings_bytes / paths:6.1f} bytes/path")
+        print(f"build peak:   {build_peak / 1024:10.1f} KiB  {build_peak / paths:6.1f} bytes/path")
+        print(f"build {build_ms:.1f} ms, refresh without changes {refresh_ms:.1f} ms")
+
+        print(f"{'pattern':<8} {'type':<10} {'p50 ms':>8} {'max ms':>8} {'hits':>6}")
+        for pattern_class, pattern in PATTERNS.items():
+            for search_type in (None, 'directory'):
+                samples = []
+                hits = 0
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    hits = len(index.search(pattern, args.limit, search_type))
+                    samples.append((time.perf_counter() - started) * 1000)
+                print(f"{pattern_class:<8} {search_type or 'any':<10} {statistics.median(samples):>8.2f} "
+                      f"{max(samples):>8.2f} {hits:>6}")
+
+        numpy = fuzzy.load_numpy()
+        engines = ['numpy', 'regex'] if numpy is not None else ['regex']
+        print(f"{'fuzzy':<8} {'engine':<10} {'p50 ms':>8} {'max ms':>8} {'hits':>6}")
+        for pattern in FUZZY_PATTERNS:
+            for engine in engines:
+                fuzzy.numpy = numpy if engine == 'numpy' else None
+                samples = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    hits = len(index.fuzzy_search(pattern, args.limit))
+                    samples.append((time.perf_counter() - started) * 1000)
+                print(f"{pattern:<8} {engine:<10} {statistics.median(samples):>8.2f} "
+                      f"{max(samples):>8.2f} {hits:>6}")
+        fuzzy.numpy = numpy
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Latency benchmark for Locator modes and result rendering.
+
+Usage: python benchmarks/bench_locator.py [--mounts 2] [--dirs 6] [--depth 4] [--files 30]
+                                          [--locate-entries 200000] [--runs 30] [--limit 10]
+                                          [--modes normal,db,dir,hw,r,ui] [--json FILE]
+
+Generates synthetic mount trees and a fixture locate database, points
+``Locator.hardware_bases`` at the trees and ``Locator.cmd`` at a stub locate
+that replays the database. The ``db`` mode is ``normal`` answered by the
+in-process reader from the same paths written as an ``mlocate.db``. Every (mode, pattern class) case runs in its own
+process so its peak RSS can be reported; the query cache is cleared before
+each run so every sample takes the full search path. The "first" column is
+the very first query of the process, before the mount indexes are built.
+
+The ``ui`` mode times ``KeywordQueryEventListener.on_event`` until its
+results are sent, using a stand-in Ulauncher API when Ulauncher is missing;
+the search goes through a daemon serving the same locator on a private
+socket, so the socket round trip is included.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import PATTERNS, make_locate_db, make_locate_stub, make_mlocate_db, make_mounts  # noqa: E402
+
+MODES = ['normal', 'db', 'dir', 'hw', 'r', 'ui']
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def peak_rss_kb():
+    # VmHWM starts over on exec; ru_maxrss would include the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def query_for(mode, pattern):
+    if mode == 'dir':
+        return f"dir {pattern}"
+    if mode == 'hw':
+        return f"hw {pattern}"
+    if mode == 'r':
+        return f"r -i {pattern}"
+    return pattern
+
+
+def make_locator(args):
+    from locate_db import LocateDatabase
+    from locator import Locator
+    locator = Locator()
+    locator.cmd = args.locate
+    # Only the db mode reads a database in-process, never the system one
+    locator.locate_db = LocateDatabase([args.mlocate_db]) if args.mode == 'db' else None
+    locator.dir_index.locate_paths = [args.mlocate_db] if args.mode == 'db' else []
+    # Synthetic trees are plain directories, not mount points
+    locator.mounts.available = False
+    locator.hardware_bases[:] = [args.mounts_dir]
+    locator.set_limit(args.limit)
+    return locator
+
+
+def wait_for_indexes(locator, mode, timeout=120):
+    deadline = time.monotonic() + timeout
+    while locator.locate_db is not None and not locator.locate_db.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if mode == 'dir':
+        # Until it is built, dir searches only walk the mounts
+        locator.dir_index.refresh(locator.locate_db, locator.cmd)
+        locator.dir_index.wait_ready(max(0, deadline - time.monotonic()))
+    for path in locator._discover_hardware_paths():
+        index = locator._get_index(path)
+        while not index.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+def run_worker(args):
+    """Run one (mode, pattern class) case and print its samples as JSON."""
+    quiet = io.StringIO()
+    query = query_for(args.mode, PATTERNS[args.pattern_class])
+    with contextlib.redirect_stdout(quiet):
+        locator = make_locator(args)
+        if args.mode == 'ui':
+            from benchmarks.ulauncher_shim import install
+            install()
+            import main
+            from client import DaemonClient
+            from daemon import SearchDaemon
+            from ulauncher.api.shared.event import KeywordQueryEvent
+            socket_file = os.path.join(tempfile.mkdtemp(prefix='fileflow-bench-'), 'daemon.sock')
+            server = SearchDaemon(socket_file, locator)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            main.client = DaemonClient(socket_file, autostart=False)
+            listener = main.KeywordQueryEventListener()
+            sent = threading.Event()
+
+            class Client:
+                def send(self, response):
+                    sent.set()
+
+            extension = type('BenchExtension', (), {'_client': Client()})()
+
+            def search():
+                sent.clear()
+                listener.on_event(KeywordQueryEvent(query), extension)
+                sent.wait(60)
+        else:
+            def search():
+                try:
+                    locator.run(query)
+                except RuntimeError:
+                    # e.g. raw locate exiting with status 1 on no match
+                    pass
+
+        started = time.perf_counter()
+        search()
+        first = (time.perf_counter() - started) * 1000
+        wait_for_indexes(locator, args.mode)
+
+        samples = []
+        for _ in range(args.runs):
+            locator.cache.invalidate()
+            started = time.perf_counter()
+            search()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    rss_kb = peak_rss_kb()
+    print(json.dumps({'first': first, 'samples': samples, 'rss_kb': rss_kb}))
+
+
+def run_case(args, mode, pattern_class):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker',
+           '--mode', mode, '--pattern-class', pattern_class,
+           '--mounts-dir', args.mounts_dir, '--locate', args.locate, '--mlocate-db', args.mlocate_db,
+           '--runs', str(args.runs), '--limit', str(args.limit)]
+    output = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if output.returncode != 0:
+        raise RuntimeError(f"{mode}/{pattern_class} failed:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mounts', type=int, default=2)
+    parser.add_argument('--dirs', type=int, default=6)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--locate-entries', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--json', help='also write the results to this file')
+    # Internal: run a single case in this process
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--pattern-class', help=argparse.SUPPRESS)
+    parser.add_argument('--mounts-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--locate', help=argparse.SUPPRESS)
+    parser.add_argument('--mlocate-db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    modes = [m for m in args.modes.split(',') if m]
+    results = []
+    with tempfile.TemporaryDirectory(prefix='fileflow-bench-') as tmp:
+        args.mounts_dir = os.path.join(tmp, 'media')
+        make_mounts(args.mounts_dir, args.mounts, args.dirs, args.depth, args.files)
+        db = os.path.join(tmp, 'locate.db')
+        make_locate_db(db, args.locate_entries)
+        args.locate = make_locate_stub(tmp, db)
+        args.mlocate_db = os.path.join(tmp, 'mlocate.db')
+        make_mlocate_db(args.mlocate_db, db)
+        # Saved indexes go here, never next to the user's own
+        os.environ['XDG_CACHE_HOME'] = os.path.join(tmp, 'cache')
+
+        print(f"mounts={args.mounts} dirs={args.dirs} depth={args.depth} files={args.files} "
+              f"locate_entries={args.locate_entries} runs={args.runs} limit={args.limit}")
+        print(f"{'mode':<7} {'pattern':<7} {'first':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'rss MB':>7}")
+        for mode in modes:
+            for pattern_class in PATTERNS:
+                case = run_case(args, mode, pattern_class)
+                samples = case['samples']
+                row = {
+                    'mode': mode,
+                    'pattern': pattern_class,
+                    'first_ms': case['first'],
+                    'p50_ms': percentile(samples, 50),
+                    'p95_ms': percentile(samples, 95),
+                    'p99_ms': percentile(samples, 99),
+                    'peak_rss_mb': case['rss_kb'] / 1024,
+                }
+                results.append(row)
+                print(f"{mode:<7} {pattern_class:<7} {row['first_ms']:>9.2f} {row['p50_ms']:>8.2f} "
+                      f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['peak_rss_mb']:>7.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""First-query latency of a freshly started search daemon, with and without warm-up.
+
+Usage: python benchmarks/bench_startup.py [--mounts 2] [--dirs 6] [--depth 4] [--files 30]
+                                          [--locate-entries 200000] [--runs 5] [--limit 10]
+
+Every run starts a new process, like a daemon started after a Ulauncher
+restart, and reports how long importing the daemon took, the first search
+and the first Open With lookup. "cold" sends them right after the daemon
+is listening, as before warm-up existed; "warm" waits for
+``SearchDaemon.warm_up`` first, as the extension's first keystroke
+typically does (the daemon is started when the extension loads). The
+application index cache is primed once beforehand, since it survives
+restarts.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import PATTERNS, make_locate_db, make_locate_stub, make_mounts  # noqa: E402
+
+CASES = ['cold', 'warm']
+
+
+def run_worker(args):
+    started = time.perf_counter()
+    import daemon
+    from client import DaemonClient
+    from locator import Locator
+    import_ms = (time.perf_counter() - started) * 1000
+
+    locator = Locator()
+    locator.cmd = args.locate
+    locator.locate_db = None
+    # Synthetic trees are plain directories, not mount points
+    locator.mounts.available = False
+    locator.hardware_bases[:] = [args.mounts_dir]
+    locator.set_limit(args.limit)
+    socket_file = os.path.join(tempfile.mkdtemp(prefix='fileflow-bench-'), 'daemon.sock')
+    server = daemon.SearchDaemon(socket_file, locator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    warm_up_ms = 0.0
+    if args.case == 'warm':
+        started = time.perf_counter()
+        server.warm_up()
+        server.warm.wait(120)
+        warm_up_ms = (time.perf_counter() - started) * 1000
+
+    client = DaemonClient(socket_file, autostart=False)
+    started = time.perf_counter()
+    entries, _, _ = client.search(PATTERNS['common'], args.limit)
+    search_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    client.apps(entries[0][0] if entries else ROOT, False, ['xdg-open', 'nautilus', 'code'])
+    apps_ms = (time.perf_counter() - started) * 1000
+    client.close()
+    server.shutdown()
+    print(json.dumps({'import': import_ms, 'warm_up': warm_up_ms, 'search': search_ms, 'apps': apps_ms}))
+
+
+def run_case(args, case):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--case', case,
+           '--mounts-dir', args.mounts_dir, '--locate', args.locate, '--limit', str(args.limit)]
+    output = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if output.returncode != 0:
+        raise RuntimeError(f"{case} failed:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mounts', type=int, default=2)
+    parser.add_argument('--dirs', type=int, default=6)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--locate-entries', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=10)
+    # Internal: run a single case in this process
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--mounts-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--locate', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='fileflow-bench-') as tmp:
+        args.mounts_dir = os.path.join(tmp, 'media')
+        make_mounts(args.mounts_dir, args.mounts, args.dirs, args.depth, args.files)
+        db = os.path.join(tmp, 'locate.db')
+        make_locate_db(db, args.locate_entries)
+        args.locate = make_locate_stub(tmp, db)
+        os.environ['XDG_CACHE_HOME'] = os.path.join(tmp, 'cache')
+        from app_index import AppIndex
+        AppIndex().load()
+
+        print(f"mounts={args.mounts} dirs={args.dirs} depth={args.depth} files={args.files} "
+              f"locate_entries={args.locate_entries} runs={args.runs} limit={args.limit} (median ms)")
+        print(f"{'case':<6} {'import':>8} {'warm-up':>9} {'search':>8} {'apps':>8}")
+        for case in CASES:
+            runs = [run_case(args, case) for _ in range(args.runs)]
+            row = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            print(f"{case:<6} {row['import']:>8.1f} {row['warm_up']:>9.1f} {row['search']:>8.1f} {row['apps']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
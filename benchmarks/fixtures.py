@@ -0,0 +1,143 @@
+"""Synthetic data for the benchmarks: mount trees, a locate database and a
+stand-in ``locate`` executable that replays it."""
+import os
+import random
+import stat
+import struct
+import sys
+
+LOCATE_STUB = '''#!{python}
+"""Replays {db} like locate: -i, -l/--limit N, -r/--regex, substring or glob."""
+import fnmatch, re, sys
+
+args = sys.argv[1:]
+icase = regex = False
+limit = None
+patterns = []
+while args:
+    arg = args.pop(0)
+    if arg in ('-i', '--ignore-case'):
+        icase = True
+    elif arg in ('-l', '-n', '--limit'):
+        limit = int(args.pop(0))
+    elif arg in ('-r', '--regex', '--regexp'):
+        regex = True
+    elif arg.startswith('-'):
+        continue
+    else:
+        patterns.append(arg)
+
+flags = re.IGNORECASE if icase else 0
+matchers = []
+for p in patterns:
+    if regex:
+        matchers.append(re.compile(p, flags).search)
+    elif any(c in p for c in '*?['):
+        matchers.append(re.compile(fnmatch.translate(p), flags).match)
+    else:
+        needle = p.lower() if icase else p
+        matchers.append((lambda n: lambda s: n in (s.lower() if icase else s))(needle))
+
+found = 0
+out = sys.stdout
+with open({db!r}, encoding='utf-8', errors='surrogateescape') as f:
+    for line in f:
+        line = line.rstrip('\\n')
+        if any(m(line) for m in matchers):
+            out.write(line + '\\n')
+            found += 1
+            if limit and found >= limit:
+                break
+sys.exit(0 if found else 1)
+'''
+
+WORDS = ['report', 'invoice', 'photo', 'notes', 'backup', 'draft', 'summary', 'budget',
+         'project', 'thesis', 'scan', 'music', 'video', 'config', 'cache', 'index']
+EXTS = ['txt', 'pdf', 'jpg', 'png', 'md', 'docx', 'mp3', 'mp4', 'json', 'log']
+
+# Pattern classes used by every benchmark; each maps to a query pattern
+PATTERNS = {
+    'common': 'report',
+    'rare': 'needle_report',
+    'miss': 'no-such-name-xyz',
+    'glob': 'needle*.pdf',
+}
+
+
+def make_tree(root, dirs, depth, files, seed=1):
+    """Create ``dirs`` subdirectories per level down to ``depth`` with ``files``
+    files each, plus one rare file. Returns the number of files created."""
+    rng = random.Random(seed)
+    count = 0
+    level = [root]
+    levels = [level]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(files):
+                name = f"{rng.choice(WORDS)}_{d}_{i}.{rng.choice(EXTS)}"
+                open(os.path.join(parent, name), 'w').close()
+                count += 1
+            for i in range(dirs):
+                path = os.path.join(parent, f"{rng.choice(WORDS)}_dir_{d}_{i}")
+                os.mkdir(path)
+                next_level.append(path)
+        level = next_level
+        levels.append(level)
+    # A single rare file at the deepest level find -maxdepth 3 still reaches
+    open(os.path.join(levels[min(2, depth)][-1], "Needle_Report.PDF"), 'w').close()
+    return count + 1
+
+
+def make_mounts(base, count, dirs, depth, files):
+    """Create ``count`` volume directories below ``base``; returns their paths."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(base, f"volume{i}")
+        os.makedirs(path)
+        make_tree(path, dirs, depth, files, seed=i + 1)
+        paths.append(path)
+    return paths
+
+
+def make_locate_db(path, entries, seed=7):
+    """Write a fixture locate database of ``entries`` synthetic system paths."""
+    rng = random.Random(seed)
+    tops = ['/usr/share/doc', '/usr/lib/python3', '/home/user/Documents', '/home/user/.cache/thumbnails',
+            '/home/user/Pictures', '/var/lib', '/opt/app/share']
+    with open(path, 'w') as f:
+        for i in range(entries):
+            top = rng.choice(tops)
+            sub = '/'.join(rng.choice(WORDS) for _ in range(rng.randint(0, 4)))
+            name = f"{rng.choice(WORDS)}_{i}.{rng.choice(EXTS)}"
+            f.write(f"{top}/{sub}/{name}\n" if sub else f"{top}/{name}\n")
+        f.write("/home/user/Documents/Needle_Report.pdf\n")
+
+
+def make_mlocate_db(path, locate_db):
+    """Write the paths of the text database ``locate_db`` as an ``mlocate.db``."""
+    children = {'/': {}}
+    with open(locate_db, encoding='utf-8', errors='surrogateescape') as f:
+        for line in f:
+            parts = line.rstrip('\n').strip('/').split('/')
+            for depth, name in enumerate(parts):
+                parent = '/' + '/'.join(parts[:depth])
+                is_dir = depth < len(parts) - 1
+                children.setdefault(parent, {})
+                children[parent][name] = children[parent].get(name, False) or is_dir
+    with open(path, 'wb') as f:
+        f.write(struct.pack('>8sIBBxx', b'\0mlocate', 0, 0, 0) + b'/\0')
+        for directory in sorted(children):
+            f.write(struct.pack('>QI4x', 0, 0) + os.fsencode(directory) + b'\0')
+            for name, is_dir in sorted(children[directory].items()):
+                f.write(bytes([1 if is_dir else 0]) + os.fsencode(name) + b'\0')
+            f.write(b'\2')
+
+
+def make_locate_stub(directory, db_path):
+    """Write an executable ``locate`` replaying ``db_path``; returns its path."""
+    path = os.path.join(directory, 'locate')
+    with open(path, 'w') as f:
+        f.write(LOCATE_STUB.format(python=sys.executable, db=db_path))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
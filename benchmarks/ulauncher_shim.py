@@ -0,0 +1,71 @@
+"""Minimal stand-ins for the Ulauncher API so main.py can be imported and
+benchmarked headless. Only installed when Ulauncher itself is missing."""
+import sys
+import types
+
+_ITEMS = ['ExtensionSmallResultItem', 'ExtensionResultItem']
+_ACTIONS = ['RenderResultListAction', 'OpenAction', 'CopyToClipboardAction', 'SetUserQueryAction',
+            'HideWindowAction', 'ExtensionCustomAction', 'DoNothingAction']
+
+
+class _Recorded:
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+class _Extension:
+    def __init__(self):
+        self.listeners = {}
+
+    def subscribe(self, event_type, listener):
+        self.listeners[event_type] = listener
+
+
+class _EventListener:
+    pass
+
+
+class KeywordQueryEvent:
+    def __init__(self, argument=None):
+        self.argument = argument
+
+    def get_argument(self):
+        return self.argument
+
+
+class Response:
+    def __init__(self, event, action):
+        self.event = event
+        self.action = action
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Register the stand-in modules unless the real API is importable."""
+    try:
+        import ulauncher.api  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    for package in ['ulauncher', 'ulauncher.api', 'ulauncher.api.client', 'ulauncher.api.shared',
+                    'ulauncher.api.shared.item', 'ulauncher.api.shared.action']:
+        _module(package, __path__=[])
+    _module('ulauncher.api.client.Extension', Extension=_Extension)
+    _module('ulauncher.api.client.EventListener', EventListener=_EventListener)
+    _module('ulauncher.api.shared.event', KeywordQueryEvent=KeywordQueryEvent,
+            PreferencesEvent=type('PreferencesEvent', (), {}),
+            PreferencesUpdateEvent=type('PreferencesUpdateEvent', (), {}),
+            ItemEnterEvent=type('ItemEnterEvent', (), {}))
+    _module('ulauncher.api.shared.Response', Response=Response)
+    for name in _ITEMS:
+        _module(f'ulauncher.api.shared.item.{name}', **{name: type(name, (_Recorded,), {})})
+    for name in _ACTIONS:
+        _module(f'ulauncher.api.shared.action.{name}', **{name: type(name, (_Recorded,), {})})
+    return True
@@ -0,0 +1,64 @@
+import os
+import signal
+import subprocess
+import threading
+from typing import Optional
+
+
+def kill_process(proc: subprocess.Popen):
+    """Kill a child started with ``start_new_session`` along with its children."""
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+
+class SearchCancelled(Exception):
+    """Raised when a search was superseded by a newer query."""
+
+
+class CancelToken:
+    """Shared stop flag for one search, able to kill the processes it started.
+
+    Cancelling a token also cancels every token created with it as parent.
+    """
+
+    def __init__(self, parent: Optional['CancelToken'] = None):
+        self._event = threading.Event()
+        self._procs = []
+        self._children = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent._add_child(self)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise SearchCancelled()
+
+    def _add_child(self, child: 'CancelToken'):
+        with self._lock:
+            self._children.append(child)
+        if self.cancelled:
+            child.cancel()
+
+    def add_process(self, proc: subprocess.Popen):
+        with self._lock:
+            self._procs.append(proc)
+        if self.cancelled:
+            kill_process(proc)
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            procs = list(self._procs)
+            children = list(self._children)
+        for proc in procs:
+            kill_process(proc)
+        for child in children:
+            child.cancel()
@@ -0,0 +1,337 @@
+"""Client of the FileFlow search daemon, and a command-line interface to it.
+
+Usage: python client.py search [--limit N] [--pages N] [--json] [--repeat N] <query>
+       python client.py search grep <text>   (prints path:line:text)
+       python client.py stats | ping | stop
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cancel import CancelToken, SearchCancelled
+from storage import cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever requests or replies change; a daemon speaking another
+# version (left running by an older install) is replaced
+PROTOCOL_VERSION = 1
+
+DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'daemon.py')
+
+
+def socket_path() -> str:
+    """Where the daemon listens: ``$FILEFLOW_SOCKET``, else the user's runtime directory."""
+    path = os.environ.get('FILEFLOW_SOCKET')
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'fileflow.sock')
+    return os.path.join(cache_dir(), 'daemon.sock')
+
+
+class DaemonError(RuntimeError):
+    """The daemon could not be reached or reported an error."""
+
+
+class _Pending:
+    def __init__(self):
+        self.event = threading.Event()
+        self.reply: Optional[dict] = None
+
+
+class DaemonClient:
+    """Connection to the search daemon, started on demand.
+
+    Requests are newline-delimited JSON objects carrying an ``id``; replies
+    come back with the same ``id``, so several threads can wait on one
+    connection at once. Every connection is one client to the daemon: its
+    newest search supersedes the previous one and "more" pages through it.
+
+    Args:
+        path: Socket path, see ``socket_path``
+        autostart: Start the daemon when nothing listens on ``path``
+        timeout: Longest wait for any reply, in seconds
+    """
+
+    def __init__(self, path: Optional[str] = None, autostart: bool = True, timeout: float = 30):
+        self.path = path or socket_path()
+        self.autostart = autostart
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._pending: Dict[int, _Pending] = {}
+        self._ids = itertools.count(1)
+        # Settings sent with configure, sent again to a restarted daemon
+        self.settings: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _connect_once(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _start_daemon(self):
+        logger.info("Starting search daemon on %s", self.path)
+        log = open(os.path.join(cache_dir(), 'daemon.log'), 'ab')
+        try:
+            subprocess.Popen([sys.executable, DAEMON_SCRIPT, '--socket', self.path],
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                             start_new_session=True, close_fds=True)
+        finally:
+            log.close()
+
+    def _connect(self) -> socket.socket:
+        try:
+            return self._connect_once()
+        except OSError:
+            if not self.autostart:
+                raise DaemonError(f"Search daemon not running on {self.path}")
+        self._start_daemon()
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                return self._connect_once()
+            except OSError as e:
+                if time.monotonic() > deadline:
+                    raise DaemonError(f"Search daemon did not start: {e}")
+                time.sleep(0.02)
+
+    def _ensure_connected(self) -> socket.socket:
+        with self._lock:
+            if self._sock is not None:
+                return self._sock
+            sock = self._connect()
+            self._sock = sock
+        threading.Thread(target=self._read_replies, args=(sock,), name='daemon-client', daemon=True).start()
+        reply = self._call(sock, {'op': 'ping'}, None)
+        if reply.get('protocol') != PROTOCOL_VERSION and self.autostart:
+            logger.info("Replacing search daemon speaking protocol %s", reply.get('protocol'))
+            try:
+                self._call(sock, {'op': 'stop'}, None)
+            except DaemonError:
+                pass
+            self._disconnect(sock)
+            # The old daemon removes its socket on the way out
+            deadline = time.monotonic() + 5
+            while os.path.exists(self.path) and time.monotonic() < deadline:
+                time.sleep(0.02)
+            return self._ensure_connected()
+        if self.settings:
+            self._call(sock, dict(self.settings, op='configure'), None)
+        return sock
+
+    def _read_replies(self, sock: socket.socket):
+        try:
+            for line in sock.makefile('rb'):
+                try:
+                    reply = json.loads(line)
+                except ValueError:
+                    logger.warning("Malformed reply from daemon: %r", line[:200])
+                    continue
+                with self._lock:
+                    pending = self._pending.pop(reply.get('id'), None)
+                if pending is not None:
+                    pending.reply = reply
+                    pending.event.set()
+        except OSError:
+            pass
+        self._disconnect(sock)
+
+    def _disconnect(self, sock: socket.socket):
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter.event.set()
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _call(self, sock: socket.socket, request: dict, token: Optional[CancelToken]) -> dict:
+        request_id = next(self._ids)
+        waiter = _Pending()
+        with self._lock:
+            self._pending[request_id] = waiter
+        data = (json.dumps(dict(request, id=request_id)) + '\n').encode()
+        try:
+            with self._write_lock:
+                sock.sendall(data)
+        except OSError as e:
+            self._disconnect(sock)
+            raise DaemonError(f"Lost connection to search daemon: {e}")
+
+        deadline = time.monotonic() + self.timeout
+        # Polling lets a cancelled token stop the wait without a callback
+        while not waiter.event.wait(0.05):
+            if token is not None and token.cancelled:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                self._send_quietly(sock, {'op': 'cancel', 'request': request_id})
+                raise SearchCancelled()
+            if time.monotonic() > deadline:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                raise DaemonError(f"Search daemon did not answer within {self.timeout:.0f}s")
+        reply = waiter.reply
+        if reply is None:
+            raise DaemonError("Lost connection to search daemon")
+        if reply.get('cancelled'):
+            raise SearchCancelled()
+        if not reply.get('ok'):
+            raise DaemonError(reply.get('error') or 'Unknown daemon error')
+        return reply
+
+    def _send_quietly(self, sock: socket.socket, request: dict):
+        data = (json.dumps(dict(request, id=next(self._ids))) + '\n').encode()
+        try:
+            with self._write_lock:
+                sock.sendall(data)
+        except OSError:
+            pass
+
+    def request(self, op: str, token: Optional[CancelToken] = None, **params) -> dict:
+        """Send one request and wait for its reply.
+
+        A daemon that went away (e.g. restarted) is reconnected to once.
+        Cancelling ``token`` stops the wait, cancels the request in the
+        daemon and raises ``SearchCancelled``.
+        """
+        for attempt in range(2):
+            sock = self._ensure_connected()
+            try:
+                return self._call(sock, dict(params, op=op), token)
+            except DaemonError:
+                if attempt or self._sock is sock:
+                    raise
+        raise DaemonError("Lost connection to search daemon")
+
+    @staticmethod
+    def _entries(reply: dict) -> Tuple[List[Tuple[str, Optional[bool]]], bool, Dict[str, Tuple[int, str]]]:
+        snippets = {path: (line, text) for path, (line, text) in reply.get('snippets', {}).items()}
+        return [(path, is_dir) for path, is_dir in reply['entries']], reply['more'], snippets
+
+    def search(self, query: str, limit: Optional[int] = None, token: Optional[CancelToken] = None
+               ) -> Tuple[List[Tuple[str, Optional[bool]]], bool, Dict[str, Tuple[int, str]]]:
+        """Run ``query``.
+
+        Returns:
+            Its (path, is_dir) entries, whether more can follow, and for a
+            content search the (line number, text) of the match in each file
+        """
+        return self._entries(self.request('search', token, query=query, limit=limit))
+
+    def more(self, token: Optional[CancelToken] = None
+             ) -> Tuple[Optional[List[Tuple[str, Optional[bool]]]], bool, Dict[str, Tuple[int, str]]]:
+        """Next page of the last search, like ``search``; the entries are None if it expired."""
+        reply = self.request('more', token)
+        if reply.get('expired'):
+            return None, False, {}
+        return self._entries(reply)
+
+    def configure(self, **settings):
+        """Change daemon-wide settings: ``limit``, ``backend``, ``locate_backend`` and ``watch_budget``."""
+        self.settings.update(settings)
+        self.request('configure', **settings)
+
+    def stats(self) -> dict:
+        return self.request('stats')
+
+    def apps(self, file_path: str, is_dir: Optional[bool], commands: List[str]) -> dict:
+        """Which of ``commands`` are installed, and the applications registered for the file."""
+        return self.request('apps', path=file_path, is_dir=is_dir, commands=commands)
+
+    def close(self):
+        sock = self._sock
+        if sock is not None:
+            self._disconnect(sock)
+
+
+def _print_entries(entries, snippets, as_json: bool):
+    if as_json:
+        rows = []
+        for path, is_dir in entries:
+            row = {'path': path, 'is_dir': is_dir}
+            if path in snippets:
+                row['line'], row['text'] = snippets[path]
+            rows.append(row)
+        print(json.dumps(rows))
+    else:
+        for path, _ in entries:
+            if path in snippets:
+                print(f"{path}:{snippets[path][0]}:{snippets[path][1]}")
+            else:
+                print(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the FileFlow search daemon')
+    parser.add_argument('--socket', help='daemon socket (default: %(default)s)', default=socket_path())
+    parser.add_argument('--no-start', action='store_true', help='fail instead of starting the daemon')
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help='print the paths matching a query')
+    search.add_argument('query', nargs='+')
+    search.add_argument('--limit', type=int)
+    search.add_argument('--pages', type=int, default=1, help='also print the next N-1 pages')
+    search.add_argument('--json', action='store_true', help='print path, type and any matching line as JSON')
+    search.add_argument('--repeat', type=int, default=1,
+                        help='run the query N times and print latency percentiles to stderr')
+    commands.add_parser('stats', help='print per-stage timings and unhealthy mounts as JSON')
+    commands.add_parser('ping', help='print daemon status as JSON')
+    commands.add_parser('stop', help='stop the daemon')
+    args = parser.parse_args()
+
+    client = DaemonClient(args.socket, autostart=not args.no_start and args.command != 'stop')
+    try:
+        if args.command == 'search':
+            query = ' '.join(args.query)
+            samples = []
+            for _ in range(max(1, args.repeat)):
+                started = time.perf_counter()
+                entries, has_more, snippets = client.search(query, args.limit)
+                samples.append((time.perf_counter() - started) * 1000)
+            for _ in range(args.pages - 1):
+                if not has_more:
+                    break
+                page, has_more, page_snippets = client.more()
+                if not page:
+                    break
+                entries.extend(page)
+                snippets.update(page_snippets)
+            _print_entries(entries, snippets, args.json)
+            if args.repeat > 1:
+                samples.sort()
+                print(f"{len(samples)} runs: p50 {samples[len(samples) // 2]:.2f} ms, "
+                      f"p95 {samples[min(len(samples) - 1, int(len(samples) * 0.95))]:.2f} ms, "
+                      f"max {samples[-1]:.2f} ms", file=sys.stderr)
+        elif args.command in ('stats', 'ping'):
+            reply = client.request(args.command)
+            reply.pop('id', None)
+            reply.pop('ok', None)
+            print(json.dumps(reply, indent=2))
+        elif args.command == 'stop':
+            client.request('stop')
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import mmap
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# A content match: line number (from 1) and the text of that line around the match
+Match = Tuple[int, str]
+
+# Files with a NUL byte in their first bytes are treated as binary, as grep does
+BINARY_PROBE = 8192
+SNIPPET_CHARS = 120
+# Characters of context kept before the match when a line is cut
+SNIPPET_LEAD = 40
+
+
+def text_regex(text: str) -> 're.Pattern':
+    """Case-insensitive regex for ``text`` as a phrase within one line.
+
+    Words may be separated by any run of spaces and tabs. Case folding of
+    byte patterns is ASCII only, so other letters must match exactly.
+    """
+    words = [re.escape(word.encode('utf-8', 'surrogateescape')) for word in text.split()]
+    return re.compile(rb'[ \t]+'.join(words), re.IGNORECASE)
+
+
+def find_match(buf, regex: 're.Pattern') -> Optional[Match]:
+    """The first match of ``regex`` in ``buf`` (bytes or an mmap) with its line."""
+    m = regex.search(buf)
+    if m is None:
+        return None
+    line_start = buf.rfind(b'\n', 0, m.start()) + 1
+    line_end = buf.find(b'\n', m.end())
+    if line_end == -1:
+        line_end = len(buf)
+    line_no = buf[:line_start].count(b'\n') + 1
+    # Long lines (minified code, CSV) are cut around the match
+    start = max(line_start, m.start() - SNIPPET_LEAD)
+    end = min(line_end, start + SNIPPET_CHARS)
+    snippet = buf[start:end].decode('utf-8', 'replace').replace('\t', ' ').strip()
+    if start > line_start:
+        snippet = '…' + snippet
+    if end < line_end:
+        snippet += '…'
+    return line_no, snippet
+
+
+class _Scanned:
+    """What is known about one version of a file."""
+    __slots__ = ('binary', 'text', 'matches')
+
+    def __init__(self, binary: bool, text: Optional[bytes]):
+        self.binary = binary
+        # The whole content, kept for small text files only
+        self.text = text
+        # Result per regex pattern, for queries repeated as-is
+        self.matches: Dict[bytes, Optional[Match]] = {}
+
+
+class ContentScanner:
+    """Finds text in files through ``mmap``, remembering recently scanned files.
+
+    Files are recognized by device, inode, mtime and size, so a file
+    modified since is read again while a renamed one is not. Up to
+    ``cache_bytes`` of small text files are kept in memory, which lets
+    as-you-type queries (each a longer phrase) skip rereading them; binary
+    files are remembered as such without their content. Safe to use from
+    several threads.
+
+    Args:
+        max_size: Larger files are never read
+        cache_file_bytes: Larger text files are read again for every new query
+    """
+
+    def __init__(self, max_size: int = 10 << 20, cache_bytes: int = 64 << 20,
+                 cache_file_bytes: int = 256 << 10, max_entries: int = 50000):
+        self.max_size = max_size
+        self.cache_bytes = cache_bytes
+        self.cache_file_bytes = cache_file_bytes
+        self.max_entries = max_entries
+        self._files: "OrderedDict[Tuple[int, int, int, int], _Scanned]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def search(self, path: str, regex: 're.Pattern') -> Optional[Match]:
+        """The first match of ``regex`` in the file at ``path``.
+
+        Returns None as well for binary, empty, oversized, special and
+        unreadable files.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0 or st.st_size > self.max_size:
+            return None
+        key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            scanned = self._files.get(key)
+            if scanned is not None:
+                self._files.move_to_end(key)
+                if scanned.binary:
+                    return None
+                if regex.pattern in scanned.matches:
+                    return scanned.matches[regex.pattern]
+        if scanned is not None and scanned.text is not None:
+            match = find_match(scanned.text, regex)
+        else:
+            try:
+                scanned, match = self._read(path, st.st_size, regex)
+            except (OSError, ValueError):
+                # Gone, unreadable, or truncated to nothing since the stat
+                return None
+        with self._lock:
+            # Each keystroke is a new pattern; only the last few are worth keeping
+            if len(scanned.matches) >= 8:
+                scanned.matches.clear()
+            scanned.matches[regex.pattern] = match
+            self._store(key, scanned)
+        return match
+
+    def _read(self, path: str, size: int, regex: 're.Pattern') -> Tuple[_Scanned, Optional[Match]]:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b'\0', 0, BINARY_PROBE) != -1:
+                return _Scanned(True, None), None
+            match = find_match(mm, regex)
+            text = mm[:] if size <= self.cache_file_bytes else None
+        return _Scanned(False, text), match
+
+    def _store(self, key: Tuple[int, int, int, int], scanned: _Scanned):
+        previous = self._files.get(key)
+        if previous is not scanned:
+            if previous is not None:
+                self._size -= len(previous.text or b'')
+            self._files[key] = scanned
+            self._size += len(scanned.text or b'')
+        self._files.move_to_end(key)
+        while (self._size > self.cache_bytes or len(self._files) > self.max_entries) and len(self._files) > 1:
+            _, evicted = self._files.popitem(last=False)
+            self._size -= len(evicted.text or b'')
@@ -0,0 +1,268 @@
+"""FileFlow search daemon.
+
+Hosts one ``Locator`` (with its mount indexes, locate database, caches and
+health history) and the application index for every client, so they stay
+warm across Ulauncher extension reloads. Clients talk to it over a Unix
+socket, see ``client.DaemonClient``.
+
+Usage: python daemon.py [--socket PATH] [--no-warm-up]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import fuzzy
+from app_index import AppIndex
+from cancel import CancelToken, SearchCancelled
+from client import PROTOCOL_VERSION, socket_path
+from locator import Locator
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    """State of one client: its in-flight requests and its newest search."""
+
+    def __init__(self, handler: 'RequestHandler'):
+        self.handler = handler
+        self.tokens: Dict[int, CancelToken] = {}
+        self.search_token: Optional[CancelToken] = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def send(self, reply: dict):
+        data = (json.dumps(reply) + '\n').encode()
+        with self.write_lock:
+            try:
+                self.handler.wfile.write(data)
+                self.handler.wfile.flush()
+            except (OSError, ValueError):
+                # The client hung up; its requests get cancelled on the way out
+                pass
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited JSON requests and answers each in its own thread."""
+
+    def handle(self):
+        connection = _Connection(self)
+        server: SearchDaemon = self.server
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('request is not an object')
+                except ValueError as e:
+                    connection.send({'ok': False, 'error': f"Malformed request: {e}"})
+                    continue
+                threading.Thread(target=server.dispatch, args=(connection, request),
+                                 name=f"request-{request.get('op')}", daemon=True).start()
+        finally:
+            with connection.lock:
+                tokens = list(connection.tokens.values())
+            for token in tokens:
+                token.cancel()
+            server.locator.close_session(connection)
+
+
+class SearchDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Answers search requests of any number of concurrent clients.
+
+    A client's newest search cancels its previous one, like keystrokes in
+    the extension; searches of different clients run side by side on the
+    same indexes and caches.
+    """
+    daemon_threads = True
+
+    def __init__(self, path: str, locator: Optional[Locator] = None):
+        self.path = path
+        self.started = time.time()
+        self.locator = locator or Locator()
+        self.app_index = AppIndex()
+        # Set once warm_up finished
+        self.warm = threading.Event()
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(path, RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def warm_up(self, index_timeout: float = 60):
+        """Fill the caches the first search and Open With menu need, in the background.
+
+        The mount table, locate database, directory index and drive indexes
+        come first, then the application index and NumPy for fuzzy search;
+        requests are served meanwhile. ``warm`` is set once the indexes are ready, or
+        after ``index_timeout`` seconds.
+        """
+        def worker():
+            started = time.monotonic()
+            try:
+                indexes = self.locator.warm_up()
+                self.app_index.load()
+                fuzzy.load_numpy()
+                deadline = started + index_timeout
+                for index in indexes:
+                    index.wait_ready(max(0, deadline - time.monotonic()))
+            except Exception as e:
+                logger.exception("Warm-up failed: %s", e)
+            finally:
+                self.warm.set()
+            logger.info("Warm-up finished in %.2fs", time.monotonic() - started)
+
+        threading.Thread(target=worker, name='warm-up', daemon=True).start()
+
+    def dispatch(self, connection: _Connection, request: dict):
+        request_id = request.get('id')
+        op = request.get('op')
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            connection.send({'id': request_id, 'ok': False, 'error': f"Unknown request: {op}"})
+            return
+        token = CancelToken()
+        with connection.lock:
+            connection.tokens[request_id] = token
+        try:
+            reply = handler(connection, request, token)
+            reply.update(id=request_id, ok=True)
+        except SearchCancelled:
+            reply = {'id': request_id, 'ok': False, 'cancelled': True}
+        except Exception as e:
+            logger.warning("%s request failed: %s", op, e)
+            reply = {'id': request_id, 'ok': False, 'error': str(e)}
+        finally:
+            with connection.lock:
+                connection.tokens.pop(request_id, None)
+        connection.send(reply)
+
+    def _page(self, connection: _Connection, entries) -> dict:
+        reply = {'entries': [[path, is_dir] for path, is_dir in entries],
+                 'more': self.locator.has_more(connection)}
+        # Content searches also report the matching line of every file
+        snippets = self.locator.snippets([path for path, _ in entries], connection)
+        if snippets:
+            reply['snippets'] = {path: list(match) for path, match in snippets.items()}
+        return reply
+
+    def op_search(self, connection, request, token):
+        with connection.lock:
+            previous, connection.search_token = connection.search_token, token
+        if previous is not None:
+            previous.cancel()
+        limit = request.get('limit')
+        entries = self.locator.search(request.get('query') or '', token,
+                                      limit=int(limit) if limit else None, owner=connection)
+        return self._page(connection, entries)
+
+    def op_more(self, connection, request, token):
+        entries = self.locator.more(owner=connection)
+        if entries is None:
+            return {'expired': True, 'entries': [], 'more': False}
+        return self._page(connection, entries)
+
+    def op_cancel(self, connection, request, token):
+        with connection.lock:
+            target = connection.tokens.get(request.get('request'))
+        if target is not None:
+            target.cancel()
+        return {}
+
+    def op_configure(self, connection, request, token):
+        if 'limit' in request:
+            self.locator.set_limit(request['limit'])
+        if 'backend' in request:
+            self.locator.set_backend(request['backend'])
+        if 'locate_backend' in request:
+            self.locator.set_locate_backend(request['locate_backend'])
+        if 'watch_budget' in request:
+            self.locator.set_watch_budget(request['watch_budget'])
+        return {}
+
+    def op_stats(self, connection, request, token):
+        stats = self.locator.stats
+        return {
+            'unhealthy': [{'mountpoint': h.mountpoint, 'failures': h.failures, 'skipped': h.is_open}
+                          for h in self.locator.health.unhealthy()],
+            'stages': stats.summary(limit=6, by_key=False),
+            'mounts': stats.summary(limit=6, by_key=True),
+        }
+
+    def op_apps(self, connection, request, token):
+        commands = request.get('commands') or []
+        return {
+            'available': [c for c in commands if self.app_index.has_command(c)],
+            'mime_apps': [[name, argv] for name, argv in
+                          self.app_index.apps_for_file(request['path'], request.get('is_dir'))],
+        }
+
+    def op_ping(self, connection, request, token):
+        indexes = list(self.locator.indexes.values())
+        return {'protocol': PROTOCOL_VERSION, 'pid': os.getpid(),
+                'uptime': time.time() - self.started, 'warm': self.warm.is_set(), 'indexes': len(indexes),
+                'indexed_paths': sum(len(index) for index in indexes),
+                'index_bytes': sum(index.nbytes for index in indexes),
+                'watches': sum(w.watches for w in list(self.locator.watchers.values())),
+                'watch_budget': self.locator.watch_budget.limit}
+
+    def op_stop(self, connection, request, token):
+        logger.info("Stopping on client request")
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return {}
+
+
+def _claim_socket(path: str) -> bool:
+    """Remove a stale socket file; False if a daemon is listening on it."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return False
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FileFlow search daemon')
+    parser.add_argument('--socket', default=socket_path(), help='socket path (default: %(default)s)')
+    parser.add_argument('--no-warm-up', action='store_true',
+                        help='build indexes on the first search instead of at startup')
+    args = parser.parse_args()
+    logging.basicConfig(level=os.environ.get('FILEFLOW_LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    if not _claim_socket(args.socket):
+        logger.info("A daemon is already listening on %s", args.socket)
+        sys.exit(0)
+    try:
+        server = SearchDaemon(args.socket)
+    except OSError as e:
+        # Another daemon started at the same moment
+        logger.info("Cannot listen on %s: %s", args.socket, e)
+        sys.exit(0)
+    logger.info("Listening on %s (pid %d)", args.socket, os.getpid())
+    if not args.no_warm_up:
+        server.warm_up()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(args.socket)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+from locate_db import LocateDatabase, database_paths, database_signature
+from path_index import PathIndex, _StoreBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class _ListingFailed(Exception):
+    """The locate command could not list the directories."""
+
+
+class DirectoryIndex(PathIndex):
+    """Every directory on the system, taken from the locate database.
+
+    The directories are packed like a drive index (see ``PathIndex``) with
+    no files in it, so ``iter_search(pattern, 'directory')`` finds
+    directories by name in a few milliseconds. They are read in-process
+    from ``mlocate.db`` when it is readable; otherwise ``locate /`` is run
+    once and the parent of every path it prints is a directory (empty
+    directories are then missed). The index is rebuilt in the background
+    whenever updatedb replaced the database, and saved to ``db_path`` so a
+    restarted daemon can use it right away.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, locate_paths: Optional[List[str]] = None,
+                 recheck_interval: float = 60, max_age: float = 86400):
+        super().__init__('/', db_path)
+        self.locate_paths = database_paths() if locate_paths is None else locate_paths
+        self.recheck_interval = recheck_interval
+        # updatedb usually runs daily
+        self.max_age = max_age
+        # Where the next build reads the directories from, see refresh
+        self.locate_db: Optional[LocateDatabase] = None
+        self.cmd: Optional[str] = None
+        self._signature = None
+        self._checked = 0.0
+
+    def refresh(self, locate_db: Optional[LocateDatabase], cmd: Optional[str]):
+        """Start a build when the locate database changed since the last one.
+
+        Args:
+            locate_db: In-process reader of the database, if enabled
+            cmd: The locate command, used when the reader cannot help
+        """
+        now = time.monotonic()
+        if self._checked and now - self._checked < self.recheck_interval:
+            return
+        self._checked = now
+        signature = database_signature(self.locate_paths)
+        changed = signature != self._signature or (not signature and time.time() - self.built_at > self.max_age)
+        if not changed or self.building:
+            return
+        self.locate_db, self.cmd = locate_db, cmd
+        if self._store is None and self._saved_is_current(signature):
+            store = self._load_db()
+            if store is not None:
+                self._store = store
+                self._signature = signature
+                self._ready.set()
+                self.built_at = os.stat(self.db_path).st_mtime
+                logger.info("Loaded saved directory index: %d directories", len(self))
+                return
+        self._signature = signature
+        self.build_async()
+
+    def build(self):
+        try:
+            super().build()
+        except _ListingFailed as e:
+            # Nothing is saved, and the next refresh tries again
+            self._signature = None
+            logger.warning("Cannot build the directory index: %s", e)
+
+    def _load_db(self):
+        store = super()._load_db()
+        # An empty index was most likely built while locate was failing
+        return store if store is not None and store.count > 1 else None
+
+    def _saved_is_current(self, signature) -> bool:
+        """Whether the saved index was written after the locate database.
+
+        Where no database file is known (only the command knows where it
+        is), a saved index is trusted for ``max_age`` seconds instead.
+        """
+        if not self.db_path:
+            return False
+        try:
+            saved = os.stat(self.db_path).st_mtime_ns
+        except OSError:
+            return False
+        if not signature:
+            return time.time_ns() - saved < self.max_age * 1e9
+        return all(saved > mtime for _, _, mtime, _ in signature)
+
+    def _directories(self) -> Iterable[str]:
+        locate_db = self.locate_db
+        if locate_db is not None:
+            locate_db.refresh()
+            # Opening the database takes a moment after a daemon start
+            deadline = time.monotonic() + 10
+            while locate_db.loading and time.monotonic() < deadline:
+                time.sleep(0.05)
+            dirs = locate_db.iter_dirs()
+            if dirs is not None:
+                return dirs
+        return self._command_directories()
+
+    def _command_directories(self) -> Set[str]:
+        """Parents of every path ``locate /`` prints.
+
+        Raises:
+            _ListingFailed: When locate is missing or cannot read its database
+        """
+        if not self.cmd:
+            raise _ListingFailed("no locate command")
+        dirs = set()
+        with tempfile.TemporaryFile() as errors:
+            try:
+                proc = subprocess.Popen([self.cmd, '/'], stdout=subprocess.PIPE, stderr=errors,
+                                        text=True, errors='surrogateescape')
+            except OSError as e:
+                raise _ListingFailed(f"{self.cmd}: {e}")
+            with proc:
+                for line in proc.stdout:
+                    dirs.add(line.rstrip('\n').rpartition('/')[0] or '/')
+            errors.seek(0)
+            message = errors.read(4096).decode('utf-8', 'replace').strip()
+        # Exit status 1 alone means no match; with a message, locate failed
+        if proc.returncode > 1 or (proc.returncode == 1 and message):
+            raise _ListingFailed(f"{self.cmd} exited with status {proc.returncode}: {message}")
+        return dirs
+
+    def _walk(self, old):
+        # Children per directory; missing ancestors are added, so the tree is connected
+        children: Dict[str, List[str]] = {'/': []}
+        linked: Set[str] = set()
+        for path in self._directories():
+            path = path.rstrip('/')
+            while path and path not in linked:
+                linked.add(path)
+                parent, _, name = path.rpartition('/')
+                children.setdefault(parent or '/', []).append(name)
+                path = parent
+
+        builder = _StoreBuilder()
+        # Breadth-first, so every directory's children stay contiguous
+        queue = deque([(0, '/')])
+        while queue:
+            idx, dir_path = queue.popleft()
+            # No mtimes: the whole index is replaced after every updatedb
+            builder.add_dir(idx, 0)
+            for name in sorted(children.get(dir_path, ())):
+                child = builder.add(os.fsencode(name), os.fsencode(name.lower()))
+                queue.append((child, os.path.join(dir_path, name)))
+        return builder.serialize(), 0, len(linked)
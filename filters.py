@@ -0,0 +1,204 @@
+import os
+import re
+import stat
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# A search result: the path and whether it is a directory (None if unknown)
+Entry = Tuple[str, Optional[bool]]
+
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+_AGE_UNITS = {'s': 1, 'min': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400, 'y': 365 * 86400}
+
+_EXT = re.compile(r'ext:(?P<value>\S+)', re.IGNORECASE)
+_SIZE = re.compile(r'size(?P<op>[<>]=?)(?P<number>\d+(?:\.\d+)?)(?P<unit>[bkmgt]?)(?:i?b)?', re.IGNORECASE)
+_AGE = re.compile(r'(?P<which>newer|older):(?P<value>\S+)', re.IGNORECASE)
+_TYPE = re.compile(r'type:(?P<value>\S+)', re.IGNORECASE)
+_DURATION = re.compile(r'(?P<number>\d+)(?P<unit>s|min|m|h|d|w|y)?', re.IGNORECASE)
+_EXT_CHARS = re.compile(r'[\w~-]+(?:\+\+?)?')
+_TYPES = {'f': 'file', 'file': 'file', 'd': 'directory', 'dir': 'directory', 'directory': 'directory'}
+
+
+class QueryFilters:
+    """Inline filters of a query: ``ext:pdf``, ``size>100M``, ``newer:7d``, ``type:f``.
+
+    Every search source applies them before a hit counts towards the page,
+    as close to the source as it allows: ``find`` gets them as predicates,
+    the locate pattern is rewritten to the extension, and the index and
+    live walks check names before they stat anything.
+    """
+
+    def __init__(self):
+        # Lowercased extensions without the dot, any of which must match
+        self.extensions: Tuple[str, ...] = ()
+        # Inclusive size bounds in bytes
+        self.min_size: Optional[int] = None
+        self.max_size: Optional[int] = None
+        # Modification time bounds as timestamps: at least newer_than,
+        # before older_than
+        self.newer_than: Optional[float] = None
+        self.older_than: Optional[float] = None
+        # "file", "directory" or None
+        self.type: Optional[str] = None
+        # The filter tokens as typed, used as cache key
+        self.tokens: List[str] = []
+
+    def __bool__(self):
+        return bool(self.tokens)
+
+    @property
+    def key(self) -> str:
+        return ' '.join(sorted(t.lower() for t in self.tokens))
+
+    @property
+    def needs_stat(self) -> bool:
+        return self.min_size is not None or self.max_size is not None or \
+            self.newer_than is not None or self.older_than is not None
+
+    def match_name(self, name: str) -> bool:
+        if not self.extensions:
+            return True
+        return name.lower().endswith(tuple('.' + ext for ext in self.extensions))
+
+    def match_stat(self, st: os.stat_result) -> bool:
+        if self.min_size is not None and st.st_size < self.min_size:
+            return False
+        if self.max_size is not None and st.st_size > self.max_size:
+            return False
+        if self.newer_than is not None and st.st_mtime < self.newer_than:
+            return False
+        if self.older_than is not None and st.st_mtime >= self.older_than:
+            return False
+        return True
+
+    def accept(self, path: str, is_dir: Optional[bool]) -> Optional[Entry]:
+        """The entry if ``path`` passes every filter, else None.
+
+        Names are checked first; the path is only stat'ed for size and
+        time filters, or for ``type:`` when the source did not report it.
+        A stat'ed entry comes back with its type filled in.
+        """
+        if not self.match_name(os.path.basename(path.rstrip('/'))):
+            return None
+        if self.needs_stat or (self.type is not None and is_dir is None):
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if not self.match_stat(st):
+                return None
+            is_dir = stat.S_ISDIR(st.st_mode)
+        if self.type is not None and is_dir != (self.type == 'directory'):
+            return None
+        return path, is_dir
+
+    def apply(self, entries: Iterable[Entry]) -> Iterator[Entry]:
+        """Lazily keep the entries passing every filter."""
+        for path, is_dir in entries:
+            entry = self.accept(path, is_dir)
+            if entry is not None:
+                yield entry
+
+    def find_args(self) -> List[str]:
+        """The filters as ``find`` predicates (the type is set by the caller)."""
+        args = []
+        if self.extensions:
+            names = []
+            for ext in self.extensions:
+                names.extend(['-o', '-iname', f"*.{ext}"])
+            args.extend(['('] + names[1:] + [')'])
+        # -size +Nc is "more than N bytes", -size -Nc "less than N bytes";
+        # find rejects negative sizes, so bounds every file meets are left out
+        if self.min_size is not None and self.min_size > 0:
+            args.extend(['-size', f"+{self.min_size - 1}c"])
+        if self.max_size is not None:
+            args.extend(['-size', f"-{self.max_size + 1}c"] if self.max_size >= 0 else ['-false'])
+        if self.newer_than is not None:
+            args.extend(['-newermt', f"@{self.newer_than:.0f}"])
+        if self.older_than is not None:
+            args.extend(['!', '-newermt', f"@{self.older_than:.0f}"])
+        return args
+
+    def locate_args(self, pattern: str) -> List[str]:
+        """``locate`` arguments matching ``pattern`` and, where locate can
+        express it, the extension; the rest is left to ``accept``."""
+        if len(self.extensions) == 1:
+            # A glob matches the whole path, so this one anchors at the end
+            suffix = f"*.{self.extensions[0]}"
+            return ['-A', pattern, suffix] if pattern else [suffix]
+        if self.extensions and not pattern:
+            return ['--regex', r'\.(' + '|'.join(e.replace('+', '[+]') for e in self.extensions) + ')$']
+        # Every path contains a slash
+        return [pattern or '/']
+
+    def index_needle(self, pattern: str) -> str:
+        """Substring to search the indexes for: the pattern, or the extension
+        when there is only one and no pattern."""
+        if not pattern and len(self.extensions) == 1:
+            return '.' + self.extensions[0]
+        return pattern
+
+
+def _parse_age(value: str, now: float) -> float:
+    """Timestamp of ``7d`` (ago), ``2024-01-31`` or ``2024-01-31T08:00``."""
+    m = _DURATION.fullmatch(value)
+    if m:
+        unit = (m.group('unit') or 'd').lower()
+        return now - int(m.group('number')) * _AGE_UNITS['min' if unit in ('m', 'min') else unit]
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M'):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def parse_filters(pattern: str, now: Optional[float] = None) -> Tuple[str, QueryFilters]:
+    """Split the filter tokens off a search pattern.
+
+    Returns:
+        The rest of the pattern, and its filters
+
+    Raises:
+        RuntimeError: For a filter token with an invalid value, e.g. ``type:x``
+    """
+    now = time.time() if now is None else now
+    filters = QueryFilters()
+    rest = []
+    for token in pattern.split():
+        try:
+            if _EXT.fullmatch(token):
+                exts = [e.lstrip('.').lower() for e in _EXT.fullmatch(token).group('value').split(',')]
+                if not all(_EXT_CHARS.fullmatch(e) for e in exts):
+                    raise ValueError(token)
+                filters.extensions += tuple(e for e in exts if e not in filters.extensions)
+            elif _SIZE.fullmatch(token):
+                m = _SIZE.fullmatch(token)
+                size = int(float(m.group('number')) * _SIZE_UNITS[m.group('unit').lower()])
+                op = m.group('op')
+                if op == '>':
+                    filters.min_size = size + 1
+                elif op == '>=':
+                    filters.min_size = size
+                elif op == '<':
+                    filters.max_size = size - 1
+                else:
+                    filters.max_size = size
+            elif _AGE.fullmatch(token):
+                m = _AGE.fullmatch(token)
+                stamp = _parse_age(m.group('value'), now)
+                if m.group('which').lower() == 'newer':
+                    filters.newer_than = stamp
+                else:
+                    filters.older_than = stamp
+            elif _TYPE.fullmatch(token):
+                filters.type = _TYPES[_TYPE.fullmatch(token).group('value').lower()]
+            elif token.lower().startswith(('ext:', 'size<', 'size>', 'newer:', 'older:', 'type:')):
+                raise ValueError(token)
+            else:
+                rest.append(token)
+                continue
+        except (ValueError, KeyError):
+            raise RuntimeError(f"Invalid filter: {token}")
+        filters.tokens.append(token)
+    return ' '.join(rest), filters
@@ -0,0 +1,207 @@
+import heapq
+import re
+import threading
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+# NumPy is optional and takes a while to import, so it is loaded on first use
+numpy = None
+_numpy_loaded = False
+
+# Bytes after which a match starts a new word, e.g. "r" in "q3_report"
+SEPARATORS = b' _-.,+()[]{}/\\'
+
+# Score weights, per matched character
+MATCH = 10
+WORD_START = 8
+CONSECUTIVE = 6
+GAP = 1
+NAME_START = 15
+
+# Positions of each byte value in a store's names, per store; as-you-type
+# queries keep asking for the same few letters
+HITS_CACHE_BYTES = 32 << 20
+_hits_cache: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_hits_lock = threading.Lock()
+
+
+def load_numpy():
+    """Import NumPy once; None when it is not installed."""
+    global numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        numpy = np
+        _numpy_loaded = True
+    return numpy
+
+
+def normalize(pattern: str) -> bytes:
+    """The pattern as matched against the lowercased, NUL-separated names."""
+    return ''.join(pattern.lower().split()).encode('utf-8', 'surrogateescape')
+
+
+def subsequence_regex(needle: bytes) -> 're.Pattern':
+    """Regex finding the leftmost, shortest-gapped occurrence of ``needle``'s
+    characters in order within one name, one group per character."""
+    chars = needle.decode('utf-8', 'surrogateescape')
+    parts = [b'(' + re.escape(c.encode('utf-8', 'surrogateescape')) + b')' for c in chars]
+    return re.compile(b'[^\0]*?'.join(parts))
+
+
+def score_one(name: bytes, positions: Sequence[int]) -> float:
+    """Score one name given where each pattern character matched in it."""
+    value = MATCH * len(positions)
+    previous = -2
+    for p in positions:
+        if p == 0 or name[p - 1] in SEPARATORS:
+            value += WORD_START
+        if p == previous + 1:
+            value += CONSECUTIVE
+        previous = p
+    value -= GAP * (positions[-1] - positions[0] + 1 - len(positions))
+    if positions[0] == 0:
+        value += NAME_START
+    # Between equal matches, earlier and shorter names first
+    return value - 0.5 * min(positions[0], 10) - 0.05 * len(name)
+
+
+class FuzzyScan:
+    """Fuzzy subsequence matches over the names of one ``path_index._Store``.
+
+    The store keeps every lowercased basename in one NUL-separated buffer
+    with an offset per entry. With NumPy the greedy match of all names runs
+    as a handful of array operations per pattern character (one
+    ``searchsorted`` of every name's current position into the positions
+    of that character), followed by vectorized scoring and an
+    ``argpartition`` for the top ``k``. Without NumPy a subsequence regex
+    is run over the buffer and matches are scored one by one.
+    """
+
+    def __init__(self, store, search_type: Optional[str] = None):
+        self.store = store
+        self.search_type = search_type
+
+    def top(self, needle: bytes, k: int, use_numpy: bool = True) -> List[Tuple[float, int]]:
+        """The ``k`` best (score, entry) pairs, best first."""
+        if not needle or k <= 0 or self.store.count <= 1:
+            return []
+        # Byte-wise matching would let the bytes of one character match apart
+        if use_numpy and needle.isascii() and load_numpy() is not None:
+            return self._top_numpy(needle, k)
+        return self._top_regex(needle, k)
+
+    def _wanted(self, i: int) -> bool:
+        return self.search_type is None or self.store.is_dir(i) == (self.search_type == 'directory')
+
+    def _top_regex(self, needle: bytes, k: int) -> List[Tuple[float, int]]:
+        store = self.store
+        buf = store.buf
+        base = store.lower_start
+        end = store.lower_end
+        offsets = store.offsets
+        regex = subsequence_regex(needle)
+        scored = []
+        # Skip the root entry
+        pos = base + offsets[1]
+        while True:
+            m = regex.search(buf, pos, end)
+            if m is None:
+                break
+            i = bisect_right(offsets, m.start() - base) - 1
+            start = base + offsets[i]
+            if self._wanted(i):
+                name = buf[start:base + offsets[i + 1] - 1]
+                scored.append((score_one(name, [s - start for s, _ in m.regs[1:]]), -i))
+            if i + 1 >= store.count:
+                break
+            pos = base + offsets[i + 1]
+        return [(value, -neg) for value, neg in heapq.nlargest(k, scored)]
+
+    def _hits(self, text, byte: int):
+        """Sorted positions of ``byte`` in the names buffer, cached per store."""
+        with _hits_lock:
+            cache = _hits_cache.setdefault(self.store, OrderedDict())
+            hits = cache.get(byte)
+            if hits is not None:
+                cache.move_to_end(byte)
+                return hits
+        hits = numpy.flatnonzero(text == byte).astype(numpy.int32)
+        with _hits_lock:
+            cache[byte] = hits
+            while sum(h.nbytes for h in cache.values()) > HITS_CACHE_BYTES and len(cache) > 1:
+                cache.popitem(last=False)
+        return hits
+
+    def _top_numpy(self, needle: bytes, k: int) -> List[Tuple[float, int]]:
+        np = numpy
+        store = self.store
+        text = np.frombuffer(store.buf, dtype=np.uint8, count=store.lower_end - store.lower_start,
+                             offset=store.lower_start)
+        # Offsets fit in 32 bits, and searchsorted is fastest on equal types
+        offsets = np.frombuffer(store.offsets, dtype=np.uint32).astype(np.int32)
+        # Entry numbers still matching, and where each one continues
+        entries = np.arange(1, store.count, dtype=np.int32)
+        starts = offsets[1:-1]
+        ends = offsets[2:] - 1
+        cursor = starts
+        positions = []
+        for byte in needle:
+            hits = self._hits(text, byte)
+            j = np.searchsorted(hits, cursor)
+            ok = j < len(hits)
+            pos = hits[np.minimum(j, len(hits) - 1)] if len(hits) else cursor
+            ok &= pos < ends
+            entries, starts, ends, pos = entries[ok], starts[ok], ends[ok], pos[ok]
+            positions = [p[ok] for p in positions]
+            positions.append(pos)
+            cursor = pos + 1
+            if not len(entries):
+                return []
+
+        if self.search_type is not None:
+            dir_idx = np.frombuffer(store.dir_idx, dtype=np.uint32).astype(np.int32)
+            d = np.minimum(np.searchsorted(dir_idx, entries), len(dir_idx) - 1)
+            ok = (dir_idx[d] == entries) == (self.search_type == 'directory')
+            entries, starts, ends = entries[ok], starts[ok], ends[ok]
+            positions = [p[ok] for p in positions]
+            if not len(entries):
+                return []
+
+        separators = np.zeros(256, dtype=bool)
+        separators[list(SEPARATORS)] = True
+        matrix = np.stack(positions, axis=1).astype(np.int64)
+        rel = matrix - starts[:, None]
+        word_start = (rel == 0) | separators[text[np.maximum(matrix - 1, 0)]]
+        consecutive = np.diff(matrix, axis=1) == 1
+        span = matrix[:, -1] - matrix[:, 0] + 1
+        scores = (MATCH * len(needle) + WORD_START * word_start.sum(axis=1)
+                  + CONSECUTIVE * consecutive.sum(axis=1) - GAP * (span - len(needle))
+                  + NAME_START * (rel[:, 0] == 0)
+                  - 0.5 * np.minimum(rel[:, 0], 10) - 0.05 * (ends - starts))
+        if len(scores) > k:
+            # Every entry tied with the k-th best, so the ties are broken below
+            # the same way as in _top_regex rather than arbitrarily
+            kth = -np.partition(-scores, k - 1)[k - 1]
+            best = np.flatnonzero(scores >= kth)
+        else:
+            best = np.arange(len(scores))
+        # Best first, and by entry number (breadth-first, so shallow first) on ties
+        best = best[np.lexsort((entries[best], -scores[best]))][:k]
+        return [(float(scores[b]), int(entries[b])) for b in best]
+
+
+def top_names(names: Sequence[Tuple[bytes, int]], needle: bytes, k: int) -> List[Tuple[float, int]]:
+    """Fuzzy match a few loose (lowercased name, key) pairs, e.g. an index overlay."""
+    regex = subsequence_regex(needle)
+    scored = []
+    for name, key in names:
+        m = regex.search(name)
+        if m is not None:
+            scored.append((score_one(name, [s for s, _ in m.regs[1:]]), key))
+    return heapq.nlargest(k, scored)
+
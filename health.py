@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from stats import RollingHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class MountHealth:
+    """Latency and failure history of one mount.
+
+    A mount that times out is skipped ("open circuit") for a cooldown that
+    doubles with every consecutive timeout. A background probe that lists
+    the mount root ends the cooldown early once the drive answers. Either
+    way the next search gets a short timeout, and only a search that
+    finishes in time clears the failures.
+    """
+
+    def __init__(self, mountpoint: str):
+        self.mountpoint = mountpoint
+        self.latency = RollingHistogram(32)
+        # Consecutive timeouts
+        self.failures = 0
+        self.open_until = 0.0
+        self.last_probe = 0.0
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures > 0 and time.monotonic() < self.open_until
+
+    def timeout(self, max_timeout: float, min_timeout: float, factor: float, retry_timeout: float) -> float:
+        """Time this mount gets before its search is cancelled."""
+        if self.failures:
+            # Half-open: one short attempt after the cooldown
+            return min(max_timeout, retry_timeout)
+        if not self.latency.count:
+            return max_timeout
+        return min(max_timeout, max(min_timeout, self.latency.percentile(95) / 1000 * factor))
+
+
+class HealthMonitor:
+    """Per-mount health used to adapt live search timeouts.
+
+    Args:
+        min_timeout: Lower bound of an adapted timeout, in seconds
+        factor: Timeout as a multiple of the mount's p95 search time
+        retry_timeout: Timeout of the first search after a cooldown
+        cooldown: First cooldown after a timeout; doubles up to max_cooldown
+        probe_timeout: A probe slower than this counts as failed
+    """
+
+    def __init__(self, min_timeout: float = 1, factor: float = 4, retry_timeout: float = 2,
+                 cooldown: float = 30, max_cooldown: float = 600, probe_timeout: float = 2):
+        self.min_timeout = min_timeout
+        self.factor = factor
+        self.retry_timeout = retry_timeout
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self._mounts: Dict[str, MountHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, mountpoint: str) -> MountHealth:
+        with self._lock:
+            health = self._mounts.get(mountpoint)
+            if health is None:
+                health = self._mounts[mountpoint] = MountHealth(mountpoint)
+            return health
+
+    def timeout(self, mountpoint: str, max_timeout: float) -> float:
+        return self.get(mountpoint).timeout(max_timeout, self.min_timeout, self.factor, self.retry_timeout)
+
+    def available(self, mountpoint: str) -> bool:
+        """Whether to search the mount now; probes it in the background if not."""
+        health = self.get(mountpoint)
+        if not health.is_open:
+            return True
+        self._probe(health)
+        return False
+
+    def healthy_path(self, path: str) -> bool:
+        """False if ``path`` lies on a mount that is being skipped."""
+        with self._lock:
+            mounts = list(self._mounts.values())
+        for health in mounts:
+            if health.is_open and (path == health.mountpoint or path.startswith(health.mountpoint.rstrip('/') + '/')):
+                return False
+        return True
+
+    def record_success(self, mountpoint: str, ms: float):
+        health = self.get(mountpoint)
+        health.latency.add(ms)
+        if health.failures:
+            logger.info("%s is responding again", mountpoint)
+        health.failures = 0
+
+    def record_timeout(self, mountpoint: str):
+        health = self.get(mountpoint)
+        health.failures += 1
+        cooldown = min(self.max_cooldown, self.cooldown * 2 ** (health.failures - 1))
+        health.open_until = time.monotonic() + cooldown
+        logger.warning("Skipping %s for %.0fs after %d timeouts", mountpoint, cooldown, health.failures)
+
+    def _probe(self, health: MountHealth):
+        with self._lock:
+            now = time.monotonic()
+            # At most one probe per mount every probe_timeout seconds
+            if health.probing or now - health.last_probe < self.probe_timeout:
+                return
+            health.probing = True
+            health.last_probe = now
+
+        def worker():
+            started = time.monotonic()
+            try:
+                with os.scandir(health.mountpoint) as it:
+                    next(it, None)
+                elapsed = time.monotonic() - started
+                if elapsed <= self.probe_timeout:
+                    logger.debug("Probe of %s answered in %.2fs", health.mountpoint, elapsed)
+                    health.open_until = 0.0
+                else:
+                    logger.debug("Probe of %s took %.1fs", health.mountpoint, elapsed)
+            except OSError as e:
+                logger.debug("Probe of %s failed: %s", health.mountpoint, e)
+            finally:
+                # A probe stuck on a dead mount blocks only its own thread
+                health.probing = False
+
+        threading.Thread(target=worker, name=f"probe:{health.mountpoint}", daemon=True).start()
+
+    def unhealthy(self) -> List[MountHealth]:
+        with self._lock:
+            return [h for h in self._mounts.values() if h.failures]
+
+    def prune(self, mountpoints: List[str]):
+        """Forget mounts that are gone, so a remounted drive starts afresh."""
+        keep = set(mountpoints)
+        with self._lock:
+            for mountpoint in list(self._mounts):
+                if mountpoint not in keep:
+                    del self._mounts[mountpoint]
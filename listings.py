@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+# (name, is_dir, is_file) of one directory entry, symlinks not followed
+Listing = List[Tuple[str, bool, bool]]
+
+
+class ListingCache:
+    """Directory listings recently read by live searches.
+
+    As-you-type queries walk the same directories again, often a level
+    deeper than the previous query got within its time budget. Listings
+    younger than ``ttl`` seconds are reused instead of being read again,
+    which matters most on network mounts where every read is a round trip.
+    """
+
+    def __init__(self, max_entries: int = 200000, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._listings: "OrderedDict[str, Tuple[float, Listing]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def list(self, path: str) -> Listing:
+        """Entries of directory ``path``; raises OSError like ``os.scandir``."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None and now - cached[0] <= self.ttl:
+                self._listings.move_to_end(path)
+                return cached[1]
+
+        listing = []
+        with os.scandir(path) as it:
+            for entry in it:
+                # DirEntry already knows the type so no stat calls
+                try:
+                    listing.append((entry.name, entry.is_dir(follow_symlinks=False),
+                                    entry.is_file(follow_symlinks=False)))
+                except OSError:
+                    continue
+
+        with self._lock:
+            previous = self._listings.pop(path, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._listings[path] = (now, listing)
+            self._size += len(listing)
+            while self._size > self.max_entries and len(self._listings) > 1:
+                _, (_, evicted) = self._listings.popitem(last=False)
+                self._size -= len(evicted)
+        return listing
+
+    def invalidate(self):
+        with self._lock:
+            self._listings.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._listings)
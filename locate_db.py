@@ -0,0 +1,279 @@
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MLOCATE_MAGIC = b'\0mlocate'
+PLOCATE_MAGIC = b'\0plocate'
+DEFAULT_PATHS = ['/var/lib/mlocate/mlocate.db', '/var/lib/plocate/plocate.db']
+
+# magic, configuration block size, format version, visibility flag, padding
+_HEADER = struct.Struct('>8sIBBxx')
+# Directory header: mtime seconds, nanoseconds, padding
+_DIR_HEADER_SIZE = 16
+# Entry type bytes
+_FILE, _DIR, _END = 0, 1, 2
+
+
+class _MlocateFile:
+    """Memory-mapped ``mlocate.db`` (see mlocate.db(5)).
+
+    The file is a sequence of directories, each a header, the directory path
+    and its entries (a type byte and a basename) ended by an end marker.
+    Opening records where every directory starts so a match found anywhere
+    in the buffer can be mapped back to its directory with one bisect.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self.buf
+        magic, conf_size, version, visibility = _HEADER.unpack_from(buf, 0)
+        if magic != MLOCATE_MAGIC or version != 0:
+            raise ValueError('not an mlocate database')
+        self.path = path
+        self.require_visibility = bool(visibility)
+        root_end = buf.find(b'\0', _HEADER.size)
+        if root_end < 0:
+            raise ValueError('truncated mlocate database')
+        self.data_start = root_end + 1 + conf_size
+
+        # Header offset, first entry offset and end marker offset per directory
+        self.dir_starts = array('Q')
+        self.entries_starts = array('Q')
+        self.dir_ends = array('Q')
+        size = len(buf)
+        pos = self.data_start
+        while pos + _DIR_HEADER_SIZE < size:
+            path_end = buf.find(b'\0', pos + _DIR_HEADER_SIZE)
+            if path_end < 0:
+                break
+            # The end marker follows a NUL: the last name's or the path's own
+            end = buf.find(b'\0\x02', path_end)
+            while end >= 0 and end + 2 < size and buf[end + 2 + _DIR_HEADER_SIZE:end + 3 + _DIR_HEADER_SIZE] != b'/':
+                # A basename starting with \x02; the next header must hold a path
+                end = buf.find(b'\0\x02', end + 1)
+            if end < 0:
+                break
+            self.dir_starts.append(pos)
+            self.entries_starts.append(path_end + 1)
+            self.dir_ends.append(end + 1)
+            pos = end + 2
+
+    def __len__(self):
+        return len(self.dir_starts)
+
+    def close(self):
+        self.buf.close()
+
+    def iter_dirs(self) -> Iterator[str]:
+        """Path of every directory in the database, as ``locate`` would show them."""
+        buf = self.buf
+        visible = {}
+        for d in range(len(self.dir_starts)):
+            path = os.fsdecode(buf[self.dir_starts[d] + _DIR_HEADER_SIZE:self.entries_starts[d] - 1])
+            if self.require_visibility:
+                # A directory is listed by locate if its parent may be read
+                parent = os.path.dirname(path)
+                if parent not in visible:
+                    visible[parent] = os.access(parent, os.R_OK | os.X_OK)
+                if not visible[parent]:
+                    continue
+            yield path
+
+    def _entry(self, d: int, hit: int) -> Tuple[int, int]:
+        """Start and type of the entry of directory ``d`` containing offset ``hit``."""
+        buf = self.buf
+        p = buf.rfind(b'\0', self.entries_starts[d] - 1, hit)
+        if buf[p - 1] == 0:
+            # p is the type byte of a file, right after the previous NUL
+            return p + 1, _FILE
+        return p + 2, buf[p + 1]
+
+    def iter_search(self, needle: bytes, search_type: Optional[str],
+                    cancelled: Optional[Callable[[], bool]]) -> Iterator[Tuple[str, bool]]:
+        buf = self.buf
+        regex = re.compile(re.escape(needle), re.IGNORECASE)
+        wanted = {None: (_FILE, _DIR), 'file': (_FILE,), 'directory': (_DIR,)}[search_type]
+        visible = {}
+        pos = self.data_start
+        while True:
+            if cancelled is not None and cancelled():
+                return
+            m = regex.search(buf, pos)
+            if m is None:
+                return
+            hit = m.start()
+            d = bisect_right(self.dir_starts, hit) - 1
+            if d < 0 or hit < self.dir_starts[d] + _DIR_HEADER_SIZE or hit >= self.dir_ends[d]:
+                # Binary directory header
+                pos = hit + 1
+                continue
+            entries_start = self.entries_starts[d]
+
+            dir_path = buf[self.dir_starts[d] + _DIR_HEADER_SIZE:entries_start - 1]
+            if self.require_visibility:
+                if d not in visible:
+                    visible[d] = os.access(dir_path, os.R_OK | os.X_OK)
+                if not visible[d]:
+                    pos = self.dir_ends[d] + 1
+                    continue
+            prefix = dir_path.rstrip(b'/') + b'/'
+
+            if hit < entries_start:
+                # The directory path matches, so does every entry below it
+                p = entries_start
+                while buf[p] != _END:
+                    name_end = buf.find(b'\0', p + 1)
+                    if buf[p] in wanted:
+                        yield os.fsdecode(prefix + buf[p + 1:name_end]), buf[p] == _DIR
+                    p = name_end + 1
+                pos = self.dir_ends[d] + 1
+                continue
+
+            name_start, kind = self._entry(d, hit)
+            name_end = buf.find(b'\0', hit)
+            if kind in wanted:
+                yield os.fsdecode(prefix + buf[name_start:name_end]), kind == _DIR
+            pos = name_end + 1
+
+
+class LocateDatabase:
+    """In-process search of the system locate database.
+
+    Reads ``mlocate.db`` files through ``mmap``, so a query costs no process
+    spawn and knows whether every hit is a directory. plocate databases are
+    zstd-compressed with encoded posting lists the standard library cannot
+    decode; those (and databases the user may not read, which is the default
+    for the mlocate group) are left to the ``locate`` command. ``search``
+    returns None whenever the command has to answer instead.
+    """
+
+    def __init__(self, paths: Optional[List[str]] = None, recheck_interval: float = 5):
+        self.paths = database_paths() if paths is None else paths
+        self.recheck_interval = recheck_interval
+        self.loading = False
+        self._lock = threading.Lock()
+        self._db: Optional[_MlocateFile] = None
+        self._signature = None
+        self._checked = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._db is not None
+
+    def _current_signature(self):
+        return database_signature(self.paths)
+
+    def _load(self, signature):
+        db = None
+        for path in self.paths:
+            try:
+                with open(path, 'rb') as f:
+                    magic = f.read(len(MLOCATE_MAGIC))
+                if magic == PLOCATE_MAGIC:
+                    logger.debug("%s is a plocate database, searching it with the locate command", path)
+                    continue
+                started = time.time()
+                db = _MlocateFile(path)
+                logger.info("Opened locate database %s: %d directories in %.2fs",
+                            path, len(db), time.time() - started)
+                break
+            except (OSError, ValueError, struct.error) as e:
+                logger.debug("Cannot read locate database %s: %s", path, e)
+        # Searches still running on the previous mapping keep it alive
+        self._db = db
+        self._signature = signature
+
+    def refresh(self):
+        """Reopen the database in the background when updatedb replaced it."""
+        now = time.monotonic()
+        if now - self._checked < self.recheck_interval:
+            return
+        self._checked = now
+        signature = self._current_signature()
+        with self._lock:
+            if self.loading or signature == self._signature:
+                return
+            self.loading = True
+
+        def worker():
+            try:
+                self._load(signature)
+            finally:
+                self.loading = False
+
+        threading.Thread(target=worker, name='locate-db', daemon=True).start()
+
+    def iter_dirs(self) -> Optional[Iterator[str]]:
+        """Every directory in the database, or None when only the command can read it."""
+        self.refresh()
+        db = self._db
+        return db.iter_dirs() if db is not None else None
+
+    @staticmethod
+    def _supported(pattern: str) -> bool:
+        # Globs and paths match differently in locate; non-ASCII needs
+        # Unicode case folding. The command handles those.
+        return bool(pattern) and pattern.isascii() and pattern.isprintable() and \
+            not any(c in pattern for c in '*?[\\/')
+
+    def iter_search(self, pattern: str, search_type: Optional[str] = None,
+                    cancelled: Optional[Callable[[], bool]] = None) -> Optional[Iterator[Tuple[str, bool]]]:
+        """Case-insensitive substring search like ``locate -i pattern``.
+
+        Matches are produced lazily, so the caller can stop (or pause) at
+        any point.
+
+        Args:
+            pattern: Search pattern, matched anywhere in the full path
+            search_type: "file", "directory" or None for both
+            cancelled: Polled between hits; stops the search early
+
+        Returns:
+            An iterator of (path, is_dir), or None when the database cannot
+            answer this query
+        """
+        self.refresh()
+        db = self._db
+        if db is None or not self._supported(pattern):
+            return None
+        return db.iter_search(pattern.encode('ascii'), search_type, cancelled)
+
+    def search(self, pattern: str, limit: int, search_type: Optional[str] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> Optional[Tuple[List[Tuple[str, bool]], bool]]:
+        """Like ``iter_search`` but returns at most ``limit`` results, and
+        whether they are every match."""
+        it = self.iter_search(pattern, search_type, cancelled)
+        if it is None:
+            return None
+        results = list(islice(it, limit + 1))
+        if len(results) > limit:
+            return results[:limit], False
+        return results, not (cancelled is not None and cancelled())
+
+
+def database_paths() -> List[str]:
+    """The locate databases of this system: ``$LOCATE_PATH``, then the default ones."""
+    return [p for p in os.environ.get('LOCATE_PATH', '').split(':') if p] + DEFAULT_PATHS
+
+
+def database_signature(paths: List[str]) -> list:
+    """Changes whenever updatedb replaced one of ``paths``; needs no read permission."""
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            continue
+    return sig
@@ -3,16 +3,900 @@ import subprocess
 import logging
 import sys
 import shutil
+import tempfile
 import glob
-from typing import List
+import fnmatch
+import re
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from cancel import CancelToken, SearchCancelled, kill_process
+from content import ContentScanner, Match, text_regex
+from dir_index import DirectoryIndex
+from filters import Entry, QueryFilters, parse_filters
+from health import HealthMonitor
+from listings import ListingCache
+from locate_db import LocateDatabase
+from mounts import MountRegistry
+from path_index import PathIndex
+from query_cache import Candidate, QueryCache
+from ranking import top_k
+from storage import cache_dir
+from stats import Stats
+from watcher import IndexWatcher, WatchBudget
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a walk generator
+_END = object()
+
+
+def compile_matcher(pattern: str) -> Callable[[str], bool]:
+    """Return a case-insensitive ``find -iname '*pattern*'`` style matcher."""
+    if any(c in pattern for c in PathIndex.GLOB_CHARS):
+        return re.compile(fnmatch.translate(f"*{pattern}*"), re.IGNORECASE | re.DOTALL).match
+    needle = pattern.lower()
+    return lambda name: needle in name.lower()
+
+
+class Budget:
+    """Time a walk may spend before it pauses; ``renew`` grants the same
+    amount again when the walk is resumed."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.renew()
+
+    def renew(self):
+        self.deadline = time.monotonic() + self.seconds
+
+    def spent(self) -> bool:
+        return time.monotonic() > self.deadline
+
+
+class SearchBackend:
+    """A way of searching one mount; (path, is_dir) results are yielded lazily,
+    shallow matches first.
+
+    The search goes one level deeper at a time until the tree is exhausted.
+    Whenever ``budget`` is spent it yields None; iterating again (after the
+    caller renewed the budget) continues where it paused. Closing the
+    generator (or cancelling the token) stops it. Only hits passing
+    ``filters`` are yielded.
+    """
+    name = ''
+
+    def available(self) -> bool:
+        return True
+
+    def search(self, root: str, pattern: str, search_type: str, token: CancelToken,
+               budget: Optional[Budget] = None,
+               filters: Optional[QueryFilters] = None) -> Iterator[Optional[Entry]]:
+        raise NotImplementedError
+
+
+class FindBackend(SearchBackend):
+    """Streams the output of one ``find`` subprocess per depth level.
+
+    Every level walks the tree above it again; the ``scandir`` backend
+    avoids that and is the default.
+    """
+    name = 'find'
+
+    def __init__(self, find_cmd):
+        self.find_cmd = find_cmd
+
+    def available(self) -> bool:
+        return bool(self.find_cmd)
+
+    def search(self, root, pattern, search_type, token, budget=None, filters=None):
+        predicates = filters.find_args() if filters else []
+        depth = 1
+        while not token.cancelled:
+            # "D" marks a directory at this depth, so there is a level below;
+            # %y prints the entry type, so results need no stat call later
+            cmd = [self.find_cmd, root, "-mindepth", str(depth), "-maxdepth", str(depth),
+                   "(", "-type", "d", "-printf", "D\\n", ")", ",",
+                   "(", "-type", search_type[0], "-iname", f"*{pattern}*", *predicates,
+                   "-printf", "%y %p\\n", ")"]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    text=True, errors='surrogateescape', start_new_session=True)
+            token.add_process(proc)
+            deeper = False
+            try:
+                for line in proc.stdout:
+                    kind, _, path = line.rstrip('\n').partition(' ')
+                    if path:
+                        yield path, kind == 'd'
+                    else:
+                        deeper = True
+            finally:
+                kill_process(proc)
+                proc.stdout.close()
+                proc.wait()
+            if not deeper:
+                return
+            depth += 1
+            if budget is not None and budget.spent():
+                yield None
+
+
+class ScandirBackend(SearchBackend):
+    """In-process breadth-first walker built on ``os.scandir``.
+
+    ``DirEntry`` type information comes from the directory listing itself, so
+    no per-entry stat calls are made, and the walk stops as soon as the caller
+    has enough results. Listings are shared through a ``ListingCache``, so
+    the next keystroke gets through the levels already read at once and
+    spends its budget further down.
+    """
+    name = 'scandir'
+
+    def __init__(self, listings: Optional[ListingCache] = None):
+        self.listings = listings or ListingCache()
+
+    def search(self, root, pattern, search_type, token, budget=None, filters=None):
+        matches = compile_matcher(pattern)
+        want_dir = search_type == 'directory'
+        level = [root]
+        while level:
+            next_level = []
+            for path in level:
+                if budget is not None and budget.spent():
+                    yield None
+                if token.cancelled:
+                    return
+                try:
+                    listing = self.listings.list(path)
+                except OSError:
+                    continue
+                for name, is_dir, is_file in listing:
+                    if (is_dir if want_dir else is_file) and matches(name):
+                        if not filters:
+                            yield os.path.join(path, name), is_dir
+                        elif filters.match_name(name):
+                            # Stats only the entries whose name already matched
+                            entry = filters.accept(os.path.join(path, name), is_dir)
+                            if entry is not None:
+                                yield entry
+                    if is_dir:
+                        next_level.append(os.path.join(path, name))
+            level = next_level
+
+
+class LineStream:
+    """Output lines of a subprocess, read on demand.
+
+    Between reads the process blocks on its full pipe, so a paused stream
+    costs no CPU. Cancelling ``token`` or closing the stream kills it.
+    """
+
+    def __init__(self, cmd: List[str], token: CancelToken, merge_stderr: bool = False):
+        self.cmd = cmd
+        self.token = token
+        # A file rather than a pipe, which would block the process once full
+        self._stderr = None if merge_stderr else tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT if merge_stderr else self._stderr,
+                                     text=True, errors='surrogateescape', start_new_session=True)
+        token.add_process(self.proc)
+        # True once the output ended; returncode is then the exit status
+        self.done = False
+        self.returncode: Optional[int] = None
+        # What the process wrote to stderr, once closed
+        self.error = ''
+        self.count = 0
+
+    def take(self, limit: int, timeout: Optional[float] = None) -> List[str]:
+        """Read up to ``limit`` more non-empty lines.
+
+        Cancelling the token raises ``SearchCancelled``; a read running past
+        ``timeout`` kills the process and raises ``subprocess.TimeoutExpired``.
+        """
+        lines = []
+        if self.done:
+            return lines
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            def expire():
+                timed_out.set()
+                kill_process(self.proc)
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            while len(lines) < limit:
+                line = self.proc.stdout.readline()
+                if not line:
+                    self.done = True
+                    self.close()
+                    break
+                line = line.rstrip('\n')
+                if line.strip():
+                    lines.append(line)
+        finally:
+            if timer:
+                timer.cancel()
+        self.token.check()
+        if timed_out.is_set():
+            self.done = False
+            self.close()
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        self.count += len(lines)
+        return lines
+
+    def close(self):
+        if self.proc.stdout.closed:
+            return
+        if not self.done:
+            kill_process(self.proc)
+        self.proc.stdout.close()
+        try:
+            self.returncode = self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            kill_process(self.proc)
+            self.returncode = self.proc.wait()
+        if self._stderr is not None:
+            self._stderr.seek(0)
+            self.error = self._stderr.read(4096).decode('utf-8', 'replace').strip()
+            self._stderr.close()
+
+
+class _Walk:
+    """Live walk of one mount within a ``LiveSearch``."""
+
+    def __init__(self, path: str, gen: Iterator[Optional[Entry]], token: CancelToken, budget: Budget):
+        self.path = path
+        self.gen = gen
+        self.token = token
+        self.budget = budget
+        self.future = None
+        self.deadline = 0.0
+        # Walked the whole tree / stopped by an error
+        self.finished = False
+        self.failed = False
+
+
+class LiveSearch:
+    """Concurrent live walks of several mounts that can pause and resume.
+
+    Each ``take`` pumps the walk generators in a thread pool until enough
+    hits arrived or every walk spent its budget, and then lets them pause;
+    the next ``take`` continues the same generators. A mount still busy
+    after its own timeout is cancelled alone and recorded as unhealthy, so
+    a slow or sleeping disk does not hold back results from the others.
+    """
+
+    def __init__(self, locator: 'Locator', backend: SearchBackend, paths: List[str], pattern: str,
+                 search_type: str, token: CancelToken, max_timeout: float,
+                 filters: Optional[QueryFilters] = None):
+        self.locator = locator
+        self.backend = backend
+        self.token = CancelToken(token)
+        self.max_timeout = max_timeout
+        self.hits = queue.Queue()
+        self.walks: List[_Walk] = []
+        for path in paths:
+            walk_token = CancelToken(self.token)
+            budget = Budget(min(locator.find_budget, locator.health.timeout(path, max_timeout) / 2))
+            gen = backend.search(path, pattern, search_type, walk_token, budget, filters)
+            self.walks.append(_Walk(path, gen, walk_token, budget))
+        self.executor = ThreadPoolExecutor(max_workers=min(locator.find_workers, len(paths)),
+                                           thread_name_prefix='walk')
+
+    @property
+    def done(self) -> bool:
+        return self.hits.empty() and all(w.finished or w.token.cancelled for w in self.walks)
+
+    @property
+    def complete(self) -> bool:
+        """Every walk covered its whole mount."""
+        return self.done and all(w.finished and not w.failed and not w.token.cancelled for w in self.walks)
+
+    def _pump(self, walk: _Walk, stop: threading.Event):
+        logger.debug("Searching in: %s", walk.path)
+        found = 0
+        paused = False
+        started = time.perf_counter()
+        try:
+            while not stop.is_set() and not walk.token.cancelled:
+                hit = next(walk.gen, _END)
+                if hit is _END:
+                    walk.finished = True
+                    break
+                if hit is None:
+                    paused = True
+                    break
+                found += 1
+                self.hits.put(hit)
+        except Exception as e:
+            logger.warning("Error searching %s: %s", walk.path, e)
+            walk.finished = walk.failed = True
+        elapsed = (time.perf_counter() - started) * 1000
+        self.locator.stats.record(self.backend.name, elapsed, walk.path)
+        if (walk.finished or paused) and not walk.failed and not walk.token.cancelled:
+            # Walks that ran to the end (or their budget) say how long this mount needs
+            self.locator.health.record_success(walk.path, elapsed)
+        logger.debug("Found %d results in %s", found, walk.path)
+
+    def take(self, limit: int) -> List[Entry]:
+        results = []
+        # Hits that arrived after the previous page was complete
+        while len(results) < limit and not self.hits.empty():
+            results.append(self.hits.get_nowait())
+        if len(results) >= limit:
+            return results
+
+        stop = threading.Event()
+        started = time.monotonic()
+        pumped = []
+        for walk in self.walks:
+            if walk.finished or walk.token.cancelled:
+                continue
+            if walk.future is not None and not walk.future.done():
+                # Still inside a directory listing of the previous page
+                continue
+            walk.budget.renew()
+            walk.deadline = started + self.locator.health.timeout(walk.path, self.max_timeout)
+            walk.future = self.executor.submit(self._pump, walk, stop)
+            pumped.append(walk)
+        try:
+            while len(results) < limit and not self.token.cancelled:
+                now = time.monotonic()
+                running = []
+                for walk in pumped:
+                    if walk.future.done() or walk.token.cancelled:
+                        continue
+                    if now >= walk.deadline:
+                        logger.warning("Search of %s timed out after %.1fs", walk.path, now - started)
+                        walk.token.cancel()
+                        self.locator.health.record_timeout(walk.path)
+                    else:
+                        running.append(walk)
+                if not running and self.hits.empty():
+                    break
+                wait_for = min((walk.deadline - now for walk in running), default=0)
+                try:
+                    results.append(self.hits.get(timeout=max(0.001, min(wait_for, 0.05))))
+                except queue.Empty:
+                    pass
+        finally:
+            # Walks pause after their current hit, which stays queued
+            stop.set()
+        return results
+
+    def close(self):
+        self.token.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class HardwareSearch:
+    """Matches of one query on the hardware mounts.
+
+    Mounts with a ready index are answered from it; the others (and network
+    mounts, which are never indexed) are walked live. Mounts that recently
+    timed out are skipped.
+    """
+
+    def __init__(self, locator: 'Locator', paths: List[str], pattern: str, search_type: str,
+                 mode: str, token: CancelToken, filters: Optional[QueryFilters] = None):
+        self.locator = locator
+        self.indexes: List[Tuple[str, Iterator[Entry]]] = []
+        self.skipped = False
+        self.live: Optional[LiveSearch] = None
+
+        pending = []
+        for path in paths:
+            mount = locator.mounts.find(path) if locator.mounts.available else None
+            if mount is not None and mount.is_remote:
+                # Walking network and FUSE mounts is too slow to index them
+                pending.append(path)
+                continue
+            index = locator._get_index(path)
+            if not index.ready:
+                pending.append(path)
+                continue
+            if filters:
+                hits = filters.apply(index.iter_search(filters.index_needle(pattern), search_type))
+            else:
+                hits = index.iter_search(pattern, search_type)
+            self.indexes.append((path, hits))
+        logger.debug("%d hardware paths indexed, %d still indexing", len(self.indexes), len(pending))
+        if not pending:
+            return
+
+        backend = locator.backends[locator.mode_backends.get(mode, 'scandir')]
+        if not backend.available():
+            logger.warning("Search backend %s not available", backend.name)
+            self.skipped = True
+            return
+        healthy = [path for path in pending if locator.health.available(path)]
+        if len(healthy) < len(pending):
+            logger.debug("Skipping unresponsive hardware paths: %s", [p for p in pending if p not in healthy])
+            self.skipped = True
+        if healthy:
+            logger.debug("Searching for %s pattern: '%s' in hardware paths using %s", search_type, pattern, backend.name)
+            max_timeout = locator.normal_find_timeout if mode == 'normal' else locator.find_timeout
+            self.live = LiveSearch(locator, backend, healthy, pattern, search_type, token, max_timeout, filters)
+
+    @property
+    def done(self) -> bool:
+        return not self.indexes and (self.live is None or self.live.done)
+
+    @property
+    def complete(self) -> bool:
+        return self.done and not self.skipped and (self.live is None or self.live.complete)
+
+    def take(self, limit: int, live_limit: Optional[int] = None) -> List[Entry]:
+        """Up to ``limit`` matches, of which at most ``live_limit`` come from live walks."""
+        results = []
+        while self.indexes and len(results) < limit:
+            path, it = self.indexes[0]
+            with self.locator.stats.span('index', path):
+                chunk = list(islice(it, limit - len(results)))
+            results.extend(chunk)
+            if len(results) < limit:
+                self.indexes.pop(0)
+        live_limit = limit if live_limit is None else live_limit
+        if self.live is not None and min(limit - len(results), live_limit) > 0:
+            results.extend(self.live.take(min(limit - len(results), live_limit)))
+        logger.debug("Hardware search found %d results", len(results))
+        return results
+
+    def close(self):
+        if self.live is not None:
+            self.live.close()
+
+
+class FuzzySearch:
+    """Fuzzy subsequence matches of one query in the drive indexes, best first.
+
+    Scores are computed once for the best ``limit`` matches of every ready
+    index and merged; pages are then served from that list. Mounts still
+    indexing (or network mounts, which are never indexed) are not searched.
+    """
+
+    def __init__(self, locator: 'Locator', paths: List[str], pattern: str, search_type: str,
+                 filters: Optional[QueryFilters], limit: int):
+        self.locator = locator
+        self.paths = paths
+        self.pattern = pattern
+        self.search_type = search_type
+        self.filters = filters
+        self.limit = limit
+        self.skipped = False
+        self._results: Optional[Iterator[Entry]] = None
+        self._done = False
+
+    def _search(self) -> Iterator[Entry]:
+        scored = []
+        for path in self.paths:
+            mount = self.locator.mounts.find(path) if self.locator.mounts.available else None
+            if mount is not None and mount.is_remote:
+                self.skipped = True
+                continue
+            index = self.locator._get_index(path)
+            if not index.ready:
+                self.skipped = True
+                continue
+            with self.locator.stats.span('fuzzy', path):
+                scored.extend(index.fuzzy_search(self.pattern, self.limit, self.search_type))
+        scored.sort(key=lambda hit: -hit[0])
+        entries = ((path, is_dir) for _, path, is_dir in scored[:self.limit])
+        return self.filters.apply(entries) if self.filters else entries
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def complete(self) -> bool:
+        return self._done and not self.skipped
+
+    def take(self, limit: int, live_limit: Optional[int] = None) -> List[Entry]:
+        # Every match comes from the indexes, so live_limit does not apply
+        if self._results is None:
+            self._results = self._search()
+        results = list(islice(self._results, limit))
+        if len(results) < limit:
+            self._done = True
+        return results
+
+    def close(self):
+        pass
+
+
+class ContentSearch:
+    """Files whose text contains a phrase, in the order the name sources
+    of a session list them.
+
+    Candidates are read from ``names`` a batch at a time and scanned
+    concurrently; files below a hidden directory, or outside ``roots``,
+    are passed over. A page stops as soon as ``limit`` files matched
+    (files already being scanned still count) or after ``find_budget``
+    seconds, and the next page continues with the files not scanned yet.
+    """
+
+    def __init__(self, locator: 'Locator', text: str, roots: List[str],
+                 names: Callable[[int], List[Candidate]], names_done: Callable[[], bool], token: CancelToken):
+        self.locator = locator
+        self.regex = text_regex(text)
+        self.roots = [root.rstrip('/') + '/' for root in roots]
+        self.names = names
+        self.names_done = names_done
+        self.token = token
+        self.backlog: deque = deque()
+        self.seen: Set[str] = set()
+        self.scanned = 0
+
+    @property
+    def done(self) -> bool:
+        return not self.backlog and self.names_done()
+
+    def _wanted(self, path: str) -> bool:
+        for root in self.roots:
+            if path.startswith(root):
+                # Like ripgrep, hidden files and directories (caches, .git) are skipped
+                return '/.' not in path[len(root) - 1:]
+        return False
+
+    def _refill(self, limit: int) -> bool:
+        """Queue the next candidates; False when the name sources had none."""
+        found = self.names(limit)
+        for path, _, is_dir in found:
+            if not is_dir and path not in self.seen and self._wanted(path):
+                self.seen.add(path)
+                self.backlog.append(path)
+        return bool(found)
+
+    def take(self, limit: int) -> List[Candidate]:
+        results = []
+        pool = self.locator._content_pool
+        batch_size = self.locator.content_workers * 4
+        deadline = time.monotonic() + self.locator.find_budget
+        while len(results) < limit and not self.token.cancelled and time.monotonic() < deadline:
+            if not self.backlog:
+                if self.names_done() or not self._refill(max(batch_size, limit)):
+                    break
+                continue
+            batch = [self.backlog.popleft() for _ in range(min(batch_size, len(self.backlog)))]
+            futures = [pool.submit(self.locator.content.search, path, self.regex) for path in batch]
+            unscanned = []
+            for path, future in zip(batch, futures):
+                if len(results) >= limit and future.cancel():
+                    unscanned.append(path)
+                    continue
+                self.scanned += 1
+                if future.result() is not None:
+                    results.append((path, 'content', False))
+            self.backlog.extendleft(reversed(unscanned))
+        logger.debug("Content search matched %d files, %d scanned so far", len(results), self.scanned)
+        return results
+
+
+class SearchSession:
+    """The open sources of one query, kept so "More results" continues where
+    the previous page stopped instead of searching again.
+
+    Between pages the locate process blocks on its pipe and the mount walks
+    stay suspended. A newer query, or ``ttl`` seconds without a page, closes
+    everything. Folder searches ("dir") read the system-wide directory
+    index where normal searches run locate. In content mode ("grep") the pattern is the text searched
+    for; locate lists the files below ``Locator.content_root`` and the
+    mounts are walked for every file, and both feed a ``ContentSearch``.
+    """
+
+    def __init__(self, locator: 'Locator', mode: str, pattern: str, paths: List[str],
+                 token: CancelToken, ttl: float, limit: int, filters: Optional[QueryFilters] = None):
+        self.locator = locator
+        self.mode = mode
+        self.pattern = pattern
+        self.paths = paths
+        self.filters = filters
+        wants_dirs = mode == 'dir' or (filters is not None and filters.type == 'directory')
+        self.search_type = "directory" if wants_dirs else "file"
+        self.token = CancelToken(token)
+        self.ttl = ttl
+        self.limit = limit
+        self.last_used = time.monotonic()
+        self.closed = False
+        # Candidates found but not shown yet, and every path found so far
+        self.pool: List[Candidate] = []
+        self.seen: Set[str] = set()
+        self.shown = 0
+        self._opened = False
+        self._locate = None
+        self._locate_done = mode not in ('normal', 'grep', 'dir')
+        self._locate_complete = True
+        self._hardware = None
+        self._content: Optional[ContentSearch] = None
+        self._lock = threading.Lock()
+        self._schedule_expiry(ttl)
+
+    def _schedule_expiry(self, delay: float):
+        self._timer = threading.Timer(delay, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        idle = time.monotonic() - self.last_used
+        if idle >= self.ttl:
+            logger.debug("Search session for '%s' expired", self.pattern)
+            self.close()
+        elif not self.closed:
+            self._schedule_expiry(self.ttl - idle)
+
+    @property
+    def done(self) -> bool:
+        """Every source is exhausted."""
+        if not self._opened:
+            return False
+        return self._content.done if self._content is not None else self._names_done()
+
+    def _names_done(self) -> bool:
+        return self._locate_done and (self._hardware is None or self._hardware.done)
+
+    @property
+    def complete(self) -> bool:
+        """Every match was found."""
+        return self.done and self._locate_complete and (self._hardware is None or self._hardware.complete)
+
+    @property
+    def has_more(self) -> bool:
+        return not self.closed and (bool(self.pool) or not self.done)
+
+    def _open(self):
+        if self._opened:
+            return
+        self._opened = True
+        grep = self.mode == 'grep'
+        locate_pattern = self.locator.content_root if grep else self.pattern
+        if self.mode == 'dir':
+            self._locate = self.locator._open_dir_index(self.pattern, self.filters)
+            if self._locate is None:
+                # Still building; only the mounts answer meanwhile
+                self._locate_done = True
+                self._locate_complete = False
+        elif not self._locate_done:
+            try:
+                self._locate = self.locator._open_locate(locate_pattern, self.token, self.filters)
+            except OSError as e:
+                logger.warning("Locate command failed: %s", e)
+                self._locate_done = True
+                self._locate_complete = False
+        if self.mode == 'fuzzy':
+            self._hardware = FuzzySearch(self.locator, self.paths, self.pattern, self.search_type,
+                                         self.filters, self.locator.fuzzy_results)
+        else:
+            self._hardware = HardwareSearch(self.locator, self.paths, '' if grep else self.pattern,
+                                            self.search_type, self.mode, self.token, self.filters)
+        if grep:
+            self._content = ContentSearch(self.locator, self.pattern, [self.locator.content_root] + self.paths,
+                                          self._pull_names, self._names_done, self.token)
+
+    def _pull_locate(self, limit: int) -> List[Entry]:
+        source = self._locate
+        if not isinstance(source, LineStream):
+            with self.locator.stats.span('dir_index' if self.mode == 'dir' else 'locate_db'):
+                entries = list(islice(source, limit))
+            self.token.check()
+            if len(entries) < limit:
+                self._locate_done = True
+            return entries
+
+        try:
+            with self.locator.stats.span('locate'):
+                if self.filters:
+                    entries = self._take_filtered(source, limit)
+                else:
+                    entries = [(line, None) for line in source.take(limit, timeout=5)]
+        except subprocess.TimeoutExpired:
+            logger.warning("Locate command timed out")
+            self._locate_done = True
+            self._locate_complete = False
+            return []
+        if source.done:
+            self._locate_done = True
+            returncode = source.returncode
+            if returncode not in (0, None) and (source.count or source.error):
+                logger.warning("Locate command failed with exit status %d: %s", returncode, source.error)
+            # Exit status 1 with no output just means nothing matched, unless
+            # locate complained, e.g. about a missing or unreadable database
+            self._locate_complete = returncode == 0 or (returncode == 1 and not source.count
+                                                         and not source.error)
+        return entries
+
+    def _take_filtered(self, source: LineStream, limit: int) -> List[Entry]:
+        """Read locate output until ``limit`` lines passed the filters.
+
+        Filters locate cannot express reject lines after the fact; reading
+        stops after ``find_budget`` seconds so a filter that rejects nearly
+        everything still returns a page, and the next page reads on.
+        """
+        entries = []
+        deadline = time.monotonic() + self.locator.find_budget
+        while len(entries) < limit and not source.done and time.monotonic() < deadline:
+            lines = source.take(limit - len(entries), timeout=5)
+            entries.extend(self.filters.apply((line, None) for line in lines))
+        return entries
+
+    def seed(self, candidates: List[Candidate], complete: bool):
+        """Start from cached candidates; a complete set needs no sources at all."""
+        self._add(candidates)
+        if complete:
+            self._opened = True
+            self._locate_done = True
+
+    def _add(self, candidates: List[Candidate]):
+        for candidate in candidates:
+            if candidate[0] not in self.seen:
+                self.seen.add(candidate[0])
+                self.pool.append(candidate)
+
+    def _pull_names(self, limit: int, live_limit: Optional[int] = None) -> List[Candidate]:
+        """Up to ``limit`` more name matches from locate and the mounts.
+
+        The locate command and live walks read at most ``live_limit``
+        (default ``limit``) of them; indexes and the in-process database
+        answer from memory, so only they read further ahead.
+        """
+        live_limit = limit if live_limit is None else live_limit
+        candidates = []
+        locate_limit = live_limit if isinstance(self._locate, LineStream) else limit
+        if not self._locate_done and locate_limit > 0:
+            locate_results = self._pull_locate(locate_limit)
+            logger.debug("Locate found %d results", len(locate_results))
+            # Directory index hits match by name, like the mounts, not anywhere in the path
+            source = 'dirs' if self.mode == 'dir' else 'locate'
+            candidates.extend((path, source, is_dir) for path, is_dir in locate_results)
+        if self._hardware is not None:
+            hardware_results = self._hardware.take(limit, live_limit)
+            candidates.extend((path, 'hw', is_dir) for path, is_dir in hardware_results)
+        return candidates
+
+    def pull(self, limit: int, live_limit: Optional[int] = None) -> Tuple[List[Candidate], bool]:
+        """Read up to ``limit`` more candidates from every source, at most
+        ``live_limit`` of them from the locate command and live walks.
+
+        Returns the new candidates and whether every match has been read.
+        """
+        self._open()
+        if self._content is not None:
+            with self.locator.stats.span('grep'):
+                candidates = self._content.take(limit)
+        else:
+            candidates = self._pull_names(limit, live_limit)
+        # A cancelled search is partial and must not end up in the cache
+        self.token.check()
+        self._add(candidates)
+        return candidates, self.complete
+
+    def take(self, limit: int) -> List[Entry]:
+        """Remove the ``limit`` best candidates not shown yet from the pool."""
+        with self.locator.stats.span('merge'):
+            if self.mode in ('fuzzy', 'grep'):
+                # Already in score order, or in the order the files were found
+                best = self.pool[:limit]
+            else:
+                best = self.locator._rank(self.pool, self.pattern, limit)
+        chosen = {path for path, _, _ in best}
+        self.pool = [c for c in self.pool if c[0] not in chosen]
+        self.shown += len(best)
+        return [(path, is_dir) for path, _, is_dir in best]
+
+    def wanted(self, limit: int) -> int:
+        """Candidates to collect for a page of ``limit`` results.
+
+        Only indexes and the in-process database read past ``limit``: a
+        live walk that found a page stops, rather than spending its time
+        budget on candidates for the ranking.
+        """
+        if self.mode == 'grep':
+            # Content matches are not ranked, so reading ahead only costs time
+            return limit
+        return limit * self.locator.candidate_factor
+
+    def next_page(self, limit: int) -> List[Entry]:
+        with self._lock:
+            self.last_used = time.monotonic()
+            wanted = self.wanted(limit)
+            while not self.done and len(self.pool) < wanted:
+                # Sources reopened after a cache hit repeat what was seeded;
+                # live sources stop once the page is full, see wanted
+                found, _ = self.pull(wanted, max(0, limit - len(self.pool)))
+                if not found:
+                    break
+            return self.take(limit)
+
+    def close(self):
+        self.closed = True
+        self._timer.cancel()
+        self.token.cancel()
+        if isinstance(self._locate, LineStream):
+            self._locate.close()
+        if self._hardware is not None:
+            self._hardware.close()
+
 
 class Locator:
     def __init__(self):
-        self.cmd = 'plocate' if self.__check_has_plocate() else 'locate'
+        # A PATH lookup; startup runs no subprocess
+        self.cmd = 'plocate' if shutil.which('plocate') else 'locate'
         self.find_cmd = shutil.which("find")
+        # In-process reader of the system locate database; the locate command
+        # answers whatever it cannot, or everything when this is None
+        self.locate_db: Optional[LocateDatabase] = LocateDatabase()
         self.limit = 5
         self.hardware_bases = ["/run/media", "/media", "/mnt"]
-        print(f"Initialized Locator: cmd={self.cmd}, find_cmd={self.find_cmd}")
+        # Mount table from /proc/self/mountinfo, refreshed only on changes
+        self.mounts = MountRegistry(self.hardware_bases)
+        self.mounts.add_listener(self._on_mounts_changed)
+        # Resident per-mount indexes; rebuilt in the background once stale
+        self.indexes: Dict[str, PathIndex] = {}
+        self._index_lock = threading.Lock()
+        self.index_max_age = 600
+        # inotify watchers keep the indexes current between builds; indexes
+        # with directories left unwatched still get the periodic refresh
+        self.watch_budget = WatchBudget(16384)
+        self.watchers: Dict[str, IndexWatcher] = {}
+        # Live search fallback: mounts are scanned concurrently. Each mount
+        # gets a timeout adapted to its history, capped at find_timeout (or
+        # normal_find_timeout when locate results are shown as well); mounts
+        # that timed out are skipped until a background probe gets through
+        self.find_workers = 4
+        self.find_timeout = 10
+        self.normal_find_timeout = 3
+        self.health = HealthMonitor()
+        # Breadth-first walks stop after find_budget seconds per mount (at
+        # most half its timeout) instead of at a fixed depth
+        self.find_budget = 2
+        self.listings = ListingCache()
+        self.backends: Dict[str, SearchBackend] = {
+            'find': FindBackend(self.find_cmd),
+            'scandir': ScandirBackend(self.listings),
+        }
+        # Live search backend per query mode ("normal", "dir", "hw"); scandir
+        # beats forking find in benchmarks/bench_backends.py on every case
+        self.mode_backends: Dict[str, str] = {'normal': 'scandir', 'dir': 'scandir', 'hw': 'scandir'}
+        # Each query collects up to candidate_factor * limit candidates from
+        # the indexes (live walks stop at limit), which are ranked down to
+        # limit results and kept for the as-you-type cache
+        self.cache = QueryCache()
+        self.candidate_factor = 5
+        # Fuzzy mode ("f <pattern>") scores the drive indexes once per query
+        # and pages through this many of the best matches
+        self.fuzzy_results = 500
+        # Content search ("grep <text>") reads the files below content_root
+        # and on the mounts, content_workers at a time; binary files and
+        # files over content_max_size are skipped
+        self.content_root = os.path.expanduser('~')
+        self.content = ContentScanner(max_size=10 << 20)
+        self.content_workers = 8
+        self._content_pool = ThreadPoolExecutor(max_workers=self.content_workers, thread_name_prefix='grep')
+        # Folder search ("dir <pattern>") also finds every directory in the
+        # locate database, through an index of directories only
+        self.dir_index = DirectoryIndex(self._dir_index_path())
+        # Folder searches cached before a build missed or listed other directories
+        self.dir_index.add_listener(self.cache.invalidate)
+        self._known_mounts: List[str] = []
+        # Sources of each client's last query, kept open for "More results"
+        # until a new query replaces them or session_ttl seconds pass without a page
+        self.session_ttl = 30
+        self._sessions: Dict[Hashable, SearchSession] = {}
+        self._session_lock = threading.Lock()
+        # Per-stage timings, shown by "s stats"
+        self.stats = Stats()
+        # Entry types the sources do not report are looked up concurrently;
+        # whatever is still unknown after stat_timeout gets a generic icon
+        self.stat_timeout = 0.2
+        self._stat_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='stat')
+        logger.info("Initialized Locator: cmd=%s, find_cmd=%s", self.cmd, self.find_cmd)
 
     def set_limit(self, limit):
         try:
@@ -21,165 +905,410 @@ class Locator:
                 self.limit = new_limit
             else:
                 self.limit = 5
-            print(f'set limit to {self.limit}')
+            logger.debug('set limit to %d', self.limit)
         except ValueError:
             self.limit = 5
-            print(f'Invalid limit value, setting to default: {self.limit}')
+            logger.warning('Invalid limit value, setting to default: %d', self.limit)
+
+    def set_backend(self, name, mode=None):
+        """Select the live search backend for one mode, or for all of them."""
+        if name not in self.backends:
+            logger.warning('Unknown search backend: %s', name)
+            return
+        for m in ([mode] if mode else list(self.mode_backends)):
+            self.mode_backends[m] = name
+        logger.debug('search backends: %s', self.mode_backends)
+
+    def set_locate_backend(self, name):
+        """Search the locate database in-process ("auto") or always run the command ("command")."""
+        if name == 'command':
+            self.locate_db = None
+        elif self.locate_db is None:
+            self.locate_db = LocateDatabase()
+        logger.debug('locate backend: %s', name)
 
-    def __check_has_plocate(self):
+    def set_watch_budget(self, budget):
+        """Limit the inotify watches held for all drive indexes together."""
         try:
-            subprocess.check_call(['which', 'plocate'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+            self.watch_budget.limit = max(0, int(budget))
+        except ValueError:
+            logger.warning('Invalid watch budget: %s', budget)
+            return
+        logger.debug('watch budget: %d', self.watch_budget.limit)
+
+    def warm_up(self) -> List[PathIndex]:
+        """Prepare what the first query would otherwise wait for.
+
+        Loads the mount table, starts opening the locate database and
+        building (or loading the saved) directory index and index of every
+        local drive, all in the background. Returns the indexes, so the
+        caller can wait for them.
+        """
+        with self.stats.span('warm_up'):
+            paths = self._discover_hardware_paths()
+            if self.locate_db is not None:
+                self.locate_db.refresh()
+            self.dir_index.refresh(self.locate_db, self.cmd)
+            indexes = [self.dir_index]
+            for path in paths:
+                mount = self.mounts.find(path) if self.mounts.available else None
+                if mount is None or not mount.is_remote:
+                    indexes.append(self._get_index(path))
+        logger.info("Warming up the directory index and %d drive indexes", len(indexes) - 1)
+        return indexes
+
+    @staticmethod
+    def _dir_index_path() -> Optional[str]:
+        try:
+            return os.path.join(cache_dir(), 'directories.idx')
+        except OSError:
+            return None
+
+    def _open_dir_index(self, pattern: str, filters: Optional[QueryFilters] = None) -> Optional[Iterator[Entry]]:
+        """Directories anywhere on the system whose name contains ``pattern``,
+        or None until the directory index is built."""
+        index = self.dir_index
+        index.refresh(self.locate_db, self.cmd)
+        if not index.ready:
+            return None
+        if filters:
+            return filters.apply(index.iter_search(filters.index_needle(pattern), 'directory'))
+        return index.iter_search(pattern, 'directory')
 
     def _discover_hardware_paths(self) -> List[str]:
         """Return a list of existing directories to search on external/media mounts."""
+        with self.stats.span('mount_discovery'):
+            return self._mount_paths()
+
+    def _mount_paths(self) -> List[str]:
+        if self.mounts.available:
+            self.mounts.start()
+            return [mount.mountpoint for mount in self.mounts.hardware_mounts()]
+        return self._scan_hardware_dirs()
+
+    def _scan_hardware_dirs(self) -> List[str]:
+        """List the directories below the hardware bases.
+
+        Fallback for systems without /proc/self/mountinfo; empty mountpoint
+        directories cannot be told apart from volumes here.
+        """
         paths = []
+        for base in self.hardware_bases:
+            # /run/media/<user>/<volume>, /media/* and /mnt/*
+            depth = 2 if base == "/run/media" else 1
+            level = [base]
+            for _ in range(depth):
+                next_level = []
+                for parent in level:
+                    try:
+                        with os.scandir(parent) as it:
+                            next_level.extend(e.path for e in it if e.is_dir())
+                    except OSError:
+                        continue
+                level = next_level
+            paths.extend(sorted(level))
+        return list(dict.fromkeys(paths))
+
+    def _on_mounts_changed(self):
+        """Start indexing newly attached volumes in the background."""
+        for mount in self.mounts.hardware_mounts():
+            if not mount.is_remote:
+                self._get_index(mount.mountpoint)
+
+    def _volume_db_path(self, path: str) -> Optional[str]:
+        """On-disk database for the volume mounted at ``path``, keyed by filesystem UUID."""
+        mount = self.mounts.find(path) if self.mounts.available else None
+        if mount is None or not mount.uuid:
+            return None
         try:
-            # /run/media/<user>/<volume>
-            base = "/run/media"
-            if os.path.isdir(base):
-                print(f"Checking {base}")
-                for user in os.listdir(base):
-                    userdir = os.path.join(base, user)
-                    if os.path.isdir(userdir):
-                        for vol in os.listdir(userdir):
-                            p = os.path.join(userdir, vol)
-                            if os.path.isdir(p):
-                                print(f"Found hardware path: {p}")
-                                paths.append(p)
-
-            # /media/* and /mnt/*
-            for base in ["/media", "/mnt"]:
-                if os.path.isdir(base):
-                    print(f"Checking {base}")
-                    for item in os.listdir(base):
-                        p = os.path.join(base, item)
-                        if os.path.isdir(p):
-                            print(f"Found hardware path: {p}")
-                            paths.append(p)
-        except Exception as e:
-            print(f"Error discovering hardware paths: {e}")
-
-        # dedupe preserve order
-        seen = set()
-        out = []
-        for p in paths:
-            if p not in seen:
-                seen.add(p)
-                out.append(p)
-        print(f"Discovered {len(out)} hardware paths: {out}")
-        return out
-
-    def _run_find(self, pattern: str, search_type: str = "file") -> List[str]:
-        """Run find on hardware-mounted drives - optimized version.
-        
-        Args:
-            pattern: Search pattern
-            search_type: "file" for files, "directory" for directories
+            return os.path.join(cache_dir('volumes'), f"{mount.uuid}.idx")
+        except OSError:
+            return None
+
+    def _get_index(self, path: str) -> PathIndex:
+        """Return the index for a mount, starting a background build if needed."""
+        with self._index_lock:
+            index = self.indexes.get(path)
+            if index is None:
+                index = self.indexes[path] = PathIndex(path, self._volume_db_path(path))
+                # Cached candidates predate what the watcher or a rebuild found
+                index.add_listener(self.cache.invalidate, changes=True)
+                index.build_async()
+                watcher = self.watchers[path] = IndexWatcher(index, self.watch_budget)
+                watcher.start()
+                return index
+        watcher = self.watchers.get(path)
+        if watcher is not None and watcher.complete:
+            # Every directory is watched, so the index cannot go stale
+            return index
+        if index.ready and time.time() - index.built_at > self.index_max_age:
+            # Keep answering from the old index while the new one is built
+            index.build_async()
+        return index
+
+    def _open_locate(self, pattern: str, token: CancelToken, filters: Optional[QueryFilters] = None):
+        """Start a locate search for ``pattern`` that is read page by page.
+
+        Returns an iterator of the in-process database, or a ``LineStream``
+        of the locate command when the database cannot answer. The iterator
+        applies ``filters`` itself; the stream leaves whatever the locate
+        arguments cannot express to the caller.
         """
-        paths = self._discover_hardware_paths()
-        if not paths:
-            print("No hardware paths found")
-            return []
-            
-        if not self.find_cmd:
-            print("No find command available")
-            return []
+        if self.locate_db is not None:
+            needle = filters.index_needle(pattern) if filters else pattern
+            it = self.locate_db.iter_search(needle, filters.type if filters else None,
+                                            cancelled=lambda: token.cancelled)
+            if it is not None:
+                return filters.apply(it) if filters else it
+        locate_cmd = [self.cmd, '-i'] + (filters.locate_args(pattern) if filters else [pattern])
+        logger.debug('Executing locate command: %s', " ".join(locate_cmd))
+        return LineStream(locate_cmd, token)
 
-        all_results = []
-        print(f"Searching for {search_type} pattern: '{pattern}' in hardware paths")
-        
-        for path in paths:
-            try:
-                print(f"Searching in: {path}")
-                # Use -maxdepth 3 to avoid deep recursion and speed up search
-                cmd = [self.find_cmd, path, "-maxdepth", "3", "-type", search_type[0], "-iname", f"*{pattern}*"]
-                
-                # Run with timeout to prevent hanging
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                
-                if result.returncode == 0:
-                    lines = [line.strip() for line in result.stdout.splitlines() if line.strip()]
-                    print(f"Found {len(lines)} results in {path}")
-                    all_results.extend(lines)
-                    
-                    # Stop if we have enough results
-                    if len(all_results) >= self.limit:
-                        all_results = all_results[:self.limit]
-                        break
-                else:
-                    print(f"Find failed in {path}: {result.stderr}")
-                    
-            except subprocess.TimeoutExpired:
-                print(f"Find timed out in {path}")
-            except Exception as e:
-                print(f"Error searching {path}: {e}")
+    def _stream_process(self, cmd: List[str], token: CancelToken, limit: int,
+                        timeout: Optional[float] = None,
+                        merge_stderr: bool = False) -> Tuple[List[str], Optional[int]]:
+        """Read at most ``limit`` non-empty output lines of ``cmd``, then kill it.
+
+        Returns:
+            The lines, and the exit status or None if the output was cut short
+        """
+        stream = LineStream(cmd, token, merge_stderr)
+        try:
+            lines = stream.take(limit, timeout)
+        finally:
+            stream.close()
+        return lines, stream.returncode if stream.done else None
+
+    @staticmethod
+    def _candidate_matches(needle: str, candidate: Candidate) -> bool:
+        path, source, _ = candidate
+        # locate matches anywhere in the path, the directory index and the
+        # hardware search on basenames
+        if source == 'locate':
+            return needle in path.lower()
+        return needle in os.path.basename(path).lower()
+
+    def _cached_candidates(self, mode: str, pattern: str, limit: int,
+                           refine: bool = True) -> Optional[Tuple[List[Candidate], bool]]:
+        """Cached candidates for the query, and whether they are every match.
 
-        print(f"Total hardware results: {len(all_results)}")
-        return all_results
+        With ``refine``, a query extending a cached one is answered by
+        filtering its candidates by substring.
+        """
+        entry = self.cache.get_entry(mode, pattern, limit)
+        if entry is not None:
+            logger.debug("Cache hit for %s '%s'", mode, pattern)
+            return entry.candidates, entry.complete
+        if not refine or any(c in pattern for c in PathIndex.GLOB_CHARS):
+            return None
+        base = self.cache.get_base(mode, pattern, limit)
+        if base is None:
+            return None
+        needle = pattern.lower()
+        candidates = [c for c in base if self._candidate_matches(needle, c)]
+        logger.debug("Refined %d cached candidates to %d for %s '%s'", len(base), len(candidates), mode, pattern)
+        self.cache.put(mode, pattern, limit, candidates, True)
+        return candidates, True
+
+    def _rank(self, candidates: List[Candidate], pattern: str, limit: int) -> List[Candidate]:
+        """Combine results - remove duplicates and keep the ``limit`` best."""
+        return top_k(candidates, pattern, limit)
+
+    def _resolve_types(self, entries: List[Entry]) -> List[Entry]:
+        """Fill in unknown entry types with stat calls run concurrently.
+
+        Stats still pending after ``stat_timeout`` (a sleeping disk, a stale
+        network mount) are left running in the pool and their entries stay
+        unknown.
+        """
+        # Paths on mounts being skipped would only tie up the pool
+        pending = {i: self._stat_pool.submit(os.path.isdir, path)
+                   for i, (path, is_dir) in enumerate(entries)
+                   if is_dir is None and self.health.healthy_path(path)}
+        if not pending:
+            return entries
+        with self.stats.span('stat'):
+            done, not_done = wait(pending.values(), timeout=self.stat_timeout)
+        if not_done:
+            logger.debug("Entry type of %d results unknown after %.2fs", len(not_done), self.stat_timeout)
+        resolved = list(entries)
+        for i, future in pending.items():
+            if future in done:
+                resolved[i] = (entries[i][0], future.result())
+        return resolved
+
+    def run(self, pattern, token: Optional[CancelToken] = None) -> List[str]:
+        """Search for ``pattern`` and return the matching paths.
 
-    def run(self, pattern):
+        Cancelling ``token`` from another thread kills the running locate and
+        find processes and makes ``run`` raise ``SearchCancelled``.
+        """
+        return [path for path, _ in self.search(pattern, token, resolve_types=False)]
+
+    def search(self, pattern, token: Optional[CancelToken] = None, resolve_types: bool = True,
+               limit: Optional[int] = None, owner: Hashable = None) -> List[Entry]:
+        """Like ``run``, but returns (path, is_dir) entries.
+
+        Entry types come from the search backends; with ``resolve_types``
+        the ones they do not report (locate, raw output) are looked up
+        concurrently, and stay None if that takes too long.
+
+        Args:
+            limit: Results per page, defaults to ``self.limit``
+            owner: Client the search is run for; every owner has its own
+                last search for ``more``
+        """
+        token = token or CancelToken()
+        limit = limit or self.limit
         if not self.cmd:
             raise RuntimeError('Neither plocate nor locate commands found')
         if not pattern or not pattern.strip():
             raise RuntimeError('No search pattern provided')
         
         tokens = pattern.strip().split()
-        print(f"Search pattern: '{pattern}', tokens: {tokens}")
+        logger.debug("Search pattern: '%s', tokens: %s", pattern, tokens)
         
         # Folder search mode: "dir <pattern>" or "folder <pattern>"
         if tokens[0].lower() in ['dir', 'folder'] and len(tokens) > 1:
+            mode = 'dir'
             search_pattern = ' '.join(tokens[1:])
-            print(f"Directory search for: '{search_pattern}'")
-            return self._run_find(search_pattern, "directory")
+            logger.debug("Directory search for: '%s'", search_pattern)
         
+        # Fuzzy mode: "f <pattern>" over the drive indexes
+        elif tokens[0].lower() == 'f' and len(tokens) > 1:
+            mode = 'fuzzy'
+            search_pattern = ' '.join(tokens[1:])
+            logger.debug("Fuzzy search for: '%s'", search_pattern)
+
+        # Content mode: "grep <text>" in the files below content_root and on the mounts
+        elif tokens[0].lower() == 'grep' and len(tokens) > 1:
+            mode = 'grep'
+            search_pattern = ' '.join(tokens[1:])
+            logger.debug("Content search for: '%s'", search_pattern)
+
         # Hardware-only mode: "hw <pattern>"
-        if tokens[0].lower() == 'hw' and len(tokens) > 1:
+        elif tokens[0].lower() == 'hw' and len(tokens) > 1:
+            mode = 'hw'
             search_pattern = ' '.join(tokens[1:])
-            print(f"Hardware-only search for: '{search_pattern}'")
-            return self._run_find(search_pattern)
+            logger.debug("Hardware-only search for: '%s'", search_pattern)
         
         # Raw mode: "r <args>"
-        if tokens[0].lower() == 'r' and len(tokens) > 1:
+        elif tokens[0].lower() == 'r' and len(tokens) > 1:
+            # Raw output is not paged
+            self._replace_session(owner, None)
             raw_args = tokens[1:]
             cmd = [self.cmd] + raw_args
-            print(f'Executing raw command: {" ".join(cmd)}')
+            logger.debug('Executing raw command: %s', " ".join(cmd))
             try:
-                output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-                return [line for line in output.splitlines() if line.strip()]
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(f"Command failed with exit status {e.returncode}: {e.output}")
+                with self.stats.span('locate_raw'):
+                    lines, returncode = self._stream_process(cmd, token, limit, timeout=10, merge_stderr=True)
+            except subprocess.TimeoutExpired:
+                raise RuntimeError(f"Command timed out: {' '.join(cmd)}")
+            if returncode:
+                output = '\n'.join(lines)
+                raise RuntimeError(f"Command failed with exit status {returncode}: {output}")
+            entries = [(line, None) for line in lines]
+            return self._resolve_types(entries) if resolve_types else entries
         
         # Normal mode: combined search
-        search_pattern = pattern
-        locate_cmd = [self.cmd, '-i', '-l', str(self.limit), search_pattern]
-        print(f'Executing locate command: {" ".join(locate_cmd)}')
-        
-        locate_results = []
-        try:
-            locate_output = subprocess.check_output(locate_cmd, stderr=subprocess.STDOUT, text=True, timeout=5)
-            locate_results = [line for line in locate_output.splitlines() if line.strip()]
-            print(f"Locate found {len(locate_results)} results")
-        except subprocess.CalledProcessError as e:
-            print(f"Locate command failed: {e}")
-            locate_results = []
-        except subprocess.TimeoutExpired:
-            print("Locate command timed out")
-            locate_results = []
-
-        # Always run hardware search but only if we have a pattern
-        hardware_results = []
-        if search_pattern.strip():
-            hardware_results = self._run_find(search_pattern)
-            print(f"Hardware search found {len(hardware_results)} results")
-
-        # Combine results - remove duplicates
-        combined_results = locate_results.copy()
-        for result in hardware_results:
-            if result not in combined_results and len(combined_results) < self.limit:
-                combined_results.append(result)
-
-        print(f"Total combined results: {len(combined_results)}")
-        return combined_results[:self.limit]
+        else:
+            mode = 'normal'
+            search_pattern = pattern
+
+        # Inline filters ("ext:pdf size>1M") apply in every source, so
+        # filtered candidates are cached apart from unfiltered ones
+        search_pattern, filters = parse_filters(search_pattern)
+        if not search_pattern and (mode in ('fuzzy', 'grep') or not filters):
+            raise RuntimeError('No search pattern provided')
+        if mode == 'grep' and filters.type == 'directory':
+            raise RuntimeError('Content search only matches files')
+        if filters:
+            logger.debug("Filters: %s", filters.key)
+            mode_key = f"{mode} {filters.key}"
+        else:
+            mode_key = mode
+
+        # Cached candidates are only valid for the mounts they were found on
+        paths = self._discover_hardware_paths()
+        if paths != self._known_mounts:
+            self.cache.invalidate()
+            self.listings.invalidate()
+            self.health.prune(paths)
+            self._known_mounts = paths
+            # Forget indexes of drives that were unmounted
+            for path in list(self.indexes):
+                if path not in paths:
+                    self.indexes.pop(path, None)
+                    watcher = self.watchers.pop(path, None)
+                    if watcher is not None:
+                        watcher.stop()
+
+        session = SearchSession(self, mode, search_pattern, paths, token, self.session_ttl, limit,
+                                filters or None)
+        self._replace_session(owner, session)
+
+        # Fuzzy and content matches of a longer pattern are not a subset by name
+        cached = self._cached_candidates(mode_key, search_pattern, limit, refine=mode not in ('fuzzy', 'grep'))
+        if cached is not None:
+            session.seed(*cached)
+        else:
+            try:
+                candidates, complete = session.pull(session.wanted(limit), limit)
+            except SearchCancelled:
+                session.close()
+                raise
+            self.cache.put(mode_key, search_pattern, limit, candidates, complete)
+
+        combined_results = session.take(limit)
+        logger.debug("Total combined results: %d", len(combined_results))
+        return self._resolve_types(combined_results) if resolve_types else combined_results
+
+    def _replace_session(self, owner: Hashable, session: Optional[SearchSession]):
+        with self._session_lock:
+            previous = self._sessions.pop(owner, None)
+            if session is not None:
+                self._sessions[owner] = session
+            # Drop sessions that expired on their own
+            for key in [k for k, s in self._sessions.items() if s.closed]:
+                del self._sessions[key]
+        if previous is not None:
+            previous.close()
+
+    def close_session(self, owner: Hashable = None):
+        """Close the last search of ``owner``, e.g. when that client went away."""
+        self._replace_session(owner, None)
+
+    def more(self, resolve_types: bool = True, owner: Hashable = None) -> Optional[List[Entry]]:
+        """The next page of the last search of ``owner``.
+
+        Continues the sources of that search where its previous page
+        stopped. Returns None if the search expired or was superseded, and
+        an empty list once every result has been shown.
+        """
+        session = self._sessions.get(owner)
+        if session is None or session.closed or session.token.cancelled:
+            return None
+        with self.stats.span('more'):
+            entries = session.next_page(session.limit)
+        logger.debug("Next page: %d results", len(entries))
+        return self._resolve_types(entries) if resolve_types else entries
+
+    def snippets(self, paths: List[str], owner: Hashable = None) -> Dict[str, Match]:
+        """The matching line of each of ``paths`` if the last search of
+        ``owner`` was a content search; scanned files are remembered, so
+        this rarely reads them again."""
+        session = self._sessions.get(owner)
+        if session is None or session.mode != 'grep':
+            return {}
+        regex = text_regex(session.pattern)
+        matches = {}
+        for path in paths:
+            match = self.content.search(path, regex)
+            if match is not None:
+                matches[path] = match
+        return matches
+
+    def has_more(self, owner: Hashable = None) -> bool:
+        """Whether ``more`` could return further results of the last search of ``owner``."""
+        session = self._sessions.get(owner)
+        return session is not None and session.has_more
@@ -13,31 +13,58 @@ from ulauncher.api.shared.event import PreferencesUpdateEvent
 from ulauncher.api.shared.event import ItemEnterEvent
 from ulauncher.api.shared.action.ExtensionCustomAction import ExtensionCustomAction
 from ulauncher.api.shared.action.DoNothingAction import DoNothingAction
+from ulauncher.api.shared.Response import Response
+import logging
 import subprocess
 import os
-import shutil
-import glob
+import threading
+import time
 
-from locator import Locator
+from cancel import SearchCancelled
+from client import DaemonClient, DaemonError
+from scheduler import QueryScheduler
+from stats import Stats
 
-locator = Locator()
+logger = logging.getLogger(__name__)
+
+# Searches, caches and the application index live in the search daemon
+# (daemon.py), which outlives extension reloads; it is started on demand
+client = DaemonClient()
+scheduler = QueryScheduler()
+# Timings measured on this side of the socket
+stats = Stats()
+
+
+def configure(**settings):
+    """Pass preferences on to the daemon without blocking the event loop."""
+    def worker():
+        try:
+            client.configure(**settings)
+        except DaemonError as e:
+            logger.error("Cannot configure search daemon: %s", e)
+
+    threading.Thread(target=worker, name='configure', daemon=True).start()
 
 class SearchFileExtension(Extension):
     def __init__(self):
         super(SearchFileExtension, self).__init__()
-        self.subscribe(KeywordQueryEvent, KeywordQueryEventListener())
+        self.keyword_listener = KeywordQueryEventListener()
+        self.subscribe(KeywordQueryEvent, self.keyword_listener)
         self.subscribe(PreferencesEvent, PreferencesEventListener())
         self.subscribe(PreferencesUpdateEvent, PreferencesUpdateEventListener())
         self.subscribe(ItemEnterEvent, ItemEnterEventListener())
 
 class PreferencesUpdateEventListener(EventListener):
     def on_event(self, event, extension):
-        if event.id == 'limit':
-            locator.set_limit(event.new_value)
+        if event.id in ('limit', 'backend', 'locate_backend', 'watch_budget'):
+            configure(**{event.id: event.new_value})
 
 class PreferencesEventListener(EventListener):
     def on_event(self, event, extension):
-        locator.set_limit(event.preferences['limit'])
+        configure(limit=event.preferences['limit'],
+                  backend=event.preferences.get('backend', 'scandir'),
+                  locate_backend=event.preferences.get('locate_backend', 'auto'),
+                  watch_budget=event.preferences.get('watch_budget', '16384'))
 
 class ItemEnterEventListener(EventListener):
     def on_event(self, event, extension):
@@ -47,10 +74,12 @@ class ItemEnterEventListener(EventListener):
                 # Handle open with action
                 file_path = data['file_path']
                 app_command = data['app_command']
+                # Desktop entries carry their whole command line
+                argv = app_command if isinstance(app_command, list) else [app_command]
                 try:
-                    subprocess.Popen([app_command, file_path])
+                    subprocess.Popen(argv + [file_path])
                 except Exception as e:
-                    print(f"Error opening with {app_command}: {e}")
+                    logger.error("Error opening with %s: %s", app_command, e)
             elif data.get('type') == 'open_with_trigger':
                 # Trigger Open With menu - set the query
                 file_path = data['file_path']
@@ -60,6 +89,14 @@ class ItemEnterEventListener(EventListener):
                     description='This will switch to Open With mode',
                     on_enter=SetUserQueryAction(f's openwith {file_path}')
                 )])
+            elif data.get('type') == 'more':
+                # Next page of the last search, continued in the background
+                def send(items):
+                    extension._client.send(Response(event, RenderResultListAction(items)))
+
+                query, offset = data['query'], data['offset']
+                scheduler.resume(lambda token: extension.keyword_listener.more(query, offset, token), send)
+                return None
         else:
             # Handle copy all paths (original functionality)
             results = data if isinstance(data, list) else []
@@ -72,24 +109,10 @@ class ItemEnterEventListener(EventListener):
 
 class KeywordQueryEventListener(EventListener):
     def __init__(self):
-        self.common_apps_cache = None
-        self.cache_timestamp = 0
-        self.cache_timeout = 300  # 5 minutes cache
+        # Entry types of the last results, so the Open With menu needs no stat
+        self.entry_types = {}
     
     def __help(self):
-        # Debug image paths
-        extension_path = os.path.dirname(os.path.abspath(__file__))
-        images_dir = os.path.join(extension_path, 'images')
-        print(f"Extension path: {extension_path}")
-        print(f"Images dir: {images_dir}")
-        
-        if os.path.exists(images_dir):
-            print("Images directory exists")
-            for img in os.listdir(images_dir):
-                print(f"Found image: {img}")
-        else:
-            print("Images directory does not exist!")
-        
         items = []
         items.append(ExtensionResultItem(icon='images/info.png',
             name='File search: s <pattern>',
@@ -98,19 +121,39 @@ class KeywordQueryEventListener(EventListener):
         ))
         items.append(ExtensionResultItem(icon='images/folder.png',
             name='Folder search: s dir <pattern>',
-            description='Search for directories only',
+            description='Directories anywhere on the system and on mounted drives',
             on_enter=SetUserQueryAction('s dir ')
         ))
+        items.append(ExtensionResultItem(icon='images/info.png',
+            name='Fuzzy search: s f <letters>',
+            description='Names containing the letters in order, e.g. "s f qrtrpt" for quarterly_report (drive indexes)',
+            on_enter=SetUserQueryAction('s f ')
+        ))
+        items.append(ExtensionResultItem(icon='images/info.png',
+            name='Content search: s grep <text>',
+            description='Text files in your home folder and on mounted drives containing the text',
+            on_enter=SetUserQueryAction('s grep ')
+        ))
         items.append(ExtensionResultItem(icon='images/hardware.png',
             name='Hardware search: s hw <pattern>',
             description='Search only mounted drives (/media, /mnt, /run/media)',
             on_enter=SetUserQueryAction('s hw ')
         ))
+        items.append(ExtensionResultItem(icon='images/info.png',
+            name='Filters: s <pattern> ext:pdf size>10M newer:7d type:f',
+            description='Also older:30d, size<1k, ext:jpg,png, type:d; combine with any mode',
+            on_enter=SetUserQueryAction('s ext:')
+        ))
         items.append(ExtensionResultItem(icon='images/raw.png',
             name='Raw locate: s r <args>',
             description='Raw plocate/locate arguments',
             on_enter=SetUserQueryAction('s r ')
         ))
+        items.append(ExtensionResultItem(icon='images/info.png',
+            name='Diagnostics: s stats',
+            description='Slowest search stages and mounts',
+            on_enter=SetUserQueryAction('s stats')
+        ))
         return items
     
     def __format_display_name(self, file_path):
@@ -159,95 +202,21 @@ class KeywordQueryEventListener(EventListener):
                     return filename
                     
         except Exception as e:
-            print(f"Error formatting display name for {file_path}: {e}")
+            logger.warning("Error formatting display name for %s: %s", file_path, e)
             return os.path.basename(file_path)
     
-    def __get_common_applications(self):
-        """Dynamically discover common applications on the system"""
-        import time
-        
-        # Use cached results if recent enough
-        current_time = time.time()
-        if (self.common_apps_cache and 
-            current_time - self.cache_timestamp < self.cache_timeout):
-            return self.common_apps_cache
-        
-        print("Scanning for available applications...")
-        common_apps = []
-        
-        # Common application directories to search
-        app_dirs = [
-            '/usr/bin',
-            '/usr/local/bin',
-            '/bin',
-            '/snap/bin',
-            os.path.expanduser('~/.local/bin'),
-        ]
-        
-        # Common desktop applications (without .desktop extension)
-        common_desktop_apps = [
-            # File managers
-            'nautilus', 'dolphin', 'thunar', 'pcmanfm', 'nemo', 'caja',
-            # Text editors
-            'gedit', 'code', 'subl', 'vim', 'nano', 'mousepad', 'kate', 'geany',
-            # Image viewers
-            'eog', 'feh', 'gimp', 'gthumb', 'shotwell',
-            # PDF viewers
-            'evince', 'okular', 'atril',
-            # Media players
-            'vlc', 'mpv', 'celluloid', 'rhythmbox', 'audacious', 'smplayer',
-            # Browsers
-            'firefox', 'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser',
-            # Terminals
-            'gnome-terminal', 'konsole', 'xfce4-terminal', 'terminator', 'tilix',
-            # Development
-            'code', 'subl', 'vim', 'nvim', 'emacs',
-            # Office
-            'libreoffice', 'soffice',
-        ]
-        
-        # Check which apps exist in PATH
-        for app in common_desktop_apps:
-            if shutil.which(app):
-                common_apps.append(app)
-        
-        # Search application directories for additional binaries
-        for app_dir in app_dirs:
-            if os.path.isdir(app_dir):
-                try:
-                    for app in os.listdir(app_dir):
-                        app_path = os.path.join(app_dir, app)
-                        if (os.path.isfile(app_path) and os.access(app_path, os.X_OK) and
-                            not app.startswith('.') and len(app) > 2):
-                            common_apps.append(app)
-                except (OSError, PermissionError):
-                    continue
-        
-        # Remove duplicates and sort
-        common_apps = sorted(list(set(common_apps)))
-        print(f"Found {len(common_apps)} applications: {common_apps}")
-        
-        # Cache the results
-        self.common_apps_cache = common_apps
-        self.cache_timestamp = current_time
-        
-        return common_apps
-    
-    def __get_file_type_specific_apps(self, file_path):
-        """Get appropriate applications based on file type"""
-        common_apps = self.__get_common_applications()
+    def __get_file_type_specific_apps(self, file_path, is_dir):
+        """Get appropriate applications based on file type, installed or not"""
         file_type_apps = []
         
         # Default applications that should always be available
         default_apps = ['xdg-open', 'gio']
         
         # Check if it's a directory
-        if os.path.isdir(file_path):
+        if is_dir:
             folder_apps = ['nautilus', 'dolphin', 'thunar', 'pcmanfm', 'nemo', 'caja', 
                           'gnome-terminal', 'konsole', 'xfce4-terminal', 'terminator']
-            for app in folder_apps:
-                if app in common_apps:
-                    file_type_apps.append(app)
+            file_type_apps.extend(folder_apps)
         
         else:
             # Get file extension
@@ -257,52 +226,38 @@ class KeywordQueryEventListener(EventListener):
             # Text files
             if ext in ['txt', 'md', 'log', 'conf', 'ini', 'py', 'js', 'html', 'css', 'json', 'xml', 'sh', 'bash']:
                 text_apps = ['gedit', 'code', 'subl', 'vim', 'nano', 'mousepad', 'kate', 'geany']
-                for app in text_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(text_apps)
             
             # PDF files
             elif ext == 'pdf':
                 pdf_apps = ['evince', 'okular', 'atril', 'firefox', 'chromium']
-                for app in pdf_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(pdf_apps)
             
             # Image files
             elif ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp', 'tiff']:
                 image_apps = ['eog', 'feh', 'gimp', 'gthumb', 'shotwell', 'firefox']
-                for app in image_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(image_apps)
             
             # Video files
             elif ext in ['mp4', 'avi', 'mkv', 'mov', 'webm', 'flv', 'wmv', 'm4v']:
                 video_apps = ['vlc', 'mpv', 'celluloid', 'smplayer', 'firefox']
-                for app in video_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(video_apps)
             
             # Audio files
             elif ext in ['mp3', 'wav', 'flac', 'ogg', 'm4a', 'aac', 'wma']:
                 audio_apps = ['vlc', 'rhythmbox', 'audacious', 'smplayer']
-                for app in audio_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(audio_apps)
             
             # Archive files
             elif ext in ['zip', 'tar', 'gz', 'bz2', 'xz', 'rar', '7z']:
                 archive_apps = ['file-roller', 'ark', 'xarchiver']
-                for app in archive_apps:
-                    if app in common_apps:
-                        file_type_apps.append(app)
+                file_type_apps.extend(archive_apps)
         
         # Add default applications
-        for app in default_apps:
-            if app in common_apps:
-                file_type_apps.append(app)
+        file_type_apps.extend(default_apps)
         
         # Remove duplicates and return
-        return list(set(file_type_apps))
+        return list(dict.fromkeys(file_type_apps))
     
     def __get_friendly_app_name(self, app_command):
         """Convert command name to friendly display name"""
@@ -356,23 +311,29 @@ class KeywordQueryEventListener(EventListener):
         
         return friendly_names.get(app_command, app_command)
     
-    def __get_open_with_apps(self, file_path):
+    def __get_open_with_apps(self, file_path, is_dir):
         """Get applications for opening files based on what's available on the system"""
         apps = []
         
-        # Get file type specific applications
-        file_type_apps = self.__get_file_type_specific_apps(file_path)
+        # The daemon knows which of them are installed, and the MIME registrations
+        installed = client.apps(file_path, is_dir, self.__get_file_type_specific_apps(file_path, is_dir))
+        file_type_apps = installed['available']
         
         for app_command in file_type_apps:
             app_name = self.__get_friendly_app_name(app_command)
             apps.append((app_name, app_command))
         
+        # Add applications registered for the file's MIME type
+        for app_name, argv in installed['mime_apps']:
+            if argv[0] not in file_type_apps:
+                apps.append((app_name, argv))
+        
         # Add a custom command option
         apps.append(('Custom Command...', 'custom'))
         
         return apps
 
-    def __create_open_with_menu(self, file_path):
+    def __create_open_with_menu(self, file_path, is_dir):
         """Create the Open With menu"""
         items = []
         
@@ -385,7 +346,7 @@ class KeywordQueryEventListener(EventListener):
         ))
         
         # Get available applications
-        apps = self.__get_open_with_apps(file_path)
+        apps = self.__get_open_with_apps(file_path, is_dir)
         
         for app_name, app_command in apps:
             if app_command == 'custom':
@@ -397,18 +358,18 @@ class KeywordQueryEventListener(EventListener):
                     on_enter=DoNothingAction()
                 ))
             else:
-                # Check if the application exists
-                app_exists = shutil.which(app_command) is not None
+                # Only installed applications are offered
+                command_text = ' '.join(app_command) if isinstance(app_command, list) else app_command
                 
                 items.append(ExtensionResultItem(
-                    icon='images/ok.png' if app_exists else 'images/warning.png',
+                    icon='images/ok.png',
                     name=app_name,
-                    description=f"Press Enter to open with {app_command}" if app_exists else f"Application not found: {app_command}",
+                    description=f"Press Enter to open with {command_text}",
                     on_enter=ExtensionCustomAction({
                         'type': 'open_with',
                         'file_path': file_path,
                         'app_command': app_command
-                    }, True) if app_exists else DoNothingAction()
+                    }, True)
                 ))
         
         # Add back to search item
@@ -429,8 +390,12 @@ class KeywordQueryEventListener(EventListener):
         if arg and arg.startswith('openwith '):
             try:
                 file_path = arg.split('openwith ', 1)[1].strip()
-                if os.path.exists(file_path):
-                    return RenderResultListAction(self.__create_open_with_menu(file_path))
+                # Results just shown carry their type; anything else is stat'ed once
+                is_dir = self.entry_types.get(file_path)
+                if is_dir is None and os.path.exists(file_path):
+                    is_dir = os.path.isdir(file_path)
+                if is_dir is not None:
+                    return RenderResultListAction(self.__create_open_with_menu(file_path, is_dir))
                 else:
                     items.append(ExtensionResultItem(
                         icon='images/error.png',
@@ -439,7 +404,7 @@ class KeywordQueryEventListener(EventListener):
                         on_enter=SetUserQueryAction('s ')
                     ))
             except Exception as e:
-                print(f"Error in openwith menu: {e}")
+                logger.error("Error in openwith menu: %s", e)
                 items.append(ExtensionResultItem(
                     icon='images/error.png',
                     name='Error opening Open With menu',
@@ -449,71 +414,186 @@ class KeywordQueryEventListener(EventListener):
 
         elif arg is None or arg.strip() == '':
             items = self.__help()
+        elif arg.strip() == 'stats':
+            items = self.__stats()
         else:
-            try:
-                print(f"Ulauncher searching for: '{arg}'")
-                results = locator.run(arg)
-                print(f"Ulauncher got {len(results)} results")
-                
-                if not results:
-                    items.append(ExtensionResultItem(
-                        icon='images/warning.png',
-                        name='No results found',
-                        description=f'No files matching "{arg}"',
-                        on_enter=SetUserQueryAction('s ')
-                    ))
-                else:
-                    alt_action = ExtensionCustomAction(results, True)
-                    
-                    for i, file_path in enumerate(results):
-                        # Format the display name to show filename/extension with context
-                        display_name = self.__format_display_name(file_path)
-                        
-                        # Check if it's a directory or file for icon
-                        icon = 'images/folder.png' if os.path.isdir(file_path) else 'images/ok.png'
-                        
-                        # Create Open With trigger action
-                        open_with_action = ExtensionCustomAction({
-                            'type': 'open_with_trigger', 
-                            'file_path': file_path
-                        }, True)
-                        
-                        # Create the main search result item
-                        items.append(ExtensionResultItem(
-                            icon=icon,
-                            name=display_name,
-                            description=f"{file_path} | Alt+Enter for Open With",
-                            on_enter=OpenAction(file_path),
-                            on_alt_enter=open_with_action
-                        ))
-                    
-                    # Add info item showing search mode
-                    mode_info = "File search"
-                    if arg.lower().startswith('hw '):
-                        mode_info = "Hardware-only search"
-                    elif arg.lower().startswith('r '):
-                        mode_info = "Raw locate search"
-                    elif arg.lower().startswith('dir ') or arg.lower().startswith('folder '):
-                        mode_info = "Directory search"
-                    
-                    items.append(ExtensionResultItem(
-                        icon='images/info.png',
-                        name=f"Found {len(results)} results - {mode_info}",
-                        description="Enter: Open | Alt+Enter: Open With | Ctrl+Enter: Copy all",
-                        on_enter=SetUserQueryAction('s ')
-                    ))
-                        
-            except Exception as e:
-                error_info = str(e)
-                print(f"Ulauncher error: {error_info}")
-                items = [ExtensionResultItem(
-                    icon='images/error.png',
-                    name='Search error',
-                    description=error_info,
-                    on_enter=CopyToClipboardAction(error_info)
+            # Searches run in the background; a newer keystroke cancels this one
+            def send(items):
+                extension._client.send(Response(event, RenderResultListAction(items)))
+
+            scheduler.submit(lambda token: self.__search(arg, token), send)
+            return None
+
+        scheduler.cancel()
+        return RenderResultListAction(items)
+
+    def __stats(self):
+        """Show the slowest search stages and mounts"""
+        items = []
+        try:
+            daemon_stats = client.stats()
+        except DaemonError as e:
+            return self.__error_items(e)
+        for health in daemon_stats['unhealthy']:
+            state = 'skipped' if health['skipped'] else 'retrying'
+            items.append(ExtensionResultItem(
+                icon='images/warning.png',
+                name=f"Unresponsive: {health['mountpoint']}",
+                description=f"{health['failures']} timeouts in a row | {state}",
+                on_enter=SetUserQueryAction('s stats')
+            ))
+        # Stages timed here (query round trip, formatting) next to the daemon's
+        stages = sorted(daemon_stats['stages'] + stats.summary(limit=6, by_key=False),
+                        key=lambda row: row['p95'], reverse=True)[:6]
+        for title, by_key, rows in (('Stage', False, stages), ('Mount', True, daemon_stats['mounts'])):
+            for row in rows:
+                stage, key = row['stage'], row['key']
+                name = f"{stage}: p95 {row['p95']:.1f} ms" if key is None else \
+                    f"{stage} on {key}: p95 {row['p95']:.1f} ms"
+                summary = (f"{title} | p50 {row['p50']:.1f} ms | max {row['max']:.1f} ms | "
+                           f"{row['count']} samples")
+                items.append(ExtensionResultItem(
+                    icon='images/hardware.png' if by_key else 'images/info.png',
+                    name=name,
+                    description=summary,
+                    on_enter=CopyToClipboardAction(f"{name} | {summary}")
+                ))
+        if not items:
+            items.append(ExtensionResultItem(
+                icon='images/info.png',
+                name='No timings recorded yet',
+                description='Run a few searches first',
+                on_enter=SetUserQueryAction('s ')
+            ))
+        return items
+
+    def __search(self, arg, token):
+        """Run the search for ``arg`` and build its result items."""
+        try:
+            logger.debug("Ulauncher searching for: '%s'", arg)
+            with stats.span('query'):
+                entries, has_more, snippets = client.search(arg, token=token)
+            logger.debug("Ulauncher got %d results", len(entries))
+            if not entries:
+                return [ExtensionResultItem(
+                    icon='images/warning.png',
+                    name='No results found',
+                    description=f'No files matching "{arg}"',
+                    on_enter=SetUserQueryAction('s ')
                 )]
+            self.entry_types = {}
+            return self.__result_items(arg, entries, 0, has_more, snippets)
+        except SearchCancelled:
+            raise
+        except Exception as e:
+            return self.__error_items(e)
+
+    def more(self, arg, offset, token):
+        """Build the page of results following the first ``offset`` ones."""
+        token.check()
+        try:
+            entries, has_more, snippets = client.more(token)
+        except SearchCancelled:
+            raise
+        except Exception as e:
+            return self.__error_items(e)
+        if entries is None:
+            # The sources were closed meanwhile; searching again starts over
+            return [ExtensionResultItem(
+                icon='images/info.png',
+                name='These results have expired',
+                description='Press Enter to search again',
+                on_enter=SetUserQueryAction(f's {arg}')
+            )]
+        if not entries:
+            return [ExtensionResultItem(
+                icon='images/info.png',
+                name='No more results',
+                description=f'All results for "{arg}" have been shown',
+                on_enter=SetUserQueryAction(f's {arg}')
+            )]
+        return self.__result_items(arg, entries, offset, has_more, snippets)
+
+    def __result_items(self, arg, entries, offset, has_more, snippets):
+        """Items for one page of results, starting at result number ``offset``."""
+        format_started = time.perf_counter()
+        items = []
+        for file_path, is_dir in entries:
+            # Format the display name to show filename/extension with context
+            display_name = self.__format_display_name(file_path)
+            
+            # The search reports the entry type; unknown types get the generic icon
+            if is_dir is None:
+                icon = 'images/icon.png'
+            else:
+                icon = 'images/folder.png' if is_dir else 'images/ok.png'
+                self.entry_types[file_path] = is_dir
+            
+            # Create Open With trigger action
+            open_with_action = ExtensionCustomAction({
+                'type': 'open_with_trigger', 
+                'file_path': file_path
+            }, True)
+            
+            # Content search results show the matching line instead of the path
+            if file_path in snippets:
+                line, text = snippets[file_path]
+                description = f"{line}: {text}"
+            else:
+                description = f"{file_path} | Alt+Enter for Open With"
+            
+            # Create the main search result item
+            items.append(ExtensionResultItem(
+                icon=icon,
+                name=display_name,
+                description=description,
+                on_enter=OpenAction(file_path),
+                on_alt_enter=open_with_action
+            ))
         
-        return RenderResultListAction(items)
+        # Add info item showing search mode
+        mode_info = "File search"
+        if arg.lower().startswith('hw '):
+            mode_info = "Hardware-only search"
+        elif arg.lower().startswith('r '):
+            mode_info = "Raw locate search"
+        elif arg.lower().startswith('f '):
+            mode_info = "Fuzzy search"
+        elif arg.lower().startswith('grep '):
+            mode_info = "Content search"
+        elif arg.lower().startswith('dir ') or arg.lower().startswith('folder '):
+            mode_info = "Directory search"
+        
+        shown = offset + len(entries)
+        if has_more:
+            items.append(ExtensionResultItem(
+                icon='images/info.png',
+                name='More results…',
+                description=f"Show the next {len(entries)} results",
+                on_enter=ExtensionCustomAction({'type': 'more', 'query': arg, 'offset': shown}, True)
+            ))
+        
+        name = f"Found {len(entries)} results - {mode_info}" if offset == 0 else \
+            f"Results {offset + 1}–{shown} - {mode_info}"
+        items.append(ExtensionResultItem(
+            icon='images/info.png',
+            name=name,
+            description="Enter: Open | Alt+Enter: Open With | Ctrl+Enter: Copy all",
+            on_enter=SetUserQueryAction('s ')
+        ))
+        stats.record('format', (time.perf_counter() - format_started) * 1000)
+        return items
+
+    def __error_items(self, e):
+        error_info = str(e)
+        logger.error("Ulauncher error: %s", error_info)
+        return [ExtensionResultItem(
+            icon='images/error.png',
+            name='Search error',
+            description=error_info,
+            on_enter=CopyToClipboardAction(error_info)
+        )]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=os.environ.get('FILEFLOW_LOG_LEVEL', 'INFO').upper())
     SearchFileExtension().run()
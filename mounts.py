@@ -0,0 +1,176 @@
+import logging
+import os
+import re
+import select
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MOUNTINFO = '/proc/self/mountinfo'
+UUID_DIR = '/dev/disk/by-uuid'
+
+NETWORK_FSTYPES = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', '9p', 'afs', 'ceph',
+    'glusterfs', 'lustre', 'davfs', 'fuse.sshfs', 'fuse.rclone', 'fuse.davfs2',
+    'fuse.gvfsd-fuse', 'fuse.s3fs', 'fuse.glusterfs',
+}
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(field: str) -> str:
+    """Decode the octal escapes mountinfo uses for spaces, tabs and newlines."""
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+class Mount:
+    """One line of /proc/self/mountinfo."""
+
+    def __init__(self, mount_id: int, device: str, mountpoint: str, fstype: str, source: str):
+        self.mount_id = mount_id
+        self.device = device          # "major:minor" of the filesystem
+        self.mountpoint = mountpoint
+        self.fstype = fstype
+        self.source = source          # e.g. /dev/sdb1, server:/export
+        self.uuid: Optional[str] = None  # filesystem UUID of block devices
+
+    @property
+    def is_fuse(self) -> bool:
+        return self.fstype == 'fuse' or self.fstype.startswith('fuse.')
+
+    @property
+    def is_network(self) -> bool:
+        return self.fstype in NETWORK_FSTYPES
+
+    @property
+    def is_remote(self) -> bool:
+        """Network filesystems and FUSE mounts, where walking is slow or unreliable."""
+        return self.is_network or self.is_fuse
+
+    def __repr__(self):
+        return f"Mount({self.mountpoint!r}, {self.fstype}, {self.source})"
+
+    @classmethod
+    def parse(cls, line: str) -> Optional['Mount']:
+        # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+        fields = line.split()
+        try:
+            sep = fields.index('-', 6)
+            return cls(int(fields[0]), fields[2], _unescape(fields[4]),
+                       fields[sep + 1], _unescape(fields[sep + 2]))
+        except (ValueError, IndexError):
+            return None
+
+
+class MountRegistry:
+    """Mount table kept up to date from /proc/self/mountinfo.
+
+    The table is parsed once; afterwards a background thread polls the
+    mountinfo file descriptor, which the kernel marks with POLLPRI/POLLERR
+    whenever something is mounted or unmounted, and only then parses it
+    again. Looking up the hardware mounts therefore costs nothing per query.
+    """
+
+    def __init__(self, bases: List[str], path: str = MOUNTINFO):
+        self.bases = bases
+        self.path = path
+        self.generation = 0
+        self._mounts: List[Mount] = []
+        self._listeners: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.available = os.path.exists(path)
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call ``listener`` after every change of the mount table."""
+        self._listeners.append(listener)
+
+    def _read(self, f) -> List[Mount]:
+        f.seek(0)
+        mounts = []
+        for line in f.read().splitlines():
+            mount = Mount.parse(line)
+            if mount is not None:
+                mounts.append(mount)
+        return mounts
+
+    @staticmethod
+    def _read_uuids() -> dict:
+        """Map resolved device paths to filesystem UUIDs."""
+        uuids = {}
+        try:
+            with os.scandir(UUID_DIR) as it:
+                for entry in it:
+                    uuids[os.path.realpath(entry.path)] = entry.name
+        except OSError:
+            pass
+        return uuids
+
+    def _install(self, mounts: List[Mount]):
+        uuids = self._read_uuids()
+        for mount in mounts:
+            if mount.source.startswith('/dev/'):
+                mount.uuid = uuids.get(os.path.realpath(mount.source))
+        with self._lock:
+            self._mounts = mounts
+            self.generation += 1
+        logger.debug("Mount table loaded: %d hardware mounts", len(self.hardware_mounts()))
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.exception("Error in mount listener: %s", e)
+
+    def refresh(self):
+        """Parse the mount table now."""
+        try:
+            with open(self.path) as f:
+                self._install(self._read(f))
+        except OSError as e:
+            logger.warning("Error reading %s: %s", self.path, e)
+            self.available = False
+
+    def start(self):
+        """Load the table and start watching it for changes."""
+        with self._lock:
+            if self._watcher is not None or not self.available:
+                return
+            self._watcher = threading.Thread(target=self._watch, name="mount-watch", daemon=True)
+        self.refresh()
+        self._watcher.start()
+
+    def _watch(self):
+        try:
+            with open(self.path) as f:
+                self._read(f)
+                poller = select.poll()
+                poller.register(f, select.POLLPRI | select.POLLERR)
+                while True:
+                    if poller.poll():
+                        self._install(self._read(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Stopped watching %s: %s", self.path, e)
+
+    def all_mounts(self) -> List[Mount]:
+        return list(self._mounts)
+
+    def hardware_mounts(self) -> List[Mount]:
+        """Mounts below one of the hardware bases, e.g. /run/media/<user>/<volume>."""
+        prefixes = tuple(base.rstrip('/') + '/' for base in self.bases)
+        # Later entries are mounted on top of earlier ones at the same path
+        by_path = {}
+        for mount in self._mounts:
+            if mount.mountpoint.startswith(prefixes):
+                by_path[mount.mountpoint] = mount
+        return list(by_path.values())
+
+    def find(self, path: str) -> Optional[Mount]:
+        """The innermost hardware mount ``path`` lives on."""
+        best = None
+        for mount in self.hardware_mounts():
+            root = mount.mountpoint
+            if path == root or path.startswith(root.rstrip('/') + '/'):
+                if best is None or len(root) > len(best.mountpoint):
+                    best = mount
+        return best
@@ -0,0 +1,544 @@
+import logging
+import os
+import fnmatch
+import mmap
+import re
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fuzzy import FuzzyScan, normalize, top_names
+from storage import write_atomic
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FFPIDX02'
+# Section order of the serialized index; the header stores each byte length
+SECTIONS = ('lower', 'offsets', 'mixed_idx', 'mixed_offsets', 'mixed_names', 'dir_idx', 'child_start', 'dir_mtime')
+HEADER = struct.Struct('<8s%dQ' % len(SECTIONS))
+
+
+def _pad(length: int) -> int:
+    return (length + 7) & ~7
+
+
+class _Store:
+    """Read-only view of a serialized index, backed by ``bytes`` or an ``mmap``.
+
+    Entries are numbered in breadth-first order, so the children of every
+    directory form one contiguous run. Per entry only its lowercased
+    basename is stored, which is what searches scan; the few names that are
+    not all lowercase are kept a second time as they are ("mixed"). Per
+    directory there is its entry number, its first child and its mtime.
+    Parents and entry types follow from those with a bisect.
+    """
+
+    def __init__(self, buf):
+        magic, *lengths = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError('not a FileFlow index')
+        view = memoryview(buf)
+        spans = {}
+        pos = HEADER.size
+        for name, length in zip(SECTIONS, lengths):
+            spans[name] = (pos, pos + length)
+            pos += _pad(length)
+        if pos > len(buf):
+            raise ValueError('truncated FileFlow index')
+
+        self.buf = buf
+        self.lower_start, self.lower_end = spans['lower']
+        self.offsets = view[slice(*spans['offsets'])].cast('I')
+        self.mixed_idx = view[slice(*spans['mixed_idx'])].cast('I')
+        self.mixed_offsets = view[slice(*spans['mixed_offsets'])].cast('I')
+        self.mixed_start = spans['mixed_names'][0]
+        self.dir_idx = view[slice(*spans['dir_idx'])].cast('I')
+        self.child_start = view[slice(*spans['child_start'])].cast('I')
+        self.dir_mtime = view[slice(*spans['dir_mtime'])].cast('q')
+        self.count = len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buf)
+
+    def name(self, i: int) -> bytes:
+        pos = bisect_left(self.mixed_idx, i)
+        if pos < len(self.mixed_idx) and self.mixed_idx[pos] == i:
+            start = self.mixed_start
+            return self.buf[start + self.mixed_offsets[pos]:start + self.mixed_offsets[pos + 1] - 1]
+        return self.lower(i)
+
+    def lower(self, i: int) -> bytes:
+        start = self.lower_start
+        return self.buf[start + self.offsets[i]:start + self.offsets[i + 1] - 1]
+
+    def _dir_pos(self, i: int) -> int:
+        """Position of entry ``i`` among the directories, or -1 for a file."""
+        pos = bisect_left(self.dir_idx, i)
+        if pos < len(self.dir_idx) and self.dir_idx[pos] == i:
+            return pos
+        return -1
+
+    def is_dir(self, i: int) -> bool:
+        return self._dir_pos(i) >= 0
+
+    def parent(self, i: int) -> int:
+        return self.dir_idx[bisect_right(self.child_start, i) - 1]
+
+    def children(self, i: int) -> range:
+        pos = self._dir_pos(i)
+        if pos < 0:
+            return range(0)
+        return range(self.child_start[pos], self.child_start[pos + 1])
+
+    def dir_mtime_of(self, i: int) -> Optional[int]:
+        pos = self._dir_pos(i)
+        return self.dir_mtime[pos] if pos >= 0 else None
+
+
+class _StoreBuilder:
+    """Appends entries straight into the buffers of a ``_Store``.
+
+    Entries must be added breadth-first: ``add_dir`` for a directory, then
+    ``add`` for each of its children, so no per-entry Python objects are
+    kept while a large drive is walked.
+    """
+
+    def __init__(self):
+        # The root entry, with an empty name
+        self.lower = bytearray(b'\0')
+        self.offsets = array('I', [0])
+        self.mixed_idx = array('I')
+        self.mixed_offsets = array('I')
+        self.mixed_names = bytearray()
+        self.dir_idx = array('I')
+        self.child_start = array('I')
+        self.dir_mtime = array('q')
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets)
+
+    def add_dir(self, i: int, mtime: int):
+        """Start the children of directory entry ``i``."""
+        self.dir_idx.append(i)
+        self.dir_mtime.append(mtime)
+        self.child_start.append(len(self.offsets))
+
+    def add(self, name: bytes, lower: bytes) -> int:
+        i = len(self.offsets)
+        self.offsets.append(len(self.lower))
+        self.lower += lower
+        self.lower.append(0)
+        if name != lower:
+            self.mixed_idx.append(i)
+            self.mixed_offsets.append(len(self.mixed_names))
+            self.mixed_names += name
+            self.mixed_names.append(0)
+        return i
+
+    def serialize(self) -> bytes:
+        offsets = array('I', self.offsets)
+        # Sentinels so entry i always spans offsets[i]..offsets[i + 1]
+        offsets.append(len(self.lower))
+        mixed_offsets = array('I', self.mixed_offsets)
+        mixed_offsets.append(len(self.mixed_names))
+        child_start = array('I', self.child_start)
+        child_start.append(len(self.offsets))
+        sections = [
+            self.lower,
+            offsets.tobytes(),
+            self.mixed_idx.tobytes(),
+            mixed_offsets.tobytes(),
+            self.mixed_names,
+            self.dir_idx.tobytes(),
+            child_start.tobytes(),
+            self.dir_mtime.tobytes(),
+        ]
+        out = [HEADER.pack(MAGIC, *(len(s) for s in sections))]
+        for section in sections:
+            out.append(section)
+            out.append(b'\0' * (_pad(len(section)) - len(section)))
+        return b''.join(out)
+
+
+class PathIndex:
+    """Index of every file and directory below one mount point.
+
+    Entries are stored as a basename within their parent directory's run of
+    children, so no full path strings are kept; a path is rebuilt only for
+    the results that are returned. All basenames live in one NUL-separated
+    buffer (plus a lowercased copy used for matching), which lets a substring
+    query run as repeated ``find`` calls over a single buffer instead of a
+    Python-level loop over millions of names.
+
+    With a ``db_path`` the index is also saved to disk and searched through
+    ``mmap``. A saved index is usable right away when the volume is attached
+    again; the refresh then only lists directories whose mtime changed.
+
+    Changes reported while the drive is mounted (see ``watcher.IndexWatcher``)
+    go into a small overlay on top of the packed entries: paths created since
+    the last build, and paths deleted since then, which hide their packed
+    entries and everything below. A build folds the overlay back in; one
+    also starts once it holds more than ``overlay_limit`` paths.
+    """
+
+    GLOB_CHARS = '*?['
+
+    def __init__(self, root: str, db_path: Optional[str] = None, overlay_limit: int = 20000):
+        self.root = root.rstrip('/') or '/'
+        self.db_path = db_path
+        self.overlay_limit = overlay_limit
+        self.built_at = 0.0
+        self.building = False
+        # Another build is due once the running one finished
+        self._rebuild = False
+        self._lock = threading.Lock()
+        self._store: Optional[_Store] = None
+        self._ready = threading.Event()
+        self._listeners: List[Callable[[], None]] = []
+        self._change_listeners: List[Callable[[], None]] = []
+        # Created path -> (is_dir, change number) and deleted path -> change
+        # number; replaced as a whole on every change, so searches iterate
+        # a consistent snapshot without locking
+        self._added: Dict[str, Tuple[bool, int]] = {}
+        self._removed: Dict[str, int] = {}
+        self._changes = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._store is not None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the first build (or saved index) made the index searchable."""
+        return self._ready.wait(timeout)
+
+    def add_listener(self, listener: Callable[[], None], changes: bool = False):
+        """Call ``listener`` after every build.
+
+        Args:
+            changes: Also call it after every batch of ``apply_changes``
+        """
+        self._listeners.append(listener)
+        if changes:
+            self._change_listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        for listeners in (self._listeners, self._change_listeners):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self._added) + len(self._removed)
+
+    def __len__(self):
+        # The root entry itself is not searchable
+        store = self._store
+        return store.count - 1 if store else 0
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the index, in memory or mapped from disk."""
+        store = self._store
+        return store.nbytes if store else 0
+
+    def _load_db(self) -> Optional[_Store]:
+        try:
+            with open(self.db_path, 'rb') as f:
+                return _Store(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def build(self):
+        """Walk the mount and replace the index contents once finished.
+
+        Directories whose mtime matches the previous index (or the saved
+        database) keep their previous listing.
+        """
+        old = self._store
+        if old is None and self.db_path:
+            old = self._load_db()
+            if old is not None:
+                self._store = old
+                self._ready.set()
+                logger.info("Loaded saved index of %s: %d paths", self.root, len(self))
+
+        started = time.time()
+        # Changes from before the walk are part of its result
+        folded = self._changes
+        data, reused, rescanned = self._walk(old)
+        store = _Store(data)
+        if self.db_path:
+            try:
+                write_atomic(self.db_path, data)
+                store = self._load_db() or store
+            except OSError as e:
+                logger.warning("Could not save index of %s: %s", self.root, e)
+        with self._lock:
+            self._store = store
+            self._added = {p: v for p, v in self._added.items() if v[1] > folded}
+            self._removed = {p: n for p, n in self._removed.items() if n > folded}
+        self._ready.set()
+        self.built_at = time.time()
+        logger.info("Indexed %d paths in %s in %.2fs, %.1f bytes per path (%d directories reused, %d listed)",
+                    len(self), self.root, self.built_at - started, self.nbytes / max(1, len(self)),
+                    reused, rescanned)
+        self._notify(self._listeners)
+
+    def _notify(self, listeners: List[Callable[[], None]]):
+        for listener in list(listeners):
+            try:
+                listener()
+            except Exception as e:
+                logger.exception("Error in index listener: %s", e)
+
+    def apply_changes(self, changes: Iterable[Tuple[str, Optional[bool]]]):
+        """Record created and deleted paths, in the order they happened.
+
+        Args:
+            changes: (path, is_dir) of each created path, (path, None) of
+                each deleted one
+        """
+        with self._lock:
+            added = dict(self._added)
+            removed = dict(self._removed)
+            for path, is_dir in changes:
+                self._changes += 1
+                # Packed entries at and below a changed path are hidden, so
+                # a path replaced by a rename is listed once, from the overlay
+                removed[path] = self._changes
+                if is_dir is None:
+                    added.pop(path, None)
+                    prefix = path + '/'
+                    for child in [p for p in added if p.startswith(prefix)]:
+                        del added[child]
+                else:
+                    added[path] = (is_dir, self._changes)
+            self._added = added
+            self._removed = removed
+        self._notify(self._change_listeners)
+        if self.overlay_size > self.overlay_limit:
+            self.build_async()
+
+    def _hidden(self, path: str, removed: Dict[str, int]) -> bool:
+        """Whether a packed entry was deleted, itself or with a parent."""
+        root_len = len(self.root)
+        while len(path) > root_len:
+            if path in removed:
+                return True
+            path = os.path.dirname(path)
+        return False
+
+    def iter_dirs(self) -> Iterator[str]:
+        """Paths of every indexed directory, breadth-first, the root first."""
+        store = self._store
+        if store is None:
+            return
+        removed = self._removed
+        dir_paths = {}
+        for i in store.dir_idx:
+            path = self.path(i, store, dir_paths)
+            if not removed or not self._hidden(path, removed):
+                yield path
+        for path, (is_dir, _) in list(self._added.items()):
+            if is_dir:
+                yield path
+
+    def _walk(self, old: Optional[_Store]):
+        builder = _StoreBuilder()
+        reused = rescanned = 0
+
+        # Breadth-first, so every directory's children stay contiguous
+        queue = deque([(0, self.root, 0 if old is not None else None)])
+        while queue:
+            idx, dir_path, old_idx = queue.popleft()
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                # Still a directory, just an empty one; never matches a real mtime
+                mtime = -1
+            builder.add_dir(idx, mtime)
+            if mtime < 0:
+                continue
+
+            if old_idx is not None and old.dir_mtime_of(old_idx) == mtime:
+                reused += 1
+                for j in old.children(old_idx):
+                    child = builder.add(old.name(j), old.lower(j))
+                    if old.is_dir(j):
+                        queue.append((child, os.path.join(dir_path, os.fsdecode(old.name(j))), j))
+                continue
+
+            rescanned += 1
+            previous = {}
+            if old_idx is not None:
+                previous = {old.name(j): j for j in old.children(old_idx) if old.is_dir(j)}
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        # DirEntry already knows the type so no stat calls
+                        try:
+                            entry_is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            entry_is_dir = False
+                        name = os.fsencode(entry.name)
+                        child = builder.add(name, os.fsencode(entry.name.lower()))
+                        if entry_is_dir:
+                            queue.append((child, entry.path, previous.get(name)))
+            except OSError:
+                pass
+
+        return builder.serialize(), reused, rescanned
+
+    def build_async(self, again: bool = False):
+        """Start a background build unless one is already running.
+
+        Args:
+            again: If one is running, build once more after it, since it
+                may have listed changed directories before they changed
+        """
+        with self._lock:
+            if self.building:
+                self._rebuild = self._rebuild or again
+                return
+            self.building = True
+
+        def worker():
+            while True:
+                try:
+                    self.build()
+                except Exception as e:
+                    logger.exception("Error indexing %s: %s", self.root, e)
+                with self._lock:
+                    if not self._rebuild:
+                        self.building = False
+                        return
+                    self._rebuild = False
+
+        threading.Thread(target=worker, name=f"index:{self.root}", daemon=True).start()
+
+    def path(self, i: int, store: Optional[_Store] = None, dir_paths: Optional[dict] = None) -> str:
+        """Rebuild the full path of entry ``i``.
+
+        ``dir_paths`` caches rebuilt directory paths across calls, for
+        results that share their parents.
+        """
+        store = store or self._store
+        if dir_paths is None:
+            dir_paths = {}
+        parts = []
+        prefix = self.root
+        while i > 0:
+            cached = dir_paths.get(i)
+            if cached is not None:
+                prefix = cached
+                break
+            parts.append(i)
+            i = store.parent(i)
+        for j in reversed(parts):
+            prefix = os.path.join(prefix, os.fsdecode(store.name(j)))
+            dir_paths[j] = prefix
+        return prefix
+
+    def search(self, pattern: str, limit: int, search_type: Optional[str] = None) -> List[Tuple[str, bool]]:
+        """Return up to ``limit`` (path, is_dir) pairs whose basename contains ``pattern``.
+
+        Matching is case-insensitive like ``find -iname '*pattern*'``; glob
+        characters in the pattern are honoured the same way.
+
+        Args:
+            pattern: Search pattern
+            search_type: "file", "directory" or None for both
+        """
+        return list(islice(self.iter_search(pattern, search_type), limit))
+
+    def iter_search(self, pattern: str, search_type: Optional[str] = None) -> Iterator[Tuple[str, bool]]:
+        """Lazily yield every (path, is_dir) that ``search`` would return."""
+        store = self._store
+        if store is None:
+            return
+        added, removed = self._added, self._removed
+        if any(c in pattern for c in self.GLOB_CHARS):
+            hits = self._search_glob(store, pattern, search_type)
+            matches = re.compile(fnmatch.translate(f"*{pattern}*"), re.IGNORECASE | re.DOTALL).match
+        else:
+            hits = self._search_substring(store, os.fsencode(pattern.lower()), search_type)
+            needle = pattern.lower()
+            matches = lambda name: needle in name.lower()  # noqa: E731
+        dir_paths = {}
+        for i in hits:
+            path = self.path(i, store, dir_paths)
+            if not removed or not self._hidden(path, removed):
+                yield path, store.is_dir(i)
+        for path, (is_dir, _) in list(added.items()):
+            if (search_type is None or is_dir == (search_type == 'directory')) and \
+                    matches(os.path.basename(path)):
+                yield path, is_dir
+
+    def fuzzy_search(self, pattern: str, k: int, search_type: Optional[str] = None) -> List[Tuple[float, str, bool]]:
+        """The ``k`` best fuzzy matches of ``pattern`` as (score, path, is_dir), best first.
+
+        A basename matches when it contains the characters of the pattern in
+        order, e.g. "qrtrpt" matches "quarterly_report.pdf"; see ``fuzzy``.
+        """
+        store = self._store
+        needle = normalize(pattern)
+        if store is None or not needle:
+            return []
+        added, removed = self._added, self._removed
+        # Deleted entries are dropped after scoring, so ask for that many more
+        scored = FuzzyScan(store, search_type).top(needle, k + len(removed))
+        results = []
+        dir_paths = {}
+        for value, i in scored:
+            path = self.path(i, store, dir_paths)
+            if not removed or not self._hidden(path, removed):
+                results.append((value, path, store.is_dir(i)))
+        if added:
+            loose = [(path, is_dir) for path, (is_dir, _) in added.items()
+                     if search_type is None or is_dir == (search_type == 'directory')]
+            names = [(os.fsencode(os.path.basename(path).lower()), n) for n, (path, _) in enumerate(loose)]
+            results.extend((value, *loose[n]) for value, n in top_names(names, needle, k))
+            results.sort(key=lambda r: -r[0])
+        return results[:k]
+
+    @staticmethod
+    def _type_matches(store: _Store, i: int, search_type: Optional[str]) -> bool:
+        if search_type is None:
+            return True
+        return store.is_dir(i) == (search_type == 'directory')
+
+    def _search_substring(self, store: _Store, needle: bytes, search_type: Optional[str]) -> Iterator[int]:
+        # An empty needle (a filter-only query) matches every entry
+        if b'\0' in needle:
+            return
+        buf = store.buf
+        base = store.lower_start
+        end = store.lower_end
+        offsets = store.offsets
+        count = store.count
+        # Skip the root entry
+        pos = base + offsets[1] if count > 1 else end
+        while True:
+            pos = buf.find(needle, pos, end)
+            if pos < 0:
+                return
+            i = bisect_right(offsets, pos - base) - 1
+            if self._type_matches(store, i, search_type):
+                yield i
+            if i + 1 >= count:
+                return
+            pos = base + offsets[i + 1]
+
+    def _search_glob(self, store: _Store, pattern: str, search_type: Optional[str]) -> Iterator[int]:
+        regex = re.compile(fnmatch.translate(f"*{pattern}*"), re.IGNORECASE | re.DOTALL)
+        for i in range(1, store.count):
+            # Case-insensitive anyway, and lowercased names need no lookup
+            if regex.match(os.fsdecode(store.lower(i))) and self._type_matches(store, i, search_type):
+                yield i
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# A candidate is a (path, source, is_dir) triple; source is "locate" or "hw",
+# is_dir is None when the source does not know the entry type
+Candidate = Tuple[str, str, Optional[bool]]
+
+
+class CacheEntry:
+    def __init__(self, candidates: List[Candidate], complete: bool):
+        self.candidates = candidates
+        # True when the candidates are every match the sources could produce,
+        # which makes the entry usable for refining longer patterns
+        self.complete = complete
+        self.created = time.monotonic()
+
+
+class QueryCache:
+    """LRU cache of search candidates keyed by (mode, pattern, limit).
+
+    As-you-type queries ("rep", "repo", "repor") are answered by filtering the
+    candidates of an earlier, shorter query when that query's candidate set
+    was complete, instead of running locate or the hardware search again.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, int], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(mode: str, pattern: str, limit: int):
+        return (mode, pattern.lower(), limit)
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def get(self, mode: str, pattern: str, limit: int) -> Optional[List[Candidate]]:
+        """Return the candidates cached for exactly this query."""
+        entry = self.get_entry(mode, pattern, limit)
+        return entry.candidates if entry is not None else None
+
+    def get_entry(self, mode: str, pattern: str, limit: int) -> Optional[CacheEntry]:
+        """Like ``get``, but also tells whether the candidates are complete."""
+        key = self._key(mode, pattern, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get_base(self, mode: str, pattern: str, limit: int) -> Optional[List[Candidate]]:
+        """Return the complete candidate set of the longest cached query that
+        ``pattern`` extends, if there is one.
+
+        Every match for ``pattern`` contains the shorter pattern too, so it is
+        guaranteed to be among that query's candidates.
+        """
+        needle = pattern.lower()
+        best_key = None
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry):
+                    del self._entries[key]
+                    continue
+                entry_mode, entry_pattern, entry_limit = key
+                if (entry_mode != mode or entry_limit != limit or not entry.complete
+                        or entry_pattern == needle or entry_pattern not in needle):
+                    continue
+                if best_key is None or len(entry_pattern) > len(best_key[1]):
+                    best_key = key
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key].candidates
+
+    def put(self, mode: str, pattern: str, limit: int, candidates: List[Candidate], complete: bool):
+        key = self._key(mode, pattern, limit)
+        with self._lock:
+            self._entries[key] = CacheEntry(candidates, complete)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
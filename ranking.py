@@ -0,0 +1,63 @@
+import heapq
+import os
+import re
+from typing import Iterable, List, Tuple
+
+# Small bonus per source; keeps locate hits (and the directory index's,
+# which come from the locate database) ahead of hardware hits on ties
+SOURCE_WEIGHTS = {'locate': 5, 'dirs': 5, 'hw': 0}
+
+_GLOB_SPLIT = re.compile(r'[*?\[\]]+')
+
+
+def literal_needle(pattern: str) -> str:
+    """Longest glob-free part of ``pattern``, lowercased, used for scoring."""
+    parts = _GLOB_SPLIT.split(pattern.lower())
+    return max(parts, key=len) if parts else ''
+
+
+def score(needle: str, path: str, source: str) -> float:
+    """Score one candidate; higher is better.
+
+    Combines an exact basename match, where in the basename the pattern
+    matches, how deep the path is and which source produced it.
+    """
+    basename = os.path.basename(path.rstrip('/')).lower()
+    stem = os.path.splitext(basename)[0]
+    value = SOURCE_WEIGHTS.get(source, 0)
+
+    if needle and (basename == needle or stem == needle):
+        value += 100
+    pos = basename.find(needle) if needle else -1
+    if pos == 0:
+        value += 40
+    elif pos > 0:
+        value += 30 - min(pos, 20)
+        # Start of a word, e.g. "report" in "q3_report.pdf"
+        if not basename[pos - 1].isalnum():
+            value += 8
+
+    # Shallow paths first; hidden and cache directories last
+    value -= 2 * path.count('/')
+    if '/.' in path:
+        value -= 15
+    return value
+
+
+def top_k(candidates: Iterable[Tuple], pattern: str, k: int) -> List[Tuple]:
+    """Return the ``k`` best candidates with distinct paths, keeping input
+    order on ties.
+
+    Candidates are tuples starting with (path, source); any further fields
+    are passed through.
+    """
+    needle = literal_needle(pattern)
+    scored = []
+    seen = set()
+    for order, candidate in enumerate(candidates):
+        path, source = candidate[0], candidate[1]
+        if path in seen:
+            continue
+        seen.add(path)
+        scored.append((score(needle, path, source), -order, candidate))
+    return [candidate for _, _, candidate in heapq.nlargest(k, scored)]
@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from cancel import CancelToken, SearchCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class QueryScheduler:
+    """Runs each query in the background and lets a newer query supersede it.
+
+    Every submitted query gets a generation number. Submitting a new one
+    cancels the token of the previous one, which kills its locate/find
+    processes and stops its workers, so a slow superseded search never delays
+    the results of the latest keystroke. Results of stale generations are
+    dropped instead of being delivered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._token: Optional[CancelToken] = None
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def cancel(self):
+        """Cancel whatever query is in flight."""
+        with self._lock:
+            self._generation += 1
+            token, self._token = self._token, None
+        if token is not None:
+            token.cancel()
+
+    def submit(self, search: Callable[[CancelToken], Any], on_done: Callable[[Any], None]) -> int:
+        """Run ``search(token)`` in a worker thread and pass its result to ``on_done``.
+
+        ``on_done`` is only called if no newer query was submitted meanwhile.
+        """
+        token = CancelToken()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            previous, self._token = self._token, token
+        if previous is not None:
+            previous.cancel()
+        self._start(search, on_done, token, generation)
+        return generation
+
+    def resume(self, search: Callable[[CancelToken], Any], on_done: Callable[[Any], None]) -> int:
+        """Run ``search(token)`` as a continuation of the current query.
+
+        Nothing is cancelled: the work shares the current query's token and
+        generation, so it is dropped just the same once a newer query is
+        submitted.
+        """
+        with self._lock:
+            generation = self._generation
+            token = self._token
+        if token is None:
+            token = CancelToken()
+            token.cancel()
+        self._start(search, on_done, token, generation)
+        return generation
+
+    def _start(self, search, on_done, token: CancelToken, generation: int):
+        def worker():
+            try:
+                result = search(token)
+            except SearchCancelled:
+                logger.debug("Query %d cancelled", generation)
+                return
+            if self.is_current(generation):
+                on_done(result)
+            else:
+                logger.debug("Dropping stale results of query %d", generation)
+
+        threading.Thread(target=worker, name=f"query-{generation}", daemon=True).start()
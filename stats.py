@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RollingHistogram:
+    """Durations of the most recent ``size`` occurrences of one stage."""
+
+    def __init__(self, size: int = 256):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, ms: float):
+        self.samples.append(ms)
+        self.count += 1
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    @property
+    def max(self) -> float:
+        return max(self.samples, default=0.0)
+
+
+class Stats:
+    """Per-stage timing spans aggregated into rolling histograms.
+
+    Stage names are short identifiers ("locate", "merge", ...); spans that
+    belong to one mount pass it as ``key`` so slow drives can be told apart.
+    """
+
+    def __init__(self, window: int = 256):
+        self.window = window
+        self._histograms: Dict[Tuple[str, Optional[str]], RollingHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float, key: Optional[str] = None):
+        with self._lock:
+            histogram = self._histograms.get((stage, key))
+            if histogram is None:
+                histogram = self._histograms[(stage, key)] = RollingHistogram(self.window)
+            histogram.add(ms)
+        logger.debug("%s%s took %.1f ms", stage, f" [{key}]" if key else "", ms)
+
+    @contextmanager
+    def span(self, stage: str, key: Optional[str] = None):
+        """Time the ``with`` block as one occurrence of ``stage``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000, key)
+
+    def slowest(self, limit: int = 10, by_key: Optional[bool] = None) -> List[tuple]:
+        """(stage, key, histogram) sorted by p95, slowest first.
+
+        ``by_key`` restricts the list to per-mount spans (True) or to
+        stage totals (False).
+        """
+        with self._lock:
+            rows = [(stage, key, h) for (stage, key), h in self._histograms.items()
+                    if by_key is None or (key is not None) == by_key]
+        rows.sort(key=lambda row: row[2].percentile(95), reverse=True)
+        return rows[:limit]
+
+    def summary(self, limit: int = 10, by_key: Optional[bool] = None) -> List[dict]:
+        """``slowest`` as plain dicts, e.g. to send them over the daemon socket."""
+        return [{'stage': stage, 'key': key, 'p50': h.percentile(50), 'p95': h.percentile(95),
+                 'max': h.max, 'count': h.count}
+                for stage, key, h in self.slowest(limit, by_key)]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+
+
+def cache_dir(*parts: str) -> str:
+    """Directory for FileFlow's on-disk caches, created on first use."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, 'fileflow', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_atomic(path: str, data: bytes):
+    """Replace ``path`` with ``data`` so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_json(path: str, default=None):
+    try:
+        with open(path, 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path: str, data):
+    write_atomic(path, json.dumps(data, separators=(',', ':')).encode())
@@ -0,0 +1,52 @@
+import pytest
+
+from content import SNIPPET_CHARS, ContentScanner, find_match, text_regex
+
+
+def test_phrase_across_spaces_and_case():
+    buf = b'first line\nThe Invoice \t 2041 is due\n'
+    assert find_match(buf, text_regex('invoice 2041')) == (2, 'The Invoice   2041 is due')
+    assert find_match(buf, text_regex('invoice2041')) is None
+
+
+def test_long_line_is_cut_around_match():
+    buf = b'a' * 500 + b' needle ' + b'b' * 500
+    line, snippet = find_match(buf, text_regex('needle'))
+    assert line == 1
+    assert snippet.startswith('…') and snippet.endswith('…')
+    assert 'needle' in snippet and len(snippet) <= SNIPPET_CHARS + 2
+
+
+def test_scanner(tmp_path):
+    scanner = ContentScanner(max_size=100)
+    text = tmp_path / 'notes.txt'
+    text.write_text('todo: call back\n')
+    (tmp_path / 'image.bin').write_bytes(b'\0todo')
+    (tmp_path / 'big.txt').write_text('todo' * 100)
+    (tmp_path / 'empty.txt').write_text('')
+    regex = text_regex('todo')
+    assert scanner.search(str(text), regex) == (1, 'todo: call back')
+    for name in ['image.bin', 'big.txt', 'empty.txt', 'missing.txt']:
+        assert scanner.search(str(tmp_path / name), regex) is None
+    assert scanner.search(str(tmp_path), regex) is None
+
+
+def test_scanner_notices_modified_files(tmp_path):
+    scanner = ContentScanner()
+    path = tmp_path / 'notes.txt'
+    path.write_text('alpha\n')
+    assert scanner.search(str(path), text_regex('beta')) is None
+    path.write_text('alpha\nbeta\n')
+    assert scanner.search(str(path), text_regex('beta')) == (2, 'beta')
+
+
+@pytest.mark.parametrize('cache_bytes, max_entries', [(10, 100), (1 << 20, 2)])
+def test_scanner_evicts(tmp_path, cache_bytes, max_entries):
+    scanner = ContentScanner(cache_bytes=cache_bytes, max_entries=max_entries)
+    regex = text_regex('x')
+    for i in range(5):
+        path = tmp_path / f"{i}.txt"
+        path.write_text('x' * 8)
+        scanner.search(str(path), regex)
+    assert len(scanner._files) <= max_entries
+    assert scanner._size <= max(cache_bytes, 8)
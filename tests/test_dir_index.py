@@ -0,0 +1,55 @@
+import os
+import stat
+import time
+
+from dir_index import DirectoryIndex
+
+
+def write_command(tmp_path, script):
+    path = tmp_path / 'locate'
+    path.write_text('#!/bin/sh\n' + script)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def build(index, cmd):
+    index.refresh(None, cmd)
+    deadline = time.monotonic() + 5
+    while index.building and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return index
+
+
+def test_parents_of_locate_output(tmp_path):
+    cmd = write_command(tmp_path, 'printf "/home/user/a.txt\\n/home/user/docs/b.txt\\n/srv\\n"\n')
+    index = build(DirectoryIndex(str(tmp_path / 'dirs.idx'), locate_paths=[]), cmd)
+    assert index.ready
+    assert sorted(p for p, _ in index.iter_search('', 'directory')) == ['/home', '/home/user', '/home/user/docs']
+    assert [p for p, _ in index.iter_search('DOC')] == ['/home/user/docs']
+
+    # Saved for the next daemon, and trusted without a database signature
+    saved = build(DirectoryIndex(str(tmp_path / 'dirs.idx'), locate_paths=[]), None)
+    assert len(saved) == 3
+
+
+def test_failed_locate_is_not_saved(tmp_path):
+    cmd = write_command(tmp_path, 'echo "locate: can not stat () mlocate.db" >&2\nexit 1\n')
+    index = build(DirectoryIndex(str(tmp_path / 'dirs.idx'), locate_paths=[], recheck_interval=0), cmd)
+    assert not index.ready
+    assert not os.path.exists(tmp_path / 'dirs.idx')
+
+    cmd = write_command(tmp_path, 'printf "/home/user/a.txt\\n"\n')
+    assert build(index, cmd).ready
+
+
+def test_rebuilt_after_updatedb(tmp_path):
+    db = tmp_path / 'mlocate.db'
+    db.write_bytes(b'')
+    cmd = write_command(tmp_path, 'printf "/old/a\\n"\n')
+    index = build(DirectoryIndex(str(tmp_path / 'dirs.idx'), locate_paths=[str(db)], recheck_interval=0), cmd)
+    assert [p for p, _ in index.iter_search('old')] == ['/old']
+
+    cmd = write_command(tmp_path, 'printf "/new/a\\n"\n')
+    assert [p for p, _ in build(index, cmd).iter_search('new')] == []
+    os.utime(db, ns=(time.time_ns() + 10**9,) * 2)
+    assert [p for p, _ in build(index, cmd).iter_search('new')] == ['/new']
@@ -0,0 +1,110 @@
+import os
+import subprocess
+
+import pytest
+
+from filters import QueryFilters, parse_filters
+
+NOW = 1_700_000_000.0
+
+
+def test_splits_filters_from_pattern():
+    rest, filters = parse_filters('q3 report ext:PDF,.Docx size>1M newer:7d type:f', NOW)
+    assert rest == 'q3 report'
+    assert filters.extensions == ('pdf', 'docx')
+    assert filters.min_size == (1 << 20) + 1
+    assert filters.newer_than == NOW - 7 * 86400
+    assert filters.type == 'file'
+    assert filters.key == 'ext:pdf,.docx newer:7d size>1m type:f'
+
+
+def test_no_filters():
+    rest, filters = parse_filters('plain words', NOW)
+    assert rest == 'plain words'
+    assert not filters
+    assert filters.find_args() == []
+
+
+@pytest.mark.parametrize('token', ['type:x', 'size>abc', 'newer:yesterday', 'ext:', 'ext:a/b'])
+def test_invalid_filter(token):
+    with pytest.raises(RuntimeError, match='Invalid filter'):
+        parse_filters(f"report {token}", NOW)
+
+
+@pytest.mark.parametrize('token, min_size, max_size', [
+    ('size>10', 11, None),
+    ('size>=10', 10, None),
+    ('size<10', None, 9),
+    ('size<=10', None, 10),
+    ('size<=1.5k', None, 1536),
+])
+def test_size_bounds(token, min_size, max_size):
+    _, filters = parse_filters(token, NOW)
+    assert (filters.min_size, filters.max_size) == (min_size, max_size)
+
+
+@pytest.mark.parametrize('token, args', [
+    ('size>10', ['-size', '+10c']),
+    ('size<=10', ['-size', '-11c']),
+    # Bounds every file meets, or none can, must not become "+-1c" or "--1c"
+    ('size>=0', []),
+    ('size<=0', ['-size', '-1c']),
+    ('size<0', ['-false']),
+])
+def test_find_size_args(token, args):
+    _, filters = parse_filters(token, NOW)
+    assert filters.find_args() == args
+
+
+def test_find_args():
+    _, filters = parse_filters('ext:pdf,txt newer:1h older:2d', NOW)
+    assert filters.find_args() == ['(', '-iname', '*.pdf', '-o', '-iname', '*.txt', ')',
+                                   '-newermt', f"@{NOW - 3600:.0f}", '!', '-newermt', f"@{NOW - 2 * 86400:.0f}"]
+
+
+@pytest.mark.parametrize('token, expected', [
+    ('size>=0', {'empty', 'small', 'big'}),
+    ('size<=0', {'empty'}),
+    ('size<0', set()),
+    ('size>10', {'big'}),
+])
+def test_find_agrees_with_accept(tmp_path, token, expected):
+    for name, size in [('empty', 0), ('small', 5), ('big', 100)]:
+        (tmp_path / name).write_bytes(b'x' * size)
+    _, filters = parse_filters(token, NOW)
+    accepted = {os.path.basename(p) for p, _ in filters.apply((str(p), False) for p in tmp_path.iterdir())}
+    assert accepted == expected
+    try:
+        proc = subprocess.run(['find', str(tmp_path), '-type', 'f'] + filters.find_args(),
+                              capture_output=True, text=True)
+    except OSError:
+        pytest.skip('find is not installed')
+    assert proc.returncode == 0, proc.stderr
+    assert {os.path.basename(p) for p in proc.stdout.split()} == expected
+
+
+def test_accept_checks_type_and_extension(tmp_path):
+    (tmp_path / 'a.pdf').write_bytes(b'')
+    (tmp_path / 'dir.pdf').mkdir()
+    _, filters = parse_filters('ext:pdf type:f', NOW)
+    assert filters.accept(str(tmp_path / 'a.pdf'), None) == (str(tmp_path / 'a.pdf'), False)
+    assert filters.accept(str(tmp_path / 'dir.pdf'), None) is None
+    assert filters.accept(str(tmp_path / 'a.txt'), False) is None
+
+
+@pytest.mark.parametrize('token, pattern, args', [
+    ('ext:pdf', 'report', ['-A', 'report', '*.pdf']),
+    ('ext:pdf', '', ['*.pdf']),
+    ('ext:pdf,c++', '', ['--regex', r'\.(pdf|c[+][+])$']),
+    ('type:d', '', ['/']),
+])
+def test_locate_args(token, pattern, args):
+    _, filters = parse_filters(token, NOW)
+    assert filters.locate_args(pattern) == args
+
+
+def test_index_needle():
+    filters = QueryFilters()
+    filters.extensions = ('pdf',)
+    assert filters.index_needle('') == '.pdf'
+    assert filters.index_needle('report') == 'report'
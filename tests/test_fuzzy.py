@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+import fuzzy
+from fuzzy import FuzzyScan, normalize, score_one, subsequence_regex, top_names
+from path_index import _Store, _StoreBuilder
+
+WORDS = ['q3', 'report', 'rep', 'quarterly', 'draft', 'ab', 'x', 'thesis', 'invoice']
+EXTS = ['pdf', 'txt', 'odt']
+
+
+@pytest.fixture(scope='module')
+def store():
+    # Few distinct words, so many names score the same and ties decide
+    rng = random.Random(7)
+    builder = _StoreBuilder()
+    builder.add_dir(0, 0)
+    dirs = 50
+    for d in range(dirs):
+        name = f"{rng.choice(WORDS)}_dir{d}"
+        builder.add(name.encode(), name.lower().encode())
+    for d in range(dirs):
+        builder.add_dir(d + 1, 0)
+        for _ in range(100):
+            name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}.{rng.choice(EXTS)}"
+            builder.add(name.encode(), name.lower().encode())
+    return _Store(builder.serialize())
+
+
+def test_subsequence_match():
+    name = b'quarterly_report.pdf'
+    m = subsequence_regex(normalize('Q Rpt')).search(name)
+    assert [s for s, _ in m.regs[1:]] == [0, 3, 12, 15]
+    assert subsequence_regex(b'pq').search(name) is None
+
+
+def test_word_starts_score_higher():
+    assert score_one(b'q3_report', [0, 3]) > score_one(b'aqbcrd', [1, 4])
+
+
+@pytest.mark.parametrize('pattern', ['rep', 'qrtrpt', 'abx', 'dir1', 'txt', 'x', 'zzz'])
+@pytest.mark.parametrize('search_type', [None, 'file', 'directory'])
+@pytest.mark.parametrize('k', [1, 7, 100, 10000])
+def test_numpy_matches_regex(store, pattern, search_type, k):
+    if fuzzy.load_numpy() is None:
+        pytest.skip('NumPy is not installed')
+    scan = FuzzyScan(store, search_type)
+    needle = normalize(pattern)
+    with_numpy = scan.top(needle, k, use_numpy=True)
+    without = scan.top(needle, k, use_numpy=False)
+    assert [i for _, i in with_numpy] == [i for _, i in without]
+    assert [s for s, _ in with_numpy] == pytest.approx([s for s, _ in without])
+
+
+def test_best_first_then_shallow_first(store):
+    results = FuzzyScan(store).top(normalize('rep'), 200, use_numpy=False)
+    assert results == sorted(results, key=lambda hit: (-hit[0], hit[1]))
+
+
+def test_top_names():
+    names = [(b'quarterly_report.pdf', 'a'), (b'notes.txt', 'b'), (b'rep.txt', 'c')]
+    assert [key for _, key in top_names(names, normalize('rep'), 5)] == ['c', 'a']
@@ -0,0 +1,106 @@
+import os
+import time
+
+import pytest
+
+from benchmarks.fixtures import make_mlocate_db
+from locate_db import PLOCATE_MAGIC, LocateDatabase
+
+PATHS = [
+    '/home/user/Documents/Report_2023.pdf',
+    '/home/user/Documents/report/draft.txt',
+    '/home/user/Music/reportage.mp3',
+    '/home/user/\x02odd/file.txt',
+    '/srv/data/notes.md',
+    '/usr/share/doc/README',
+]
+
+
+def all_paths():
+    """Every path in the database with whether it is a directory."""
+    paths = {}
+    for line in PATHS:
+        parts = line.strip('/').split('/')
+        for depth in range(1, len(parts) + 1):
+            path = '/' + '/'.join(parts[:depth])
+            paths[path] = paths.get(path, False) or depth < len(parts)
+    return paths
+
+
+def load(db):
+    db.refresh()
+    deadline = time.monotonic() + 5
+    while db.loading and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return db
+
+
+def open_db(paths):
+    return load(LocateDatabase(paths))
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('locate')
+    text = tmp / 'paths.txt'
+    text.write_text(''.join(p + '\n' for p in PATHS))
+    make_mlocate_db(str(tmp / 'mlocate.db'), str(text))
+    db = open_db([str(tmp / 'missing.db'), str(tmp / 'mlocate.db')])
+    assert db.ready
+    return db
+
+
+@pytest.mark.parametrize('pattern', ['report', 'REPORT', 'home', 'e', '.txt', 'odd', 'nothing'])
+@pytest.mark.parametrize('search_type', [None, 'file', 'directory'])
+def test_matches_like_locate(db, pattern, search_type):
+    expected = {(path, is_dir) for path, is_dir in all_paths().items() if pattern.lower() in path.lower()
+                and search_type in (None, 'directory' if is_dir else 'file')}
+    results = list(db.iter_search(pattern, search_type))
+    assert len(results) == len(set(results))
+    assert set(results) == expected
+
+
+def test_limit(db):
+    results, complete = db.search('user', 2)
+    assert len(results) == 2 and not complete
+    results, complete = db.search('reportage', 10)
+    assert results == [('/home/user/Music/reportage.mp3', False)] and complete
+
+
+def test_cancelled(db):
+    assert list(db.iter_search('e', cancelled=lambda: True)) == []
+
+
+@pytest.mark.parametrize('pattern', ['', 'rep*', 'user/Doc', 'résumé'])
+def test_left_to_command(db, pattern):
+    assert db.iter_search(pattern) is None
+
+
+def test_iter_dirs(db):
+    expected = {'/'} | {path for path, is_dir in all_paths().items() if is_dir}
+    assert set(db.iter_dirs()) == expected
+
+
+def test_plocate_left_to_command(tmp_path):
+    path = tmp_path / 'plocate.db'
+    path.write_bytes(PLOCATE_MAGIC + bytes(64))
+    db = open_db([str(path)])
+    assert not db.ready
+    assert db.iter_search('report') is None
+    assert db.iter_dirs() is None
+
+
+def test_reopened_after_updatedb(tmp_path):
+    text = tmp_path / 'paths.txt'
+    path = tmp_path / 'mlocate.db'
+    text.write_text('/a/first.txt\n')
+    make_mlocate_db(str(path), str(text))
+    db = open_db([str(path)])
+    assert db.search('first', 10) == ([('/a/first.txt', False)], True)
+
+    text.write_text('/a/second.txt\n')
+    make_mlocate_db(str(tmp_path / 'new.db'), str(text))
+    os.replace(tmp_path / 'new.db', path)
+    db.recheck_interval = 0
+    load(db)
+    assert db.search('second', 10) == ([('/a/second.txt', False)], True)
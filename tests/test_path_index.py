@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from path_index import PathIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'docs' / 'old').mkdir(parents=True)
+    (tmp_path / 'docs' / 'notes.txt').write_text('')
+    (tmp_path / 'docs' / 'old' / 'notes_2019.txt').write_text('')
+    (tmp_path / 'music').mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def index(tree):
+    index = PathIndex(str(tree))
+    index.build()
+    return index
+
+
+def names(index, pattern='', search_type=None):
+    root = index.root + '/'
+    return sorted(path[len(root):] for path, _ in index.iter_search(pattern, search_type))
+
+
+def test_build(index):
+    assert len(index) == 5
+    assert names(index, 'NOTES') == ['docs/notes.txt', 'docs/old/notes_2019.txt']
+    assert names(index, 'o', 'directory') == ['docs', 'docs/old']
+    assert names(index, '*.txt') == ['docs/notes.txt', 'docs/old/notes_2019.txt']
+
+
+def test_created_paths(index, tree):
+    index.apply_changes([(str(tree / 'music' / 'notes.mp3'), False), (str(tree / 'notes_dir'), True)])
+    assert names(index, 'notes') == ['docs/notes.txt', 'docs/old/notes_2019.txt', 'music/notes.mp3', 'notes_dir']
+    assert names(index, 'notes', 'directory') == ['notes_dir']
+
+
+def test_deleted_directory_hides_everything_below(index, tree):
+    index.apply_changes([(str(tree / 'docs' / 'old'), None)])
+    assert names(index, 'notes') == ['docs/notes.txt']
+    assert names(index, 'old') == []
+
+
+def test_rename_lists_path_once(index, tree):
+    # A rename is reported as the old path deleted, the new one created
+    index.apply_changes([(str(tree / 'docs'), None), (str(tree / 'papers'), True),
+                         (str(tree / 'docs'), True)])
+    assert names(index, 'docs') == ['docs']
+    assert names(index, 'notes') == []
+    assert names(index, 'papers') == ['papers']
+
+
+def test_deleting_created_directory_drops_its_children(index, tree):
+    index.apply_changes([(str(tree / 'new'), True), (str(tree / 'new' / 'notes.md'), False),
+                         (str(tree / 'new'), None)])
+    assert names(index, 'notes') == ['docs/notes.txt', 'docs/old/notes_2019.txt']
+    assert names(index, 'new') == []
+
+
+def test_build_folds_overlay(index, tree):
+    (tree / 'music' / 'song.ogg').write_text('')
+    index.apply_changes([(str(tree / 'music' / 'song.ogg'), False)])
+    index.build()
+    assert index.overlay_size == 0
+    assert names(index, 'song') == ['music/song.ogg']
+
+
+def test_fuzzy_search_sees_overlay(index, tree):
+    index.apply_changes([(str(tree / 'docs' / 'notes.txt'), None),
+                         (str(tree / 'music' / 'nocturne.txt'), False)])
+    assert [path for _, path, _ in index.fuzzy_search('ntxt', 10)] == [
+        str(tree / 'music' / 'nocturne.txt'), str(tree / 'docs' / 'old' / 'notes_2019.txt')]
+
+
+def test_listeners(index, tree):
+    builds, changes = [], []
+    index.add_listener(lambda: builds.append(1))
+    index.add_listener(lambda: changes.append(1), changes=True)
+    index.apply_changes([(str(tree / 'a.txt'), False)])
+    assert (len(builds), len(changes)) == (0, 1)
+    index.build()
+    assert (len(builds), len(changes)) == (1, 2)
+
+
+def test_overlay_limit_starts_build(tree):
+    index = PathIndex(str(tree), overlay_limit=1)
+    index.build()
+    built = threading.Event()
+    index.add_listener(built.set)
+    index.apply_changes([(str(tree / 'a.txt'), False), (str(tree / 'b.txt'), False)])
+    assert built.wait(5)
+
+
+def test_build_again_after_running_build(tree):
+    index = PathIndex(str(tree))
+    walks = []
+    release = threading.Event()
+    walk = index._walk
+
+    def slow_walk(old):
+        walks.append(1)
+        release.wait(5)
+        return walk(old)
+
+    index._walk = slow_walk
+    index.build_async()
+    index.build_async()
+    index.build_async(again=True)
+    release.set()
+    deadline = time.monotonic() + 5
+    while index.building and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(walks) == 2
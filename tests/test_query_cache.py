@@ -0,0 +1,43 @@
+import time
+
+from query_cache import QueryCache
+
+
+def test_exact_and_case_insensitive():
+    cache = QueryCache()
+    cache.put('normal', 'Rep', 10, [('/a/rep', 'hw', False)], True)
+    assert cache.get('normal', 'rep', 10) == [('/a/rep', 'hw', False)]
+    assert cache.get('normal', 'rep', 20) is None
+    assert cache.get('hw', 'rep', 10) is None
+
+
+def test_base_is_longest_complete_substring():
+    cache = QueryCache()
+    cache.put('normal', 're', 10, [('/re', 'hw', False)], True)
+    cache.put('normal', 'rep', 10, [('/rep', 'hw', False)], True)
+    cache.put('normal', 'repo', 10, [('/repo', 'hw', False)], False)
+    assert cache.get_base('normal', 'report', 10) == [('/rep', 'hw', False)]
+    assert cache.get_base('normal', 'rep', 10) == [('/re', 'hw', False)]
+    assert cache.get_base('normal', 'x', 10) is None
+
+
+def test_expiry_and_invalidate():
+    cache = QueryCache(ttl=0.01)
+    cache.put('normal', 'rep', 10, [], True)
+    time.sleep(0.02)
+    assert cache.get('normal', 'rep', 10) is None
+    assert cache.get_base('normal', 'report', 10) is None
+    cache = QueryCache()
+    cache.put('normal', 'rep', 10, [], True)
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_lru_bound():
+    cache = QueryCache(max_entries=2)
+    cache.put('normal', 'a', 10, [], True)
+    cache.put('normal', 'b', 10, [], True)
+    cache.get('normal', 'a', 10)
+    cache.put('normal', 'c', 10, [], True)
+    assert cache.get('normal', 'b', 10) is None
+    assert cache.get('normal', 'a', 10) is not None
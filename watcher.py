@@ -0,0 +1,335 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from path_index import PathIndex
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK
+
+# wd, mask, cookie, length of the name that follows
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal inotify(7) binding through ctypes.
+
+    ``available`` is False where libc has no inotify (not Linux), and the
+    watcher is then never started.
+    """
+
+    def __init__(self):
+        self.fd = -1
+        self._libc = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError):
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning("inotify unavailable: %s", os.strerror(ctypes.get_errno()))
+            return
+        self.fd = fd
+        self._libc = libc
+
+    @property
+    def available(self) -> bool:
+        return self.fd >= 0
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        """Watch directory ``path``; raises OSError, ENOSPC once the system limit is reached.
+
+        Watching a directory watched already returns its existing descriptor.
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> List[Tuple[int, int, int, bytes]]:
+        """Pending (wd, mask, cookie, name) events; empty when there are none."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            events.append((wd, mask, cookie, data[pos:pos + length].rstrip(b'\0')))
+            pos += length
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WatchBudget:
+    """Number of inotify watches all index watchers may hold together.
+
+    Each watched directory costs kernel memory and counts against
+    fs.inotify.max_user_watches, which other applications share.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def release(self, count: int = 1):
+        with self._lock:
+            self.used = max(0, self.used - count)
+
+
+class IndexWatcher:
+    """Keeps a ``PathIndex`` current while its drive stays mounted.
+
+    Every indexed directory gets an inotify watch, breadth-first, as long
+    as ``budget`` allows. Created, deleted and renamed entries are
+    collected and applied to the index in batches once no event arrived
+    for ``debounce`` seconds (at the latest after ``max_delay``). New
+    directories are listed right away, since entries made in them before
+    their watch existed produce no events.
+
+    When the kernel queue overflows, events were lost and the index is
+    refreshed, which relists only directories whose mtime changed. The
+    same refresh covers directories left unwatched by the budget, so
+    ``complete`` tells the caller whether periodic refreshes are still
+    needed.
+    """
+
+    def __init__(self, index: PathIndex, budget: WatchBudget, debounce: float = 0.5, max_delay: float = 2):
+        self.index = index
+        self.budget = budget
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.inotify: Optional[Inotify] = None
+        # Watch descriptor to directory path, and back
+        self.paths: Dict[int, str] = {}
+        self.wds: Dict[str, int] = {}
+        # Every indexed directory is watched; False after running out of budget
+        self.complete = False
+        self.rescans = 0
+        self._pending: List[Tuple[str, Optional[bool]]] = []
+        self._resync = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def watches(self) -> int:
+        return len(self.paths)
+
+    def start(self):
+        """Start watching once the index is built; does nothing without inotify."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"watch:{self.index.root}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self.index.wait_ready(1):
+            if self._stop.is_set():
+                return
+        self.inotify = Inotify()
+        if not self.inotify.available:
+            return
+        self.index.add_listener(self._resync.set)
+        try:
+            self._sync_watches()
+            self._loop()
+        except Exception as e:
+            logger.exception("Stopped watching %s: %s", self.index.root, e)
+        finally:
+            self.index.remove_listener(self._resync.set)
+            self.budget.release(len(self.paths))
+            self.paths.clear()
+            self.wds.clear()
+            self.inotify.close()
+            self.complete = False
+
+    def _watch(self, path: str) -> bool:
+        """Watch one directory; False once the budget or the system limit ran out."""
+        if path in self.wds:
+            return True
+        if not self.budget.take():
+            return False
+        try:
+            wd = self.inotify.add_watch(path)
+        except OSError as e:
+            self.budget.release()
+            if e.errno == errno.ENOSPC:
+                logger.warning("System inotify watch limit reached while watching %s", self.index.root)
+                return False
+            # Gone or unreadable; its parent's events cover it
+            return True
+        if wd in self.paths:
+            # The same directory under a new name, after a rename
+            self.budget.release()
+            self.wds.pop(self.paths[wd], None)
+        self.paths[wd] = path
+        self.wds[path] = wd
+        return True
+
+    def _unwatch_below(self, path: str):
+        """Drop the watches of ``path`` and everything below, e.g. after it moved away."""
+        prefix = path.rstrip('/') + '/'
+        for dir_path in [p for p in self.wds if p == path or p.startswith(prefix)]:
+            wd = self.wds.pop(dir_path)
+            self.paths.pop(wd, None)
+            self.inotify.rm_watch(wd)
+            self.budget.release()
+
+    def _sync_watches(self):
+        """Watch every indexed directory not watched yet, breadth-first."""
+        started = time.monotonic()
+        complete = True
+        for dir_path in self.index.iter_dirs():
+            if self._stop.is_set():
+                return
+            if not self._watch(dir_path):
+                complete = False
+                break
+        self.complete = complete
+        logger.info("Watching %d directories of %s in %.2fs%s", len(self.paths), self.index.root,
+                    time.monotonic() - started, '' if complete else ' (watch budget exhausted)')
+
+    def _scan_new_dir(self, path: str):
+        """Record the contents of a directory that appeared, and watch it."""
+        level = [path]
+        while level:
+            next_level = []
+            for dir_path in level:
+                if not self._watch(dir_path):
+                    self.complete = False
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            try:
+                                is_dir = entry.is_dir(follow_symlinks=False)
+                            except OSError:
+                                is_dir = False
+                            self._pending.append((entry.path, is_dir))
+                            if is_dir:
+                                next_level.append(entry.path)
+                except OSError:
+                    continue
+            level = next_level
+
+    def _handle(self, wd: int, mask: int, name: bytes) -> bool:
+        """Queue the index change of one event; False when the index must be refreshed."""
+        if mask & IN_Q_OVERFLOW:
+            return False
+        if mask & IN_IGNORED:
+            # The directory was deleted or unmounted, or the watch removed
+            path = self.paths.pop(wd, None)
+            if path is not None and self.wds.get(path) == wd:
+                del self.wds[path]
+                self.budget.release()
+            return True
+        if mask & IN_UNMOUNT:
+            self._stop.set()
+            return True
+        parent = self.paths.get(wd)
+        if parent is None or not name:
+            return True
+        path = os.path.join(parent, os.fsdecode(name))
+        is_dir = bool(mask & IN_ISDIR)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._pending.append((path, None))
+            if is_dir and mask & IN_MOVED_FROM:
+                # Watches of a moved directory would report under the old path
+                self._unwatch_below(path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            self._pending.append((path, is_dir))
+            if is_dir:
+                self._scan_new_dir(path)
+        return True
+
+    def _flush(self):
+        if self._pending:
+            changes, self._pending = self._pending, []
+            self.index.apply_changes(changes)
+
+    def _rescan(self):
+        """Catch up after lost events by relisting the directories whose mtime changed."""
+        self._pending = []
+        self.rescans += 1
+        logger.info("inotify queue overflow on %s, refreshing its index", self.index.root)
+        # A build already running may have listed the changed directories
+        # before the lost events, so it does not count
+        self.index.build_async(again=True)
+
+    def _loop(self):
+        poller = select.poll()
+        poller.register(self.inotify.fd, select.POLLIN)
+        first_event = last_event = 0.0
+        while not self._stop.is_set():
+            if self._resync.is_set():
+                # The index was rebuilt; directories it found need watches
+                self._resync.clear()
+                self._sync_watches()
+            if self._pending:
+                now = time.monotonic()
+                wait = min(last_event + self.debounce, first_event + self.max_delay) - now
+                if wait <= 0:
+                    self._flush()
+                    first_event = 0.0
+                    continue
+            else:
+                wait = 1
+            if not poller.poll(max(1, int(wait * 1000))):
+                continue
+            overflow = False
+            for wd, mask, _, name in self.inotify.read():
+                if not self._handle(wd, mask, name):
+                    overflow = True
+            now = time.monotonic()
+            if overflow:
+                self._rescan()
+                first_event = 0.0
+            elif self._pending:
+                first_event = first_event or now
+                last_event = now